@@ -3,4 +3,9 @@ ASI-GEST Application Package
 © 2025 Enrico Callegaro - Tutti i diritti riservati.
 """
 
+import time
+
+# Inizio import del package (tempo di import riportato all'avvio da app.main)
+IMPORT_STARTED_AT = time.perf_counter()
+
 __version__ = "1.0.0"
@@ -6,19 +6,27 @@ ASI-GEST Core Module
 from .config import settings
 from .database import (
     Base,
-    engine_asi_gest,
-    engine_asitron,
+    asitron_session,
+    get_async_db_asi_gest,
+    get_async_db_asi_gest_read,
     get_db_asi_gest,
+    get_db_asi_gest_read,
     get_db_asitron,
+    get_engine_asi_gest,
+    get_engine_asitron,
     init_db_asi_gest,
 )
 
 __all__ = [
     "settings",
     "Base",
-    "engine_asi_gest",
-    "engine_asitron",
+    "asitron_session",
+    "get_async_db_asi_gest",
+    "get_async_db_asi_gest_read",
     "get_db_asi_gest",
+    "get_db_asi_gest_read",
     "get_db_asitron",
+    "get_engine_asi_gest",
+    "get_engine_asitron",
     "init_db_asi_gest",
 ]
@@ -0,0 +1,208 @@
+"""
+ASI-GEST Admission Control
+© 2025 Enrico Callegaro - Tutti i diritti riservati.
+
+Controllo di ammissione delle richieste per classe di priorità.
+
+Le route sync competono per lo stesso threadpool e per le connessioni
+ASI_GEST: sotto carico un refresh della dashboard non deve rallentare
+l'apertura o la chiusura di un lotto dalla linea. Ogni route dichiara
+una classe:
+
+- CRITICAL: scritture di produzione (lotti, fasi)
+- INTERACTIVE: dettagli e scritture di anagrafica/configurazione
+- REPORTING: liste, dashboard, gestionale, riconciliazione
+
+Regole (per processo worker):
+- al massimo ADMISSION_MAX_CONCURRENT richieste in esecuzione
+- ADMISSION_RESERVED_CRITICAL posti sono utilizzabili solo da CRITICAL
+- REPORTING non supera ADMISSION_REPORTING_MAX richieste contemporanee
+- oltre i limiti la richiesta attende in coda; quando un posto si libera
+  viene servita prima la classe a priorità più alta
+- dopo il timeout di coda della classe (breve per REPORTING) la richiesta
+  viene scartata con 503 e Retry-After
+
+L'attesa avviene sull'event loop (dependency async), senza occupare
+thread del threadpool né connessioni al database.
+
+Uso:
+    @router.post("/", dependencies=[admission(CRITICAL)])
+"""
+
+import asyncio
+import logging
+from collections import deque
+from typing import Optional
+
+from fastapi import Depends, HTTPException
+
+from .config import settings
+from .metrics import PREFIX, register_collector
+
+logger = logging.getLogger("asigest.admission")
+
+CRITICAL = "critical"
+INTERACTIVE = "interactive"
+REPORTING = "reporting"
+
+# Ordine di priorità (prima = servita prima)
+PRIORITIES = (CRITICAL, INTERACTIVE, REPORTING)
+
+
+class AdmissionController:
+    """Posti di esecuzione condivisi fra le classi di priorità"""
+
+    def __init__(self, capacity: int, reserved_critical: int, reporting_max: int, max_queue: int):
+        self.capacity = capacity
+        self.reserved_critical = reserved_critical
+        self.reporting_max = reporting_max
+        self.max_queue = max_queue
+        self.active = dict.fromkeys(PRIORITIES, 0)
+        self.queues: dict[str, deque] = {cls: deque() for cls in PRIORITIES}
+        self.admitted_total = dict.fromkeys(PRIORITIES, 0)
+        self.shed_total = dict.fromkeys(PRIORITIES, 0)
+
+    @property
+    def in_use(self) -> int:
+        return sum(self.active.values())
+
+    def _can_admit(self, cls: str) -> bool:
+        if cls == CRITICAL:
+            return self.in_use < self.capacity
+        if self.in_use >= self.capacity - self.reserved_critical:
+            return False
+        if cls == REPORTING:
+            return self.active[REPORTING] < self.reporting_max
+        return True
+
+    def _grant(self, cls: str) -> None:
+        self.active[cls] += 1
+        self.admitted_total[cls] += 1
+
+    def _wake(self) -> None:
+        # Assegna i posti liberi ai primi in coda, dalla classe più prioritaria
+        for cls in PRIORITIES:
+            queue = self.queues[cls]
+            while queue and self._can_admit(cls):
+                waiter = queue.popleft()
+                if not waiter.done():
+                    self._grant(cls)
+                    waiter.set_result(None)
+
+    async def acquire(self, cls: str, timeout: float) -> None:
+        """Attende un posto per la classe; HTTPException 503 se scartata"""
+        if not any(self.queues[c] for c in PRIORITIES[:PRIORITIES.index(cls) + 1]) and self._can_admit(cls):
+            self._grant(cls)
+            return
+
+        if len(self.queues[cls]) >= self.max_queue:
+            self._shed(cls, "queue full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.queues[cls].append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except asyncio.TimeoutError:
+            if waiter.done():
+                # Posto assegnato proprio allo scadere del timeout
+                return
+            waiter.cancel()
+            self._remove(cls, waiter)
+            self._shed(cls, "queue timeout")
+        except asyncio.CancelledError:
+            # Client disconnesso durante l'attesa
+            if waiter.done() and not waiter.cancelled():
+                self.release(cls)
+            else:
+                waiter.cancel()
+                self._remove(cls, waiter)
+            raise
+
+    def release(self, cls: str) -> None:
+        self.active[cls] -= 1
+        self._wake()
+
+    def _remove(self, cls: str, waiter) -> None:
+        try:
+            self.queues[cls].remove(waiter)
+        except ValueError:
+            pass
+
+    def _shed(self, cls: str, reason: str) -> None:
+        self.shed_total[cls] += 1
+        logger.warning(
+            "Request shed class=%s reason=%s active=%s queued=%s",
+            cls, reason, dict(self.active), {c: len(q) for c, q in self.queues.items()},
+        )
+        raise HTTPException(
+            status_code=503,
+            detail=f"Server busy ({cls} traffic), retry later",
+            headers={"Retry-After": "1"},
+        )
+
+
+_controller: Optional[AdmissionController] = None
+
+
+def get_controller() -> AdmissionController:
+    global _controller
+    if _controller is None:
+        _controller = AdmissionController(
+            capacity=settings.ADMISSION_MAX_CONCURRENT,
+            reserved_critical=settings.ADMISSION_RESERVED_CRITICAL,
+            reporting_max=settings.ADMISSION_REPORTING_MAX,
+            max_queue=settings.ADMISSION_MAX_QUEUE,
+        )
+    return _controller
+
+
+_TIMEOUTS = {
+    CRITICAL: lambda: settings.ADMISSION_QUEUE_TIMEOUT_CRITICAL,
+    INTERACTIVE: lambda: settings.ADMISSION_QUEUE_TIMEOUT_INTERACTIVE,
+    REPORTING: lambda: settings.ADMISSION_QUEUE_TIMEOUT_REPORTING,
+}
+
+
+def admission(cls: str):
+    """
+    Dichiara la classe di priorità di una route.
+
+    Il posto viene tenuto fino alla chiusura della risposta (e della
+    sessione database aperta dalle dependency successive).
+    """
+    if cls not in PRIORITIES:
+        raise ValueError(f"Classe di ammissione non valida: {cls}")
+
+    async def _admit():
+        if not settings.ADMISSION_ENABLED:
+            yield
+            return
+        controller = get_controller()
+        await controller.acquire(cls, _TIMEOUTS[cls]())
+        try:
+            yield
+        finally:
+            controller.release(cls)
+
+    return Depends(_admit)
+
+
+def _render_admission() -> list[str]:
+    if _controller is None:
+        return []
+    active = f"{PREFIX}_admission_active"
+    queued = f"{PREFIX}_admission_queued"
+    admitted = f"{PREFIX}_admission_admitted_total"
+    shed = f"{PREFIX}_admission_shed_total"
+    lines = [f"# HELP {active} Richieste in esecuzione per classe", f"# TYPE {active} gauge"]
+    lines += [f'{active}{{class="{c}"}} {_controller.active[c]}' for c in PRIORITIES]
+    lines += [f"# HELP {queued} Richieste in coda per classe", f"# TYPE {queued} gauge"]
+    lines += [f'{queued}{{class="{c}"}} {len(_controller.queues[c])}' for c in PRIORITIES]
+    lines += [f"# HELP {admitted} Richieste ammesse", f"# TYPE {admitted} counter"]
+    lines += [f'{admitted}{{class="{c}"}} {_controller.admitted_total[c]}' for c in PRIORITIES]
+    lines += [f"# HELP {shed} Richieste scartate (coda piena o timeout)", f"# TYPE {shed} counter"]
+    lines += [f'{shed}{{class="{c}"}} {_controller.shed_total[c]}' for c in PRIORITIES]
+    return lines
+
+
+register_collector(_render_admission)
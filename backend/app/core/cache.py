@@ -0,0 +1,93 @@
+"""
+ASI-GEST In-Memory Cache
+© 2025 Enrico Callegaro - Tutti i diritti riservati.
+
+Cache in memoria thread-safe con scadenza (TTL) ed eviction LRU.
+Usata per i dati letti dal gestionale ASITRON e per le strutture
+derivate che non devono essere ricalcolate ad ogni richiesta.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Iterable, Optional
+
+
+class TTLCache:
+    """
+    Cache chiave/valore con scadenza per voce.
+
+    - ttl_seconds: durata di validità di ogni voce (None = nessuna scadenza)
+    - max_entries: numero massimo di voci, oltre il quale viene rimossa
+      la voce usata meno di recente
+    """
+
+    def __init__(self, ttl_seconds: Optional[float], max_entries: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _is_expired(self, stored_at: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - stored_at > self.ttl_seconds
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Ritorna il valore in cache o default se assente/scaduto"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            if self._is_expired(entry[0], now):
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def get_many(self, keys: Iterable[Hashable]) -> tuple[dict, list]:
+        """
+        Ritorna (trovati, mancanti) per un insieme di chiavi,
+        acquisendo il lock una sola volta.
+        """
+        now = time.monotonic()
+        found: dict = {}
+        missing: list = []
+        with self._lock:
+            for key in keys:
+                entry = self._data.get(key)
+                if entry is None or self._is_expired(entry[0], now):
+                    if entry is not None:
+                        del self._data[key]
+                    missing.append(key)
+                    continue
+                self._data.move_to_end(key)
+                found[key] = entry[1]
+        return found, missing
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Inserisce o sostituisce una voce"""
+        self.set_many({key: value})
+
+    def set_many(self, values: dict) -> None:
+        """Inserisce o sostituisce più voci"""
+        now = time.monotonic()
+        with self._lock:
+            for key, value in values.items():
+                self._data[key] = (now, value)
+                self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        """Rimuove una voce (se presente)"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Svuota la cache"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
@@ -0,0 +1,156 @@
+"""
+ASI-GEST Circuit Breaker
+© 2025 Enrico Callegaro - Tutti i diritti riservati.
+
+Circuit breaker per un engine SQLAlchemy (usato su ASITRON).
+
+Con il gestionale irraggiungibile ogni richiesta resterebbe bloccata fino
+al timeout di pymssql (prima sul pre-ping, poi sulla riconnessione),
+occupando un thread per decine di secondi. Il breaker:
+
+- CLOSED: le connessioni passano; errori di connessione consecutivi
+  vengono contati e dopo failure_threshold il circuito si apre
+- OPEN: ogni checkout dal pool fallisce subito con CircuitOpenError,
+  senza toccare la rete, per reset_timeout secondi
+- HALF_OPEN: trascorso il cool-down passa una sola richiesta di prova;
+  se riesce il circuito si richiude, altrimenti si riapre
+
+Il controllo avviene in InstrumentedQueuePool._do_get, prima del pre-ping.
+Solo gli errori di connessione (OperationalError, InterfaceError,
+disconnessioni) contano come fallimenti: un errore SQL non apre il circuito.
+"""
+
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+
+from .metrics import InstrumentedQueuePool, register_collector, PREFIX
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """Circuito aperto: il database non viene contattato"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuit breaker '{name}' open, retry in {retry_after:.0f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Stato del circuito per un engine (thread-safe)"""
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_started_at: Optional[float] = None
+        self.opens_total = 0
+        self.rejected_total = 0
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        """Da chiamare prima di usare il database: solleva CircuitOpenError se aperto"""
+        if self.state == CLOSED:
+            return
+        with self._lock:
+            now = time.monotonic()
+            if self.state == OPEN and now - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self.trial_started_at = None
+            if self.state == HALF_OPEN:
+                # Una sola prova alla volta; una prova mai conclusa scade dopo reset_timeout
+                if self.trial_started_at is None or now - self.trial_started_at >= self.reset_timeout:
+                    self.trial_started_at = now
+                    return
+                retry_after = self.reset_timeout - (now - self.trial_started_at)
+            elif self.state == OPEN:
+                retry_after = self.reset_timeout - (now - self.opened_at)
+            else:
+                return
+            self.rejected_total += 1
+        raise CircuitOpenError(self.name, max(retry_after, 0.0))
+
+    def record_success(self) -> None:
+        if self.state == CLOSED and self.failures == 0:
+            return
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self.trial_started_at = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.opens_total += 1
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self.trial_started_at = None
+
+    def retry_after(self) -> float:
+        """Secondi alla prossima prova (0 se il circuito è chiuso)"""
+        if self.state == CLOSED:
+            return 0.0
+        return max(self.reset_timeout - (time.monotonic() - self.opened_at), 0.0)
+
+
+_breakers: list[CircuitBreaker] = []
+
+
+def _is_connection_error(context) -> bool:
+    if getattr(context, "is_pre_ping", False):
+        # Il pool riprova con una nuova connessione: conta solo quella
+        return False
+    return context.is_disconnect or isinstance(
+        context.sqlalchemy_exception, (exc.OperationalError, exc.InterfaceError)
+    )
+
+
+def instrument_breaker(engine: Engine, breaker: CircuitBreaker) -> None:
+    """Collega il breaker al pool e agli errori di un engine"""
+    pool = engine.pool
+    if isinstance(pool, InstrumentedQueuePool):
+        pool.breaker = breaker
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _on_success(conn, cursor, statement, parameters, context, executemany):
+        breaker.record_success()
+
+    @event.listens_for(engine, "handle_error")
+    def _on_error(exception_context):
+        if _is_connection_error(exception_context):
+            breaker.record_failure()
+
+    _breakers.append(breaker)
+
+
+def _render_breakers() -> list[str]:
+    state = f"{PREFIX}_circuit_breaker_state"
+    opens = f"{PREFIX}_circuit_breaker_opens_total"
+    rejected = f"{PREFIX}_circuit_breaker_rejected_total"
+    lines = [
+        f"# HELP {state} Stato del circuito (0=chiuso, 1=prova, 2=aperto)",
+        f"# TYPE {state} gauge",
+    ]
+    lines += [f'{state}{{engine="{b.name}"}} {_STATE_VALUES[b.state]}' for b in _breakers]
+    lines += [f"# HELP {opens} Aperture del circuito", f"# TYPE {opens} counter"]
+    lines += [f'{opens}{{engine="{b.name}"}} {b.opens_total}' for b in _breakers]
+    lines += [f"# HELP {rejected} Richieste rifiutate a circuito aperto", f"# TYPE {rejected} counter"]
+    lines += [f'{rejected}{{engine="{b.name}"}} {b.rejected_total}' for b in _breakers]
+    return lines
+
+
+register_collector(_render_breakers)
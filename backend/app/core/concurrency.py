@@ -0,0 +1,64 @@
+"""
+ASI-GEST Optimistic Concurrency
+© 2025 Enrico Callegaro - Tutti i diritti riservati.
+
+Fasi e Lotti hanno una colonna Versione (version_id_col SQLAlchemy):
+ogni UPDATE è emesso come `... WHERE ID = :id AND Versione = :v` e
+incrementa la versione. Se nessuna riga viene aggiornata SQLAlchemy
+solleva StaleDataError.
+
+La versione è esposta ai client come ETag; nelle richieste di modifica
+il client la rimanda con If-Match. In caso di conflitto si risponde 409.
+"""
+
+from typing import Optional
+
+from fastapi import HTTPException, Response
+
+
+def etag_for(versione: int) -> str:
+    """ETag (strong) corrispondente a una versione"""
+    return f'"{versione}"'
+
+
+def set_etag(response: Response, versione: int) -> None:
+    """Imposta l'header ETag sulla response"""
+    response.headers["ETag"] = etag_for(versione)
+
+
+def parse_if_match(if_match: Optional[str]) -> Optional[int]:
+    """
+    Estrae la versione dall'header If-Match.
+
+    Ritorna None se l'header è assente o vale "*" (nessun controllo).
+    Accetta sia ETag strong ("3") che weak (W/"3").
+    """
+    if if_match is None:
+        return None
+    value = if_match.strip()
+    if value == "*":
+        return None
+    if value.startswith("W/"):
+        value = value[2:]
+    value = value.strip('"')
+    try:
+        return int(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid If-Match header: {if_match}")
+
+
+def check_if_match(current_version: int, if_match: Optional[str]) -> None:
+    """Solleva 409 se If-Match non corrisponde alla versione corrente"""
+    expected = parse_if_match(if_match)
+    if expected is not None and expected != current_version:
+        raise_conflict(current_version)
+
+
+def raise_conflict(current_version: Optional[int] = None) -> None:
+    """Solleva 409 Conflict (modifica concorrente)"""
+    headers = {"ETag": etag_for(current_version)} if current_version is not None else None
+    raise HTTPException(
+        status_code=409,
+        detail="Conflict: resource was modified by another request. Reload and retry.",
+        headers=headers,
+    )
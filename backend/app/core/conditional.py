@@ -0,0 +1,83 @@
+"""
+ASI-GEST GET condizionali sulle liste
+© 2025 Enrico Callegaro - Tutti i diritti riservati.
+
+Le dashboard rileggono lotti, fasi e commesse ogni 30 secondi anche quando
+nulla è cambiato. Le liste espongono un ETag (weak) e rispondono 304 Not
+Modified se il client rimanda lo stesso valore in If-None-Match: niente
+lettura della pagina, niente serializzazione, corpo vuoto.
+
+ETag delle liste ASI_GEST: numero di righe e DataModifica massima della
+query filtrata (lette con lo stesso statement del conteggio, quindi senza
+query aggiuntive) più filtri e paginazione. Un inserimento o una modifica
+spostano la DataModifica massima, una cancellazione cambia il conteggio.
+
+Per le liste del gestionale, dove non c'è un validatore affidabile (es. i
+nomi cliente vengono da un'altra tabella), l'ETag è l'hash del corpo: si
+risparmia la banda, non la query.
+
+Last-Modified viene inviato come informazione ma If-Modified-Since non
+viene valutato: una cancellazione non sposta la DataModifica massima,
+quindi solo l'ETag è un validatore corretto.
+"""
+
+import calendar
+import hashlib
+from datetime import datetime
+from email.utils import formatdate
+from typing import Any, Optional
+
+from fastapi import Response
+
+# Il client deve sempre rivalidare (If-None-Match) prima di usare la copia in cache
+CACHE_CONTROL = "no-cache"
+
+
+def list_etag(total: int, last_modified: Optional[datetime], *parts: Any) -> str:
+    """
+    ETag weak di una lista.
+
+    Parametri:
+    - total: righe della query filtrata
+    - last_modified: DataModifica massima della query filtrata
+    - parts: nome della lista, filtri e paginazione
+    """
+    key = "|".join(str(part) for part in (total, last_modified and last_modified.isoformat(), *parts))
+    return body_etag(key.encode())
+
+
+def body_etag(body: bytes) -> str:
+    """ETag weak dal contenuto"""
+    return f'W/"{hashlib.sha1(body).hexdigest()[:20]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    True se If-None-Match contiene etag (confronto weak, come da RFC 9110).
+
+    Accetta "*" e liste di ETag separate da virgole.
+    """
+    if not if_none_match:
+        return False
+    opaque = etag.removeprefix("W/")
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == opaque:
+            return True
+    return False
+
+
+def set_list_validators(response: Response, etag: str, last_modified: Optional[datetime] = None) -> None:
+    """Imposta ETag, Last-Modified e Cache-Control sulla response"""
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    if last_modified is not None:
+        # DataModifica è salvata in UTC senza timezone
+        response.headers["Last-Modified"] = formatdate(calendar.timegm(last_modified.utctimetuple()), usegmt=True)
+
+
+def not_modified(etag: str, last_modified: Optional[datetime] = None) -> Response:
+    """Risposta 304 (senza corpo) con gli stessi validatori"""
+    response = Response(status_code=304)
+    set_list_validators(response, etag, last_modified)
+    return response
@@ -3,8 +3,64 @@ ASI-GEST Configuration
 © 2025 Enrico Callegaro - Tutti i diritti riservati.
 """
 
+from urllib.parse import quote_plus
+
+from pydantic import model_validator
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Literal, Optional
+
+
+# Valori di default per profilo di esecuzione.
+# Ogni valore può essere sovrascritto esplicitamente da variabile d'ambiente.
+PROFILE_DEFAULTS = {
+    "dev": {
+        "DEBUG": True,
+        "DB_ECHO": True,
+        "RELOAD": True,
+        "WORKERS": 1,
+        "LOG_LEVEL": "DEBUG",
+        "DB_ASI_GEST_POOL_SIZE": 5,
+        "DB_ASI_GEST_MAX_OVERFLOW": 10,
+        "DB_ASI_GEST_ASYNC_POOL_SIZE": 3,
+        "DB_ASI_GEST_ASYNC_MAX_OVERFLOW": 5,
+        "DB_ASITRON_POOL_SIZE": 2,
+        "DB_ASITRON_MAX_OVERFLOW": 5,
+        "DB_POOL_RECYCLE": 1800,
+        "DB_POOL_TIMEOUT": 30,
+    },
+    "test": {
+        "DEBUG": False,
+        "DB_ECHO": False,
+        "RELOAD": False,
+        "WORKERS": 1,
+        "LOG_LEVEL": "WARNING",
+        "DB_ASI_GEST_POOL_SIZE": 5,
+        "DB_ASI_GEST_MAX_OVERFLOW": 5,
+        "DB_ASI_GEST_ASYNC_POOL_SIZE": 2,
+        "DB_ASI_GEST_ASYNC_MAX_OVERFLOW": 3,
+        "DB_ASITRON_POOL_SIZE": 2,
+        "DB_ASITRON_MAX_OVERFLOW": 2,
+        "DB_POOL_RECYCLE": 1800,
+        "DB_POOL_TIMEOUT": 10,
+    },
+    "prod": {
+        "DEBUG": False,
+        "DB_ECHO": False,
+        "RELOAD": False,
+        "WORKERS": 4,
+        "LOG_LEVEL": "INFO",
+        "DB_ASI_GEST_POOL_SIZE": 10,
+        "DB_ASI_GEST_MAX_OVERFLOW": 20,
+        "DB_ASI_GEST_ASYNC_POOL_SIZE": 5,
+        "DB_ASI_GEST_ASYNC_MAX_OVERFLOW": 10,
+        "DB_ASITRON_POOL_SIZE": 5,
+        "DB_ASITRON_MAX_OVERFLOW": 10,
+        "DB_POOL_RECYCLE": 1800,
+        "DB_POOL_TIMEOUT": 10,
+    },
+}
+
+LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
 
 
 class Settings(BaseSettings):
@@ -13,21 +69,131 @@ class Settings(BaseSettings):
     # Application
     APP_NAME: str = "ASI-GEST"
     APP_VERSION: str = "1.0.0"
-    DEBUG: bool = True
+
+    # Profilo di esecuzione: dev, test, prod (vedi PROFILE_DEFAULTS)
+    PROFILE: Literal["dev", "test", "prod"] = "dev"
+
+    # Valori None = default del profilo
+    DEBUG: Optional[bool] = None
+    DB_ECHO: Optional[bool] = None
+    RELOAD: Optional[bool] = None
+    WORKERS: Optional[int] = None
+    LOG_LEVEL: Optional[str] = None
+
+    # Pool connessioni
+    DB_ASI_GEST_POOL_SIZE: Optional[int] = None
+    DB_ASI_GEST_MAX_OVERFLOW: Optional[int] = None
+    # Pool separato dell'engine async ASI_GEST (route async def): le connessioni
+    # verso ASI_GEST per worker sono al massimo la somma dei due pool
+    DB_ASI_GEST_ASYNC_POOL_SIZE: Optional[int] = None
+    DB_ASI_GEST_ASYNC_MAX_OVERFLOW: Optional[int] = None
+    DB_ASITRON_POOL_SIZE: Optional[int] = None
+    DB_ASITRON_MAX_OVERFLOW: Optional[int] = None
+    DB_POOL_RECYCLE: Optional[int] = None  # secondi
+    DB_POOL_TIMEOUT: Optional[int] = None  # secondi di attesa per una connessione libera
 
     # Database ASI_GEST (read-write)
-    DB_ASI_GEST_SERVER: str
+    # Le credenziali sono verificate alla creazione dell'engine (o all'avvio
+    # con PROFILE=prod): importare l'applicazione non le richiede.
+    DB_ASI_GEST_SERVER: Optional[str] = None
     DB_ASI_GEST_PORT: int = 1433
     DB_ASI_GEST_DATABASE: str = "ASI_GEST"
-    DB_ASI_GEST_USER: str
-    DB_ASI_GEST_PASSWORD: str
+    DB_ASI_GEST_USER: Optional[str] = None
+    DB_ASI_GEST_PASSWORD: Optional[str] = None
+    # URL SQLAlchemy completo al posto di SERVER/USER/PASSWORD
+    # (es. sqlite:///./bench.db per benchmark e sviluppo locale)
+    DB_ASI_GEST_URL: Optional[str] = None
+    # Driver async (route async def): mssql+aioodbc tramite questo driver ODBC.
+    # DB_ASI_GEST_ASYNC_URL sostituisce l'URL calcolato (es. sqlite+aiosqlite:///./bench.db)
+    DB_ASI_GEST_ODBC_DRIVER: str = "ODBC Driver 18 for SQL Server"
+    DB_ASI_GEST_ASYNC_URL: Optional[str] = None
+    # Isolamento per le letture di reportistica (SNAPSHOT, READ COMMITTED, ...)
+    # SNAPSHOT richiede ALLOW_SNAPSHOT_ISOLATION ON sul database
+    DB_ASI_GEST_READ_ISOLATION: str = "SNAPSHOT"
 
     # Database ASITRON gestionale (read-only)
-    DB_ASITRON_SERVER: str
+    DB_ASITRON_SERVER: Optional[str] = None
     DB_ASITRON_PORT: int = 1433
     DB_ASITRON_DATABASE: str = "ASITRON"
-    DB_ASITRON_USER: str
-    DB_ASITRON_PASSWORD: str
+    DB_ASITRON_USER: Optional[str] = None
+    DB_ASITRON_PASSWORD: Optional[str] = None
+    DB_ASITRON_URL: Optional[str] = None
+    # ASITRON fittizio su SQLite (DB_ASITRON_URL=sqlite:///...), vedi app/core/fake_asitron.py
+    FAKE_ASITRON_LATENCY_MS: float = 0.0  # latenza aggiunta a ogni statement
+    FAKE_ASITRON_JITTER_MS: float = 0.0  # variazione casuale ± sulla latenza
+    FAKE_ASITRON_FAILURE_RATE: float = 0.0  # quota di statement che falliscono (0-1)
+
+    # Warm-up connessioni all'avvio (in parallelo su entrambi i database)
+    DB_WARMUP_ON_STARTUP: bool = True
+    DB_WARMUP_TIMEOUT: float = 10.0  # secondi, oltre i quali l'avvio prosegue
+
+    # Admission control per classe di priorità (vedi app/core/admission.py)
+    # Valori None: derivati dai pool ASI_GEST sync e async (pool_size + max_overflow)
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_MAX_CONCURRENT: Optional[int] = None
+    ADMISSION_RESERVED_CRITICAL: Optional[int] = None  # default: 1/5 della capacità
+    ADMISSION_REPORTING_MAX: Optional[int] = None  # default: metà della capacità
+    ADMISSION_MAX_QUEUE: int = 100  # richieste in coda per classe
+    ADMISSION_QUEUE_TIMEOUT_CRITICAL: float = 10.0  # secondi
+    ADMISSION_QUEUE_TIMEOUT_INTERACTIVE: float = 3.0
+    ADMISSION_QUEUE_TIMEOUT_REPORTING: float = 0.5
+
+    # Health check approfondito /health/deep (vedi app/core/health.py)
+    HEALTH_CHECK_ENABLED: bool = True
+    HEALTH_CHECK_INTERVAL: float = 15.0  # secondi fra due controlli in background
+    HEALTH_POOL_SATURATION_WARN: float = 0.9  # oltre questa quota del pool: degraded
+
+    # Tracciamento SQL per richiesta (vedi app/core/sql_tracking.py)
+    SQL_TRACKING_ENABLED: bool = True
+    SQL_SLOW_QUERY_MS: int = 200
+    SQL_N_PLUS_ONE_THRESHOLD: int = 5
+
+    # Tracing richieste (vedi app/core/tracing.py)
+    TRACE_SAMPLE_RATE: float = 0.0  # 0 = spento, 1 = tutte le richieste
+    TRACE_EXPORTER: Literal["jsonl", "console"] = "jsonl"
+    TRACE_FILE: str = "logs/traces.jsonl"
+
+    # Amministrazione e profiling su richiesta (vedi app/core/profiling.py)
+    ADMIN_TOKEN: Optional[str] = None  # header X-Admin-Token / X-Profile-Token
+    PROFILING_ENABLED: bool = False
+    PROFILING_SAMPLE_RATE: float = 0.0
+    PROFILING_DIR: str = "logs/profiles"
+    PROFILING_MAX_FILES: int = 50
+
+    # Join ASI_GEST ↔ ASITRON (testate commesse ERP)
+    ERP_CACHE_TTL_SECONDS: int = 300
+    ERP_CACHE_MAX_ENTRIES: int = 20000
+    ERP_IN_CHUNK_SIZE: int = 1000  # SQL Server: max 2100 parametri per statement
+
+    # Circuit breaker ASITRON e fallback su ultimo risultato valido
+    ERP_BREAKER_FAILURE_THRESHOLD: int = 5  # errori di connessione consecutivi
+    ERP_BREAKER_RESET_SECONDS: float = 30.0  # cool-down prima di una nuova prova
+    ERP_STALE_MAX_AGE_SECONDS: int = 86400  # età massima dei risultati serviti come stale
+    ERP_STALE_MAX_ENTRIES: int = 500
+
+    # Compressione risposte (vedi app/core/compression.py)
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MIN_SIZE: int = 1024  # byte: sotto la soglia il corpo non viene compresso
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4  # solo con il package brotli installato
+
+    # Sincronizzazione delta delle liste, ?modified_since= (vedi app/services/delta_sync.py)
+    DELTA_SYNC_SAFETY_SECONDS: float = 5.0  # il watermark resta indietro di questo margine
+    DELTA_SYNC_TOMBSTONE_DAYS: int = 30  # oltre: 410, il client ricarica la lista completa
+    DELTA_SYNC_MAX_ROWS: int = 5000  # righe cambiate oltre le quali si chiede il ricaricamento
+
+    # Letture a blocchi per ID, /bulk (vedi app/services/bulk_get.py)
+    BULK_MAX_IDS: int = 5000
+    BULK_IN_CHUNK_SIZE: int = 1000  # SQL Server: max 2100 parametri per statement
+
+    # Export in streaming delle liste, /export (vedi app/core/streaming.py)
+    EXPORT_BATCH_SIZE: int = 1000  # righe lette, validate e inviate per blocco (yield_per)
+
+    # Cache ConfigJSON (per ConfigCommessaID)
+    CONFIG_CACHE_MAX_ENTRIES: int = 5000
+
+    # Riconciliazione quantità Fasi/Lotti
+    RICONCILIAZIONE_BATCH_SIZE: int = 500
 
     # CORS
     CORS_ORIGINS: List[str] = ["http://localhost:5173", "http://localhost:3000"]
@@ -36,22 +202,146 @@ class Settings(BaseSettings):
     HOST: str = "0.0.0.0"
     PORT: int = 8000
 
+    def missing_credentials(self, prefix: str) -> list[str]:
+        """Variabili di connessione non impostate per DB_ASI_GEST o DB_ASITRON"""
+        if getattr(self, f"{prefix}_URL"):
+            return []
+        return [
+            f"{prefix}_{key}" for key in ("SERVER", "USER", "PASSWORD")
+            if not getattr(self, f"{prefix}_{key}")
+        ]
+
+    def _require_credentials(self, prefix: str) -> None:
+        missing = self.missing_credentials(prefix)
+        if missing:
+            raise RuntimeError(f"Configurazione database mancante: {', '.join(missing)}")
+
     @property
     def asi_gest_connection_string(self) -> str:
         """Connection string for ASI_GEST database (read-write)"""
+        if self.DB_ASI_GEST_URL:
+            return self.DB_ASI_GEST_URL
+        self._require_credentials("DB_ASI_GEST")
         return (
             f"mssql+pymssql://{self.DB_ASI_GEST_USER}:{self.DB_ASI_GEST_PASSWORD}"
             f"@{self.DB_ASI_GEST_SERVER}:{self.DB_ASI_GEST_PORT}/{self.DB_ASI_GEST_DATABASE}"
         )
 
+    @property
+    def asi_gest_async_connection_string(self) -> str:
+        """Connection string async for ASI_GEST database (read-write)"""
+        if self.DB_ASI_GEST_ASYNC_URL:
+            return self.DB_ASI_GEST_ASYNC_URL
+        self._require_credentials("DB_ASI_GEST")
+        driver = quote_plus(self.DB_ASI_GEST_ODBC_DRIVER)
+        return (
+            f"mssql+aioodbc://{self.DB_ASI_GEST_USER}:{quote_plus(self.DB_ASI_GEST_PASSWORD)}"
+            f"@{self.DB_ASI_GEST_SERVER}:{self.DB_ASI_GEST_PORT}/{self.DB_ASI_GEST_DATABASE}"
+            f"?driver={driver}&TrustServerCertificate=yes"
+        )
+
     @property
     def asitron_connection_string(self) -> str:
         """Connection string for ASITRON gestionale (read-only)"""
+        if self.DB_ASITRON_URL:
+            return self.DB_ASITRON_URL
+        self._require_credentials("DB_ASITRON")
         return (
             f"mssql+pymssql://{self.DB_ASITRON_USER}:{self.DB_ASITRON_PASSWORD}"
             f"@{self.DB_ASITRON_SERVER}:{self.DB_ASITRON_PORT}/{self.DB_ASITRON_DATABASE}"
         )
 
+    @property
+    def asi_gest_max_connections(self) -> int:
+        """
+        Connessioni ASI_GEST al massimo aperte da un worker: pool sync
+        (route def) più pool async (route async def). Il totale verso
+        SQL Server è questo valore per WORKERS.
+        """
+        return (
+            self.DB_ASI_GEST_POOL_SIZE + self.DB_ASI_GEST_MAX_OVERFLOW
+            + self.DB_ASI_GEST_ASYNC_POOL_SIZE + self.DB_ASI_GEST_ASYNC_MAX_OVERFLOW
+        )
+
+    @model_validator(mode="after")
+    def apply_profile(self) -> "Settings":
+        """
+        Completa i valori non impostati con i default del profilo e
+        blocca l'avvio su combinazioni non sicure.
+        """
+        for key, value in PROFILE_DEFAULTS[self.PROFILE].items():
+            if getattr(self, key) is None:
+                setattr(self, key, value)
+
+        self.LOG_LEVEL = self.LOG_LEVEL.upper()
+
+        if self.ADMISSION_MAX_CONCURRENT is None:
+            self.ADMISSION_MAX_CONCURRENT = self.asi_gest_max_connections
+        if self.ADMISSION_RESERVED_CRITICAL is None:
+            self.ADMISSION_RESERVED_CRITICAL = max(1, self.ADMISSION_MAX_CONCURRENT // 5)
+        if self.ADMISSION_REPORTING_MAX is None:
+            self.ADMISSION_REPORTING_MAX = max(1, self.ADMISSION_MAX_CONCURRENT // 2)
+
+        errors = []
+        if self.LOG_LEVEL not in LOG_LEVELS:
+            errors.append(f"LOG_LEVEL={self.LOG_LEVEL} non valido ({', '.join(LOG_LEVELS)})")
+        if not 0.0 <= self.TRACE_SAMPLE_RATE <= 1.0:
+            errors.append("TRACE_SAMPLE_RATE deve essere fra 0 e 1")
+        if not 0.0 <= self.PROFILING_SAMPLE_RATE <= 1.0:
+            errors.append("PROFILING_SAMPLE_RATE deve essere fra 0 e 1")
+        if not 0.0 <= self.FAKE_ASITRON_FAILURE_RATE <= 1.0:
+            errors.append("FAKE_ASITRON_FAILURE_RATE deve essere fra 0 e 1")
+        if self.FAKE_ASITRON_LATENCY_MS < 0 or self.FAKE_ASITRON_JITTER_MS < 0:
+            errors.append("FAKE_ASITRON_LATENCY_MS e FAKE_ASITRON_JITTER_MS devono essere >= 0")
+        if not 1 <= self.COMPRESSION_GZIP_LEVEL <= 9:
+            errors.append("COMPRESSION_GZIP_LEVEL deve essere fra 1 e 9")
+        if not 0 <= self.COMPRESSION_BROTLI_QUALITY <= 11:
+            errors.append("COMPRESSION_BROTLI_QUALITY deve essere fra 0 e 11")
+        if self.DELTA_SYNC_SAFETY_SECONDS < 0:
+            errors.append("DELTA_SYNC_SAFETY_SECONDS deve essere >= 0")
+        if self.DELTA_SYNC_TOMBSTONE_DAYS < 1 or self.DELTA_SYNC_MAX_ROWS < 1:
+            errors.append("DELTA_SYNC_TOMBSTONE_DAYS e DELTA_SYNC_MAX_ROWS devono essere >= 1")
+        if self.EXPORT_BATCH_SIZE < 1:
+            errors.append("EXPORT_BATCH_SIZE deve essere >= 1")
+        if self.BULK_MAX_IDS < 1 or not 1 <= self.BULK_IN_CHUNK_SIZE <= 2000:
+            errors.append("BULK_MAX_IDS deve essere >= 1 e BULK_IN_CHUNK_SIZE fra 1 e 2000")
+        if not 0 <= self.ADMISSION_RESERVED_CRITICAL < self.ADMISSION_MAX_CONCURRENT:
+            errors.append("ADMISSION_RESERVED_CRITICAL deve essere fra 0 e ADMISSION_MAX_CONCURRENT - 1")
+        if self.ADMISSION_REPORTING_MAX < 1:
+            errors.append("ADMISSION_REPORTING_MAX deve essere >= 1")
+        if self.ERP_BREAKER_FAILURE_THRESHOLD < 1:
+            errors.append("ERP_BREAKER_FAILURE_THRESHOLD deve essere >= 1")
+        if self.HEALTH_CHECK_INTERVAL <= 0:
+            errors.append("HEALTH_CHECK_INTERVAL deve essere > 0")
+        if self.DB_WARMUP_TIMEOUT <= 0:
+            errors.append("DB_WARMUP_TIMEOUT deve essere > 0")
+        if self.ADMIN_TOKEN is not None and len(self.ADMIN_TOKEN) < 16:
+            errors.append("ADMIN_TOKEN deve avere almeno 16 caratteri")
+        if self.WORKERS < 1:
+            errors.append("WORKERS deve essere >= 1")
+        if self.RELOAD and self.WORKERS > 1:
+            errors.append("RELOAD non è compatibile con WORKERS > 1")
+        for key in ("DB_ASI_GEST_POOL_SIZE", "DB_ASI_GEST_ASYNC_POOL_SIZE", "DB_ASITRON_POOL_SIZE", "DB_POOL_TIMEOUT"):
+            if getattr(self, key) < 1:
+                errors.append(f"{key} deve essere >= 1")
+        for key in ("DB_ASI_GEST_MAX_OVERFLOW", "DB_ASI_GEST_ASYNC_MAX_OVERFLOW", "DB_ASITRON_MAX_OVERFLOW"):
+            if getattr(self, key) < 0:
+                errors.append(f"{key} deve essere >= 0")
+
+        if self.PROFILE == "prod":
+            for key in ("DEBUG", "DB_ECHO", "RELOAD"):
+                if getattr(self, key):
+                    errors.append(f"{key}=True non ammesso con PROFILE=prod")
+            if self.LOG_LEVEL == "DEBUG":
+                errors.append("LOG_LEVEL=DEBUG non ammesso con PROFILE=prod")
+            for prefix in ("DB_ASI_GEST", "DB_ASITRON"):
+                for key in self.missing_credentials(prefix):
+                    errors.append(f"{key} obbligatorio con PROFILE=prod")
+
+        if errors:
+            raise ValueError("Configurazione non valida: " + "; ".join(errors))
+        return self
+
     class Config:
         env_file = ".env"
         case_sensitive = True
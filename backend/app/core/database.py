@@ -7,31 +7,112 @@ Due database:
 - ASITRON: Read-Only (per consultazione gestionale)
 """
 
-from sqlalchemy import create_engine
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import AsyncGenerator, Generator, Iterator
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
-from typing import Generator
 
+from .circuit_breaker import CircuitBreaker, instrument_breaker
 from .config import settings
+from .fake_asitron import instrument_fake_asitron
+from .metrics import (
+    InstrumentedAsyncAdaptedQueuePool,
+    InstrumentedQueuePool,
+    add_checkout_observer,
+    instrument_engine,
+)
+from .sql_tracking import instrument_sql
+from .tracing import instrument_tracing_sql, trace_pool_checkout
+
+# Gli engine vengono creati al primo utilizzo (o dal warm-up nel lifespan):
+# importare app.* non apre connessioni né richiede le credenziali dei
+# database, così script, test e CLI partono senza pagare la creazione
+# dei pool.
+_engines: dict[str, Engine] = {}
+_engines_lock = threading.Lock()
+
+Base = declarative_base()
+
+# Session factory senza bind: il bind viene impostato alla creazione dell'engine
+SessionLocalAsiGest = sessionmaker(autocommit=False, autoflush=False)
+SessionLocalAsiGestRead = sessionmaker(autocommit=False, autoflush=False)
+SessionLocalAsitron = sessionmaker(autocommit=False, autoflush=False)
+
+# Span db.pool.checkout per tutti i pool instrumentati, registrato una volta
+# sola all'import: non dipende da quale engine viene creato per primo
+if settings.TRACE_SAMPLE_RATE > 0:
+    add_checkout_observer(trace_pool_checkout)
+
+
+def _create_engine(name: str, url: str, pool_size: int, max_overflow: int) -> Engine:
+    connect_args = {}
+    if make_url(url).get_backend_name() == "sqlite":
+        # Database locale (benchmark, sviluppo): connessioni usate da più thread
+        connect_args["check_same_thread"] = False
+    engine = create_engine(
+        url,
+        connect_args=connect_args,
+        echo=settings.DB_ECHO,
+        pool_pre_ping=True,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        poolclass=InstrumentedQueuePool,
+    )
+    instrument_engine(engine, name)
+    if settings.SQL_TRACKING_ENABLED:
+        instrument_sql(engine, name)
+    if settings.TRACE_SAMPLE_RATE > 0:
+        instrument_tracing_sql(engine, name)
+    return engine
+
 
 # ========================================
 # ASI_GEST Database (Read-Write)
 # ========================================
-engine_asi_gest = create_engine(
-    settings.asi_gest_connection_string,
-    echo=settings.DEBUG,
-    pool_pre_ping=True,
-    pool_size=10,
-    max_overflow=20,
-)
+def get_engine_asi_gest() -> Engine:
+    """Engine ASI_GEST (creato al primo utilizzo)"""
+    engine = _engines.get("asi_gest")
+    if engine is not None:
+        return engine
 
-SessionLocalAsiGest = sessionmaker(
-    autocommit=False,
-    autoflush=False,
-    bind=engine_asi_gest
-)
+    with _engines_lock:
+        if "asi_gest" not in _engines:
+            engine = _create_engine(
+                "asi_gest",
+                settings.asi_gest_connection_string,
+                settings.DB_ASI_GEST_POOL_SIZE,
+                settings.DB_ASI_GEST_MAX_OVERFLOW,
+            )
+            # Letture di reportistica: stesso pool, ma ogni connessione lavora
+            # con isolamento SNAPSHOT. Le query di lista/aggregazione leggono
+            # una versione consistente delle righe senza prendere lock
+            # condivisi su Lotti/Fasi, quindi non bloccano (e non vengono
+            # bloccate da) apertura e chiusura lotti.
+            read_engine = engine
+            if settings.DB_ASI_GEST_READ_ISOLATION and engine.dialect.name == "mssql":
+                read_engine = engine.execution_options(
+                    isolation_level=settings.DB_ASI_GEST_READ_ISOLATION
+                )
+            SessionLocalAsiGest.configure(bind=engine)
+            SessionLocalAsiGestRead.configure(bind=read_engine)
+            _engines["asi_gest_read"] = read_engine
+            _engines["asi_gest"] = engine
+    return _engines["asi_gest"]
 
-Base = declarative_base()
+
+def get_engine_asi_gest_read() -> Engine:
+    """Engine ASI_GEST per le letture (isolamento DB_ASI_GEST_READ_ISOLATION)"""
+    get_engine_asi_gest()
+    return _engines["asi_gest_read"]
 
 
 def get_db_asi_gest() -> Generator[Session, None, None]:
@@ -43,6 +124,7 @@ def get_db_asi_gest() -> Generator[Session, None, None]:
         def read_root(db: Session = Depends(get_db_asi_gest)):
             ...
     """
+    get_engine_asi_gest()
     db = SessionLocalAsiGest()
     try:
         yield db
@@ -51,32 +133,184 @@ def get_db_asi_gest() -> Generator[Session, None, None]:
 
 
 # ========================================
-# ASITRON Gestionale (Read-Only)
+# ASI_GEST Database (letture di reportistica)
 # ========================================
-engine_asitron = create_engine(
-    settings.asitron_connection_string,
-    echo=settings.DEBUG,
-    pool_pre_ping=True,
-    pool_size=5,
-    max_overflow=10,
-)
+@event.listens_for(SessionLocalAsiGestRead, "before_flush")
+def _reject_writes(session, flush_context, instances):
+    raise RuntimeError("Sessione ASI_GEST di sola lettura: usare get_db_asi_gest per le scritture")
 
-SessionLocalAsitron = sessionmaker(
-    autocommit=False,
+
+def get_db_asi_gest_read() -> Generator[Session, None, None]:
+    """
+    Dependency per ottenere sessione database ASI_GEST di sola lettura
+    (isolamento snapshot), per liste, statistiche e report.
+
+    Uso:
+        @app.get("/report")
+        def report(db: Session = Depends(get_db_asi_gest_read)):
+            ...
+    """
+    get_engine_asi_gest()
+    db = SessionLocalAsiGestRead()
+    try:
+        yield db
+    finally:
+        db.rollback()
+        db.close()
+
+
+# ========================================
+# ASI_GEST Database (async, per route async def)
+# ========================================
+# Le route async non occupano un thread del threadpool durante le query:
+# la concorrenza è limitata dal pool di connessioni, non dai thread.
+# expire_on_commit=False: in async non è possibile ricaricare gli attributi
+# in modo implicito dopo il commit.
+class _AsyncReadSession(Session):
+    """Sessione sync sottostante alle AsyncSession di sola lettura"""
+
+
+event.listen(_AsyncReadSession, "before_flush", _reject_writes)
+
+AsyncSessionLocalAsiGest = async_sessionmaker(autoflush=False, expire_on_commit=False)
+AsyncSessionLocalAsiGestRead = async_sessionmaker(
     autoflush=False,
-    bind=engine_asitron
+    expire_on_commit=False,
+    sync_session_class=_AsyncReadSession,
 )
 
+_async_engines: dict[str, AsyncEngine] = {}
 
-def get_db_asitron() -> Generator[Session, None, None]:
+
+def get_async_engine_asi_gest() -> AsyncEngine:
     """
-    Dependency per ottenere sessione database ASITRON gestionale (read-only).
+    Engine async ASI_GEST (creato al primo utilizzo).
+
+    Ha un pool proprio (DB_ASI_GEST_ASYNC_POOL_SIZE + DB_ASI_GEST_ASYNC_MAX_OVERFLOW)
+    separato da quello sync: le connessioni ASI_GEST di un worker sono al
+    massimo settings.asi_gest_max_connections, la somma dei due pool.
+    """
+    engine = _async_engines.get("asi_gest")
+    if engine is not None:
+        return engine
+
+    with _engines_lock:
+        if "asi_gest" not in _async_engines:
+            url = make_url(settings.asi_gest_async_connection_string)
+            # Pool esplicito anche su SQLite (aiosqlite userebbe NullPool),
+            # come l'engine sync: stesse metriche sul database di benchmark
+            engine = create_async_engine(
+                url,
+                echo=settings.DB_ECHO,
+                pool_pre_ping=True,
+                pool_size=settings.DB_ASI_GEST_ASYNC_POOL_SIZE,
+                max_overflow=settings.DB_ASI_GEST_ASYNC_MAX_OVERFLOW,
+                pool_recycle=settings.DB_POOL_RECYCLE,
+                pool_timeout=settings.DB_POOL_TIMEOUT,
+                poolclass=InstrumentedAsyncAdaptedQueuePool,
+            )
+            # Gli eventi SQLAlchemy si registrano sull'engine sync sottostante:
+            # attesa al checkout e pre-ping come per i pool sync
+            instrument_engine(engine.sync_engine, "asi_gest_async")
+            if settings.SQL_TRACKING_ENABLED:
+                instrument_sql(engine.sync_engine, "asi_gest_async")
+            if settings.TRACE_SAMPLE_RATE > 0:
+                instrument_tracing_sql(engine.sync_engine, "asi_gest_async")
+
+            read_engine = engine
+            if settings.DB_ASI_GEST_READ_ISOLATION and url.get_backend_name() == "mssql":
+                read_engine = engine.execution_options(
+                    isolation_level=settings.DB_ASI_GEST_READ_ISOLATION
+                )
+            AsyncSessionLocalAsiGest.configure(bind=engine)
+            AsyncSessionLocalAsiGestRead.configure(bind=read_engine)
+            _async_engines["asi_gest"] = engine
+    return _async_engines["asi_gest"]
+
+
+async def get_async_db_asi_gest() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependency per ottenere sessione async database ASI_GEST.
 
     Uso:
-        @app.get("/gestionale/articoli")
-        def get_articoli(db: Session = Depends(get_db_asitron)):
+        @app.get("/")
+        async def read_root(db: AsyncSession = Depends(get_async_db_asi_gest)):
             ...
     """
+    get_async_engine_asi_gest()
+    async with AsyncSessionLocalAsiGest() as db:
+        yield db
+
+
+async def get_async_db_asi_gest_read() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependency per ottenere sessione async ASI_GEST di sola lettura
+    (isolamento snapshot su SQL Server), per liste e report.
+    """
+    get_async_engine_asi_gest()
+    async with AsyncSessionLocalAsiGestRead() as db:
+        try:
+            yield db
+        finally:
+            await db.rollback()
+
+
+async def dispose_async_engines() -> None:
+    """Chiude i pool async (da chiamare allo shutdown)"""
+    for engine in list(_async_engines.values()):
+        await engine.dispose()
+    _async_engines.clear()
+
+
+# ========================================
+# ASITRON Gestionale (Read-Only)
+# ========================================
+# Con il gestionale irraggiungibile le richieste falliscono subito
+# (CircuitOpenError) invece di attendere il timeout di connessione.
+breaker_asitron = CircuitBreaker(
+    "asitron",
+    failure_threshold=settings.ERP_BREAKER_FAILURE_THRESHOLD,
+    reset_timeout=settings.ERP_BREAKER_RESET_SECONDS,
+)
+
+def get_engine_asitron() -> Engine:
+    """Engine ASITRON (creato al primo utilizzo)"""
+    engine = _engines.get("asitron")
+    if engine is not None:
+        return engine
+
+    with _engines_lock:
+        if "asitron" not in _engines:
+            engine = _create_engine(
+                "asitron",
+                settings.asitron_connection_string,
+                settings.DB_ASITRON_POOL_SIZE,
+                settings.DB_ASITRON_MAX_OVERFLOW,
+            )
+            if engine.dialect.name == "sqlite":
+                # Gestionale fittizio locale: shim SQL Server e guasti simulati
+                instrument_fake_asitron(engine)
+            instrument_breaker(engine, breaker_asitron)
+            SessionLocalAsitron.configure(bind=engine)
+            _engines["asitron"] = engine
+    return _engines["asitron"]
+
+
+@contextmanager
+def asitron_session() -> Iterator[Session]:
+    """
+    Sessione ASITRON aperta solo quando serve (es. con include_erp=true).
+
+    Le route che usano ASITRON solo su richiesta non dichiarano
+    get_db_asitron: senza include_erp non creano l'engine e funzionano
+    anche con ASITRON non configurato.
+
+    Uso:
+        if include_erp:
+            with asitron_session() as db_erp:
+                ...
+    """
+    get_engine_asitron()
     db = SessionLocalAsitron()
     try:
         yield db
@@ -84,6 +318,66 @@ def get_db_asitron() -> Generator[Session, None, None]:
         db.close()
 
 
+def get_db_asitron() -> Generator[Session, None, None]:
+    """
+    Dependency per ottenere sessione database ASITRON gestionale (read-only).
+
+    Uso:
+        @app.get("/gestionale/articoli")
+        def get_articoli(db: Session = Depends(get_db_asitron)):
+            ...
+    """
+    with asitron_session() as db:
+        yield db
+
+
+def __getattr__(name: str):
+    # Compatibilità: engine_asi_gest, engine_asi_gest_read, engine_asitron
+    getters = {
+        "engine_asi_gest": get_engine_asi_gest,
+        "engine_asi_gest_read": get_engine_asi_gest_read,
+        "engine_asitron": get_engine_asitron,
+    }
+    if name in getters:
+        return getters[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# ========================================
+# Warm-up all'avvio
+# ========================================
+def _warm_up(getter) -> float:
+    start = time.perf_counter()
+    with getter().connect() as connection:
+        connection.execute(text("SELECT 1"))
+    return time.perf_counter() - start
+
+
+def warm_up_engines(timeout: float) -> dict[str, dict]:
+    """
+    Crea gli engine e apre la prima connessione su ASI_GEST e ASITRON
+    in parallelo. Un database non raggiungibile non blocca l'avvio:
+    l'errore (o il timeout) viene riportato nel risultato.
+
+    Ritorna {engine: {"seconds": float | None, "error": str | None}}.
+    """
+    targets = {"asi_gest": get_engine_asi_gest, "asitron": get_engine_asitron}
+    executor = ThreadPoolExecutor(max_workers=len(targets), thread_name_prefix="db-warmup")
+    futures = {name: executor.submit(_warm_up, getter) for name, getter in targets.items()}
+    wait(futures.values(), timeout=timeout)
+    executor.shutdown(wait=False)
+
+    result: dict[str, dict] = {}
+    for name, future in futures.items():
+        if not future.done():
+            result[name] = {"seconds": None, "error": f"timeout dopo {timeout:g}s"}
+        elif future.exception() is not None:
+            result[name] = {"seconds": None, "error": str(future.exception()).splitlines()[0][:200]}
+        else:
+            result[name] = {"seconds": future.result(), "error": None}
+    return result
+
+
 def init_db_asi_gest():
     """
     Inizializza il database ASI_GEST creando tutte le tabelle.
@@ -94,5 +388,5 @@ def init_db_asi_gest():
         fase, lotto, documento_tecnico, log_evento
     )
 
-    Base.metadata.create_all(bind=engine_asi_gest)
+    Base.metadata.create_all(bind=get_engine_asi_gest())
     print("✅ Database ASI_GEST inizializzato")
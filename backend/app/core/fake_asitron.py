@@ -0,0 +1,112 @@
+"""
+ASI-GEST ASITRON fittizio
+© 2025 Enrico Callegaro - Tutti i diritti riservati.
+
+Permette di usare un database SQLite locale al posto del gestionale
+(DB_ASITRON_URL=sqlite:///...), per sviluppo, CI e test di carico senza
+l'ERP reale. Lo schema e i dati si creano con benchmarks.asitron_data.
+
+Sull'engine ASITRON SQLite vengono registrati:
+- uno shim di dialetto per l'SQL grezzo scritto per SQL Server
+  (SELECT TOP n → LIMIT n, prefisso schema dbo. rimosso)
+- l'iniezione di guasti: latenza fissa, jitter e una quota di statement
+  che falliscono con errore di connessione (OperationalError, conteggiato
+  dal circuit breaker come un gestionale irraggiungibile)
+
+I parametri di partenza vengono da FAKE_ASITRON_LATENCY_MS,
+FAKE_ASITRON_JITTER_MS e FAKE_ASITRON_FAILURE_RATE; durante un benchmark
+si possono cambiare al volo su `fake_asitron_faults`.
+"""
+
+import random
+import re
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .config import settings
+
+_TOP = re.compile(r"\bSELECT\s+TOP\s*\(?\s*(\d+)\s*\)?", re.IGNORECASE)
+_DBO = re.compile(r"\bdbo\.", re.IGNORECASE)
+
+
+@lru_cache(maxsize=512)
+def translate_mssql(statement: str) -> str:
+    """
+    Traduce in SQLite l'SQL grezzo scritto per SQL Server.
+
+    Gestisce un solo SELECT TOP per statement (le query del gestionale
+    non usano sottoquery con TOP).
+    """
+    translated = _DBO.sub("", statement)
+    match = _TOP.search(translated)
+    if match:
+        translated = translated[:match.start()] + "SELECT " + translated[match.end():]
+        translated = translated.rstrip().rstrip(";") + f"\nLIMIT {match.group(1)}"
+    return translated
+
+
+class FaultInjector:
+    """Latenza e guasti simulati per gli statement del gestionale fittizio"""
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, failure_rate: float = 0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self.statements_total = 0
+        self.failures_total = 0
+        self._rng = random.Random()
+        self._lock = threading.Lock()
+
+    def configure(self, **values) -> None:
+        """Aggiorna latency_ms, jitter_ms o failure_rate"""
+        for key, value in values.items():
+            if key not in ("latency_ms", "jitter_ms", "failure_rate"):
+                raise ValueError(f"Parametro non valido: {key}")
+            setattr(self, key, value)
+
+    def before_statement(self) -> None:
+        """Attende la latenza simulata; solleva OperationalError per un guasto"""
+        with self._lock:
+            self.statements_total += 1
+            delay = self.latency_ms + self._rng.uniform(-self.jitter_ms, self.jitter_ms)
+            fail = self.failure_rate > 0 and self._rng.random() < self.failure_rate
+            if fail:
+                self.failures_total += 1
+        if delay > 0:
+            time.sleep(delay / 1000)
+        if fail:
+            # Errore DBAPI: SQLAlchemy lo converte in exc.OperationalError
+            raise sqlite3.OperationalError("fake ASITRON: connection lost (injected failure)")
+
+
+fake_asitron_faults = FaultInjector(
+    latency_ms=settings.FAKE_ASITRON_LATENCY_MS,
+    jitter_ms=settings.FAKE_ASITRON_JITTER_MS,
+    failure_rate=settings.FAKE_ASITRON_FAILURE_RATE,
+)
+
+
+def instrument_fake_asitron(engine: Engine, faults: FaultInjector = fake_asitron_faults) -> None:
+    """Collega shim di dialetto e iniezione di guasti all'engine ASITRON SQLite"""
+
+    # In testa: tracking e tracing vedono lo statement già tradotto
+    @event.listens_for(engine, "before_cursor_execute", retval=True, insert=True)
+    def _translate(conn, cursor, statement, parameters, context, executemany):
+        return translate_mssql(statement), parameters
+
+    # Al posto del cursor.execute: la latenza rientra nel tempo SQL misurato
+    # e il guasto passa dalla gestione errori DBAPI (handle_error, breaker)
+    @event.listens_for(engine, "do_execute")
+    def _inject(cursor, statement, parameters, context):
+        faults.before_statement()
+        return False
+
+    @event.listens_for(engine, "do_execute_no_params")
+    def _inject_no_params(cursor, statement, context):
+        faults.before_statement()
+        return False
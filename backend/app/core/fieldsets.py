@@ -0,0 +1,102 @@
+"""
+ASI-GEST Sparse fieldset sulle liste
+© 2025 Enrico Callegaro - Tutti i diritti riservati.
+
+Le liste leggono e serializzano ogni colonna, compresi i campi Text (Note,
+ConfigJSON) anche quando al client servono solo ID e codice (es. una
+combo di selezione). Con ?fields=LottoID,Progressivo,DataInizio:
+
+- la SELECT legge solo le colonne richieste (load_only): i campi Text non
+  richiesti non vengono trasferiti da SQL Server
+- la risposta usa un modello ridotto con i soli campi richiesti, creato
+  una volta per combinazione e tenuto in cache
+
+La chiave primaria è sempre inclusa. I nomi validi sono i campi dello
+schema di risposta (LottoResponse, FaseResponse, ...); un nome sconosciuto
+dà 400 con l'elenco dei campi disponibili. I campi calcolati (es.
+Fase.Completata) dichiarano le colonne da cui dipendono.
+
+Le colonne non caricate hanno raiseload: un accesso imprevisto solleva
+un errore invece di una query per riga.
+"""
+
+from functools import lru_cache
+from typing import Any, Optional
+
+from fastapi import HTTPException
+from pydantic import BaseModel, ConfigDict, create_model
+from sqlalchemy import inspect
+from sqlalchemy.orm import load_only
+
+
+def parse_fields(
+    fields: Optional[str],
+    schema: type[BaseModel],
+    always: tuple[str, ...] = (),
+) -> Optional[tuple[str, ...]]:
+    """
+    Campi richiesti con ?fields=, nell'ordine dello schema.
+
+    Parametri:
+    - fields: valore del parametro (nomi separati da virgola), None = tutti
+    - schema: schema di risposta degli elementi
+    - always: campi sempre inclusi (chiave primaria, CommessaERP con include_erp)
+
+    Errori:
+    - 400: campi non presenti nello schema
+    """
+    if fields is None:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - schema.model_fields.keys()
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=(
+                f"Campi non validi: {', '.join(sorted(unknown))}. "
+                f"Campi disponibili: {', '.join(schema.model_fields)}"
+            ),
+        )
+    return tuple(name for name in schema.model_fields if name in requested or name in always)
+
+
+def load_only_fields(
+    model: Any,
+    selected: tuple[str, ...],
+    computed: Optional[dict[str, tuple[str, ...]]] = None,
+):
+    """
+    Opzione load_only per le colonne dei campi selezionati.
+
+    Parametri:
+    - model: modello ORM (Lotto, Fase, ...)
+    - selected: campi restituiti da parse_fields
+    - computed: campi calcolati → colonne da cui dipendono
+    """
+    columns = inspect(model).column_attrs.keys()
+    names = []
+    for name in selected:
+        for column in (computed or {}).get(name, (name,)):
+            if column in columns and column not in names:
+                names.append(column)
+    return load_only(*(getattr(model, name) for name in names), raiseload=True)
+
+
+@lru_cache(maxsize=256)
+def sparse_item(schema: type[BaseModel], selected: Optional[tuple[str, ...]]) -> type[BaseModel]:
+    """Schema ridotto ai campi selezionati (lo schema completo se None)"""
+    if selected is None:
+        return schema
+    return create_model(
+        f"{schema.__name__}Sparse",
+        __config__=ConfigDict(from_attributes=True),
+        **{name: (schema.model_fields[name].annotation, schema.model_fields[name]) for name in selected},
+    )
+
+
+@lru_cache(maxsize=256)
+def sparse_container(container: type[BaseModel], item: type[BaseModel]) -> type[BaseModel]:
+    """Schema lista/delta con items del tipo ridotto (invariato per lo schema completo)"""
+    if container.model_fields["items"].annotation == list[item]:
+        return container
+    return create_model(f"{container.__name__}Sparse", __base__=container, items=(list[item], ...))
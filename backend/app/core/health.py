@@ -0,0 +1,166 @@
+"""
+ASI-GEST Deep Health Check
+© 2025 Enrico Callegaro - Tutti i diritti riservati.
+
+Stato dei database per /health/deep, calcolato in background.
+
+Un thread esegue ogni HEALTH_CHECK_INTERVAL secondi:
+- SELECT 1 su ASI_GEST e ASITRON in parallelo (latenza, ultimo successo, errore)
+- stato dei pool di connessioni (saturazione = connessioni in uso / capacità)
+- sync lag: di quanto l'ultima modifica alle ConfigCommessa in ASI_GEST
+  è indietro rispetto all'ultima modifica delle commesse nel gestionale
+
+Le sonde del load balancer leggono solo l'ultimo snapshot in memoria,
+quindi non generano query e rispondono in pochi microsecondi.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Optional
+
+from sqlalchemy import DateTime, text
+from sqlalchemy.engine import Engine
+
+from .config import settings
+from .database import get_engine_asi_gest, get_engine_asitron
+from .metrics import pool_status
+
+logger = logging.getLogger("asigest.health")
+
+# Colonna tipizzata: datetime anche dove il driver restituisce stringhe (SQLite)
+_ASI_GEST_LAST_CHANGE_SQL = text(
+    "SELECT MAX(DataModifica) AS last_change FROM ConfigCommessa"
+).columns(last_change=DateTime)
+_ASITRON_LAST_CHANGE_SQL = text(
+    "SELECT MAX(DATAMODIFICA) AS last_change FROM dbo.AnagraficaCommesse"
+).columns(last_change=DateTime)
+
+
+class DependencyCheck:
+    """Esito dei controlli su un database"""
+
+    def __init__(self, name: str, getter: Callable[[], Engine], last_change_sql):
+        self.name = name
+        self.getter = getter
+        self.last_change_sql = last_change_sql
+        self.ok: Optional[bool] = None  # None = non ancora controllato
+        self.latency_ms: Optional[float] = None
+        self.last_check: Optional[datetime] = None
+        self.last_success: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+        self.last_change: Optional[datetime] = None
+
+    def run(self) -> None:
+        start = time.perf_counter()
+        try:
+            with self.getter().connect() as connection:
+                connection.execute(text("SELECT 1"))
+                latency = time.perf_counter() - start
+                self.last_change = connection.execute(self.last_change_sql).scalar()
+        except Exception as exc:
+            self.ok = False
+            self.last_error = str(exc).splitlines()[0][:200]
+            logger.warning("Health check %s failed: %s", self.name, self.last_error)
+        else:
+            self.ok = True
+            self.latency_ms = round(latency * 1000, 2)
+            self.last_success = datetime.utcnow()
+            self.last_error = None
+        finally:
+            self.last_check = datetime.utcnow()
+
+    def snapshot(self) -> dict:
+        pool = pool_status(self.name)
+        if self.ok is None:
+            status = "unknown"
+        elif not self.ok:
+            status = "down"
+        elif pool is not None and pool["saturation"] >= settings.HEALTH_POOL_SATURATION_WARN:
+            status = "saturated"
+        else:
+            status = "up"
+        return {
+            "status": status,
+            "latency_ms": self.latency_ms,
+            "last_check": self.last_check,
+            "last_success": self.last_success,
+            "last_error": self.last_error,
+            "pool": pool,
+        }
+
+
+class HealthChecker:
+    """Thread in background che aggiorna lo snapshot di /health/deep"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.checks = {
+            "asi_gest": DependencyCheck("asi_gest", get_engine_asi_gest, _ASI_GEST_LAST_CHANGE_SQL),
+            "asitron": DependencyCheck("asitron", get_engine_asitron, _ASITRON_LAST_CHANGE_SQL),
+        }
+        self._snapshot: dict = self._build()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Un worker per database: un ERP bloccato non ritarda il controllo di ASI_GEST
+        self._executor = ThreadPoolExecutor(max_workers=len(self.checks), thread_name_prefix="health")
+
+    def _sync_lag(self) -> Optional[float]:
+        local = self.checks["asi_gest"].last_change
+        erp = self.checks["asitron"].last_change
+        if local is None or erp is None:
+            return None
+        return max((erp - local).total_seconds(), 0.0)
+
+    def _build(self) -> dict:
+        databases = {name: check.snapshot() for name, check in self.checks.items()}
+        statuses = {db["status"] for db in databases.values()}
+        if databases["asi_gest"]["status"] == "down":
+            status = "unhealthy"
+        elif statuses <= {"up"}:
+            status = "healthy"
+        else:
+            status = "degraded"
+        return {
+            "status": status,
+            "checked_at": datetime.utcnow(),
+            "databases": databases,
+            "sync_lag_seconds": self._sync_lag(),
+        }
+
+    def check_now(self) -> dict:
+        """Esegue subito i controlli (in parallelo) e aggiorna lo snapshot"""
+        futures = [self._executor.submit(check.run) for check in self.checks.values()]
+        for future in futures:
+            future.result()
+        self._snapshot = self._build()
+        return self._snapshot
+
+    def snapshot(self) -> dict:
+        """Ultimo snapshot calcolato, con la sua età in secondi"""
+        snapshot = self._snapshot
+        age = (datetime.utcnow() - snapshot["checked_at"]).total_seconds()
+        return {**snapshot, "age_seconds": round(age, 3)}
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.check_now()
+            except Exception:
+                logger.exception("Health check loop failed")
+            self._stop.wait(self.interval)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name="health-checker", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._executor.shutdown(wait=False)
+
+
+health_checker = HealthChecker(settings.HEALTH_CHECK_INTERVAL)
@@ -0,0 +1,266 @@
+"""
+ASI-GEST Metrics
+© 2025 Enrico Callegaro - Tutti i diritti riservati.
+
+Metriche in formato testo Prometheus, esposte su /metrics.
+
+Per ogni engine (asi_gest, asi_gest_async, asitron) vengono registrati
+tramite gli eventi del pool SQLAlchemy:
+- tempo di attesa per ottenere una connessione dal pool (checkout)
+- durata del pre-ping su connessioni riusate
+- connessioni create (e relativo tempo di connessione) e invalidate
+- connessioni in uso, libere e in overflow (lette dal pool allo scrape)
+
+Altri moduli possono aggiungere metriche con register_collector().
+"""
+
+import threading
+import time
+from typing import Callable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+PREFIX = "asigest"
+
+# Bucket (secondi) per gli istogrammi di latenza
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _fmt_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    parts = [f'{key}="{value}"' for key, value in labels.items()]
+    return "{" + ",".join(parts) + "}"
+
+
+class Histogram:
+    """Istogramma cumulativo stile Prometheus (non thread-safe: usare con lock)"""
+
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.sum += value
+        self.count += 1
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+
+    def render(self, name: str, labels: dict) -> list[str]:
+        lines = []
+        for bound, count in zip(self.buckets, self.counts):
+            lines.append(f"{name}_bucket{_fmt_labels({**labels, 'le': bound})} {count}")
+        lines.append(f"{name}_bucket{_fmt_labels({**labels, 'le': '+Inf'})} {self.count}")
+        lines.append(f"{name}_sum{_fmt_labels(labels)} {self.sum:.6f}")
+        lines.append(f"{name}_count{_fmt_labels(labels)} {self.count}")
+        return lines
+
+
+class PoolMetrics:
+    """Contatori del pool di connessioni di un engine"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.lock = threading.Lock()
+        self.checkout_wait = Histogram()
+        self.pre_ping = Histogram()
+        self.connect_time = Histogram()
+        self.checkouts = 0
+        self.connections_created = 0
+        self.invalidations = 0
+        self.checkout_timeouts = 0
+        self.pool: Optional[QueuePool] = None
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool che misura il tempo di attesa in _do_get
+    (coda del pool + eventuale creazione di una nuova connessione).
+    """
+
+    metrics: Optional[PoolMetrics] = None
+    breaker = None  # CircuitBreaker opzionale (vedi app/core/circuit_breaker.py)
+
+    def _do_get(self):
+        if self.breaker is not None:
+            self.breaker.before_call()
+        if self.metrics is None:
+            return super()._do_get()
+
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except Exception:
+            with self.metrics.lock:
+                self.metrics.checkout_timeouts += 1
+            raise
+
+        now = time.perf_counter()
+        # Sul record, non thread-local: con l'engine async più coroutine dello
+        # stesso thread possono essere fra _do_get e il checkout (pre-ping)
+        connection.info["asigest_got_connection_at"] = now
+        with self.metrics.lock:
+            self.metrics.checkout_wait.observe(now - start)
+        for observer in _checkout_observers:
+            observer(self.metrics.name, start, now)
+        return connection
+
+    def recreate(self) -> "InstrumentedQueuePool":
+        # engine.dispose() ricrea il pool: le metriche restano le stesse
+        new_pool = super().recreate()
+        new_pool.metrics = self.metrics
+        new_pool.breaker = self.breaker
+        if self.metrics is not None:
+            self.metrics.pool = new_pool
+        return new_pool
+
+
+class InstrumentedAsyncAdaptedQueuePool(InstrumentedQueuePool, AsyncAdaptedQueuePool):
+    """InstrumentedQueuePool per gli engine async (coda asyncio di AsyncAdaptedQueuePool)"""
+
+
+_engines: dict[str, PoolMetrics] = {}
+_collectors: list[Callable[[], list[str]]] = []
+_checkout_observers: list[Callable[[str, float, float], None]] = []
+
+
+def add_checkout_observer(observer: Callable[[str, float, float], None]) -> None:
+    """Callback (engine, start, end) chiamata dopo ogni checkout dal pool"""
+    _checkout_observers.append(observer)
+
+
+def instrument_engine(engine: Engine, name: str) -> PoolMetrics:
+    """
+    Registra le metriche del pool di un engine creato con
+    poolclass=InstrumentedQueuePool (InstrumentedAsyncAdaptedQueuePool per
+    gli engine async: qui il loro sync_engine).
+    """
+    metrics = PoolMetrics(name)
+    pool = engine.pool
+    if isinstance(pool, InstrumentedQueuePool):
+        pool.metrics = metrics
+    metrics.pool = pool
+
+    @event.listens_for(engine, "do_connect")
+    def _on_do_connect(dialect, conn_rec, cargs, cparams):
+        conn_rec.info["asigest_connect_started_at"] = time.perf_counter()
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        started = connection_record.info.pop("asigest_connect_started_at", None)
+        with metrics.lock:
+            metrics.connections_created += 1
+            if started is not None:
+                metrics.connect_time.observe(time.perf_counter() - started)
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        # Il pre-ping avviene fra _do_get e l'evento checkout
+        got_at = connection_record.info.pop("asigest_got_connection_at", None)
+        with metrics.lock:
+            metrics.checkouts += 1
+            if got_at is not None:
+                metrics.pre_ping.observe(time.perf_counter() - got_at)
+
+    @event.listens_for(engine, "invalidate")
+    def _on_invalidate(dbapi_connection, connection_record, exception):
+        with metrics.lock:
+            metrics.invalidations += 1
+
+    @event.listens_for(engine, "soft_invalidate")
+    def _on_soft_invalidate(dbapi_connection, connection_record, exception):
+        with metrics.lock:
+            metrics.invalidations += 1
+
+    _engines[name] = metrics
+    return metrics
+
+
+def pool_status(name: str) -> Optional[dict]:
+    """Stato corrente del pool di un engine (None se l'engine non è ancora stato creato)"""
+    metrics = _engines.get(name)
+    if metrics is None or not isinstance(metrics.pool, QueuePool):
+        return None
+    pool = metrics.pool
+    capacity = pool.size() + max(pool._max_overflow, 0)
+    checked_out = pool.checkedout()
+    return {
+        "size": pool.size(),
+        "checked_out": checked_out,
+        "overflow": max(pool.overflow(), 0),
+        "capacity": capacity,
+        "saturation": round(checked_out / capacity, 3) if capacity else 0.0,
+        "checkout_timeouts": metrics.checkout_timeouts,
+    }
+
+
+def register_collector(collector: Callable[[], list[str]]) -> None:
+    """Aggiunge una funzione che ritorna righe in formato Prometheus"""
+    _collectors.append(collector)
+
+
+def _render_pools() -> list[str]:
+    histograms = (
+        ("db_pool_checkout_wait_seconds", "checkout_wait", "Tempo di attesa per ottenere una connessione dal pool"),
+        ("db_pool_pre_ping_seconds", "pre_ping", "Durata del pre-ping su connessioni riusate"),
+        ("db_pool_connect_seconds", "connect_time", "Tempo di apertura di una nuova connessione"),
+    )
+    counters = (
+        ("db_pool_checkouts_total", "checkouts", "Connessioni prelevate dal pool"),
+        ("db_pool_connections_created_total", "connections_created", "Nuove connessioni aperte"),
+        ("db_pool_invalidations_total", "invalidations", "Connessioni invalidate"),
+        ("db_pool_checkout_timeouts_total", "checkout_timeouts", "Checkout falliti (timeout o errore)"),
+    )
+    gauges = (
+        ("db_pool_size", "size", "Dimensione configurata del pool"),
+        ("db_pool_checked_out", "checkedout", "Connessioni attualmente in uso"),
+        ("db_pool_checked_in", "checkedin", "Connessioni libere nel pool"),
+        ("db_pool_overflow", "overflow", "Connessioni in overflow oltre pool_size"),
+    )
+
+    lines: list[str] = []
+    snapshot = list(_engines.values())
+
+    for metric, attr, help_text in histograms:
+        name = f"{PREFIX}_{metric}"
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        for metrics in snapshot:
+            with metrics.lock:
+                lines += getattr(metrics, attr).render(name, {"engine": metrics.name})
+
+    for metric, attr, help_text in counters:
+        name = f"{PREFIX}_{metric}"
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        for metrics in snapshot:
+            with metrics.lock:
+                value = getattr(metrics, attr)
+            lines.append(f"{name}{_fmt_labels({'engine': metrics.name})} {value}")
+
+    for metric, method, help_text in gauges:
+        name = f"{PREFIX}_{metric}"
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+        for metrics in snapshot:
+            pool = metrics.pool
+            getter = getattr(pool, method, None)
+            if getter is None:
+                continue
+            value = getter()
+            if method == "overflow":
+                # QueuePool.overflow() è negativo finché il pool è sotto pool_size (come pool_status)
+                value = max(value, 0)
+            lines.append(f"{name}{_fmt_labels({'engine': metrics.name})} {value}")
+
+    return lines
+
+
+def render_prometheus() -> str:
+    """Testo completo per /metrics (formato esposizione Prometheus 0.0.4)"""
+    lines = _render_pools()
+    for collector in _collectors:
+        lines += collector()
+    return "\n".join(lines) + "\n"
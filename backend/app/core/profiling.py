@@ -0,0 +1,246 @@
+"""
+ASI-GEST Request Profiling
+© 2025 Enrico Callegaro - Tutti i diritti riservati.
+
+Profiling su richiesta di singole chiamate in produzione (cProfile).
+
+Una richiesta viene profilata se:
+- l'header X-Profile-Token corrisponde ad ADMIN_TOKEN, oppure
+- viene estratta con probabilità PROFILING_SAMPLE_RATE
+
+Il profilo copre il thread dell'event loop (middleware, validazione,
+serializzazione) e, per le route sync, il thread del threadpool in cui
+gira l'handler (handler e query SQL): mentre l'handler gira nel worker il
+profiler del loop è sospeso, così un solo profiler è attivo alla volta
+(da Python 3.12 cProfile rifiuta un secondo profiler attivo). I profili
+vengono uniti e salvati in formato pstats (.prof) in PROFILING_DIR.
+
+cProfile sul thread dell'event loop registra ogni coroutine che gira nel
+frattempo: viene quindi profilata una sola richiesta alla volta, quelle
+estratte mentre un profilo è in corso passano senza profiling.
+
+Si analizzano con:
+
+    python -m pstats logs/profiles/<file>.prof
+    snakeviz logs/profiles/<file>.prof
+
+Gli ultimi PROFILING_MAX_FILES profili sono elencati e scaricabili
+tramite /api/admin/profiles (header X-Admin-Token).
+"""
+
+import cProfile
+import hmac
+import logging
+import os
+import pstats
+import random
+import re
+import time
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Optional
+
+import fastapi.routing
+from fastapi import Header, HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from .config import settings
+
+logger = logging.getLogger("asigest.profiling")
+
+
+class RequestProfile:
+    """Profili cProfile raccolti per una singola richiesta"""
+
+    def __init__(self):
+        self.loop_profiler = cProfile.Profile()
+        self.profiles: list[cProfile.Profile] = [self.loop_profiler]
+
+    def run(self, func, *args, **kwargs):
+        """Esegue func sotto un profiler dedicato al thread corrente"""
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError as exc:  # Python 3.12+: un altro profiler è attivo
+            logger.warning("Profiling handler skipped: %s", exc)
+            return func(*args, **kwargs)
+        self.profiles.append(profiler)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.disable()
+
+
+_active: ContextVar[Optional[RequestProfile]] = ContextVar("asigest_profile", default=None)
+
+# Una sola richiesta profilata alla volta (vedi docstring del modulo)
+_busy = False
+
+
+def token_matches(token: Optional[str]) -> bool:
+    """Confronto a tempo costante con ADMIN_TOKEN (False se non configurato)"""
+    if not settings.ADMIN_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token.encode(), settings.ADMIN_TOKEN.encode())
+
+
+def require_admin_token(x_admin_token: Optional[str] = Header(None)) -> None:
+    """Dependency per gli endpoint di amministrazione"""
+    if not token_matches(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+# ========================================
+# Hook FastAPI: handler sync nel threadpool
+# ========================================
+
+_fastapi_instrumented = False
+
+
+def instrument_fastapi_profiling() -> None:
+    """
+    Le route sync girano nel threadpool, dove cProfile del thread
+    dell'event loop non arriva: run_endpoint_function viene avvolta per
+    eseguire l'handler sotto un profiler nel thread di lavoro, con il
+    profiler del loop sospeso fino al ritorno dell'handler.
+    """
+    global _fastapi_instrumented
+    if _fastapi_instrumented:
+        return
+
+    original = fastapi.routing.run_endpoint_function
+
+    async def run_endpoint_function(*, dependant, values, is_coroutine):
+        profile = _active.get()
+        if profile is None or is_coroutine:
+            return await original(dependant=dependant, values=values, is_coroutine=is_coroutine)
+        profile.loop_profiler.disable()
+        try:
+            return await run_in_threadpool(profile.run, dependant.call, **values)
+        finally:
+            try:
+                profile.loop_profiler.enable()
+            except ValueError as exc:
+                logger.warning("Profiling event loop not resumed: %s", exc)
+
+    run_endpoint_function.__wrapped__ = original
+    fastapi.routing.run_endpoint_function = run_endpoint_function
+    _fastapi_instrumented = True
+
+
+# ========================================
+# Salvataggio e consultazione profili
+# ========================================
+
+_SAFE_NAME = re.compile(r"^[\w.\-]+\.prof$")
+
+
+def _slug(path: str) -> str:
+    return re.sub(r"[^\w\-]+", "_", path).strip("_")[:80] or "root"
+
+
+def save_profile(profile: RequestProfile, method: str, path: str, duration: float) -> Optional[str]:
+    """Unisce i profili della richiesta e li salva; ritorna il nome file"""
+    if not profile.profiles:
+        return None
+
+    os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+    stats = pstats.Stats(profile.profiles[0])
+    for extra in profile.profiles[1:]:
+        stats.add(extra)
+
+    name = (
+        f"{datetime.utcnow():%Y%m%dT%H%M%S%f}_{method}_{_slug(path)}"
+        f"_{int(duration * 1000)}ms.prof"
+    )
+    stats.dump_stats(os.path.join(settings.PROFILING_DIR, name))
+    _prune()
+    return name
+
+
+def _prune() -> None:
+    files = list_profiles()
+    for info in files[settings.PROFILING_MAX_FILES:]:
+        try:
+            os.remove(os.path.join(settings.PROFILING_DIR, info["name"]))
+        except OSError:
+            pass
+
+
+def list_profiles() -> list[dict]:
+    """Profili salvati, dal più recente"""
+    if not os.path.isdir(settings.PROFILING_DIR):
+        return []
+    result = []
+    for entry in os.scandir(settings.PROFILING_DIR):
+        if entry.is_file() and _SAFE_NAME.match(entry.name):
+            stat = entry.stat()
+            result.append({
+                "name": entry.name,
+                "size": stat.st_size,
+                "created": datetime.utcfromtimestamp(stat.st_mtime),
+            })
+    result.sort(key=lambda info: info["name"], reverse=True)
+    return result
+
+
+def profile_path(name: str) -> Optional[str]:
+    """Percorso di un profilo esistente (None se il nome non è valido o non esiste)"""
+    if not _SAFE_NAME.match(name):
+        return None
+    path = os.path.join(settings.PROFILING_DIR, name)
+    return path if os.path.isfile(path) else None
+
+
+# ========================================
+# Middleware
+# ========================================
+
+class ProfilingMiddleware:
+    """Middleware ASGI: profila le richieste abilitate da token o campionamento"""
+
+    def __init__(self, app):
+        self.app = app
+
+    def _should_profile(self, scope) -> bool:
+        for key, value in scope.get("headers", []):
+            if key == b"x-profile-token":
+                return token_matches(value.decode("latin-1"))
+        return settings.PROFILING_SAMPLE_RATE > 0 and random.random() < settings.PROFILING_SAMPLE_RATE
+
+    async def __call__(self, scope, receive, send):
+        global _busy
+        if scope["type"] != "http" or _busy or not self._should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        _busy = True
+        try:
+            await self._profile(scope, receive, send)
+        finally:
+            _busy = False
+
+    async def _profile(self, scope, receive, send):
+        profile = RequestProfile()
+        try:
+            profile.loop_profiler.enable()
+        except ValueError as exc:  # Python 3.12+: un altro profiler è attivo
+            logger.warning("Profiling skipped: %s", exc)
+            await self.app(scope, receive, send)
+            return
+
+        token = _active.set(profile)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profile.loop_profiler.disable()
+            _active.reset(token)
+            duration = time.perf_counter() - start
+            try:
+                name = await run_in_threadpool(
+                    save_profile, profile, scope["method"], scope["path"], duration
+                )
+                logger.info("Profile saved: %s", name)
+            except Exception:
+                logger.exception("Profile save failed")
@@ -0,0 +1,96 @@
+"""
+ASI-GEST Serializzazione veloce delle risposte
+© 2025 Enrico Callegaro - Tutti i diritti riservati.
+
+Percorso standard di FastAPI per una route con response_model:
+
+    modello Pydantic → validazione response_model (nel threadpool per le
+    route sync) → dict "json" → JSONResponse → bytes
+
+Le liste e i dettagli più usati costruiscono già modelli validati
+(model_validate dalle righe ORM): con model_response vengono serializzati
+senza seconda validazione e senza passare dal dict "json" (dove Pydantic
+converte ogni datetime in stringa, la parte più cara sulle nostre liste):
+model_dump in modalità python e orjson, che codifica date e datetime in
+modo nativo. Il JSON prodotto è identico a quello di FastAPI (by_alias,
+ISO 8601, "Z" per UTC); i tipi che orjson non conosce (es. Decimal) passano
+dal serializer di Pydantic. response_model resta sulla route per la
+documentazione OpenAPI.
+
+Le altre route passano dalla response class di default (TracedJSONResponse,
+su orjson). Gli export in streaming serializzano riga per riga con
+dump_model (vedi app/core/streaming.py).
+"""
+
+from typing import Optional
+
+import orjson
+from fastapi import Response
+from pydantic import BaseModel
+from pydantic_core import to_jsonable_python
+
+from .conditional import body_etag, etag_matches, not_modified, set_list_validators
+from .tracing import span
+
+# Header riportati anche sul 304 di conditional_model_response
+STATUS_HEADERS = ("Warning", "X-Data-Stale-Since")
+
+
+def dump_model(model: BaseModel) -> bytes:
+    """JSON di un modello già validato (by_alias, date ISO 8601, "Z" per UTC)"""
+    return orjson.dumps(
+        model.model_dump(by_alias=True),
+        default=to_jsonable_python,
+        option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS,
+    )
+
+
+def model_response(
+    model: BaseModel,
+    response: Optional[Response] = None,
+    status_code: Optional[int] = None,
+) -> Response:
+    """
+    Risposta JSON serializzata direttamente da un modello già validato.
+
+    Parametri:
+    - model: modello Pydantic della risposta (non viene rivalidato)
+    - response: Response iniettata nella route; i suoi header (ETag,
+      Warning, ...) e lo status impostato vengono riportati
+    - status_code: status esplicito (default 200)
+    """
+    with span("response.serialize"):
+        body = dump_model(model)
+    if status_code is None:
+        status_code = (response.status_code if response is not None else None) or 200
+    result = Response(content=body, status_code=status_code, media_type="application/json")
+    if response is not None:
+        result.raw_headers.extend(
+            (name, value) for name, value in response.raw_headers if name != b"content-length"
+        )
+    return result
+
+
+def conditional_model_response(
+    model: BaseModel,
+    response: Response,
+    if_none_match: Optional[str],
+) -> Response:
+    """
+    model_response con ETag calcolato dal corpo.
+
+    Per le liste senza un validatore economico (gestionale): se il client
+    ha già lo stesso corpo risponde 304, risparmiando la banda ma non la
+    query né la serializzazione.
+    """
+    result = model_response(model, response)
+    etag = body_etag(result.body)
+    if etag_matches(if_none_match, etag):
+        # Il 304 conserva gli header di stato (Warning di una risposta stale)
+        cached = not_modified(etag)
+        for name in STATUS_HEADERS:
+            if name in result.headers:
+                cached.headers[name] = result.headers[name]
+        return cached
+    set_list_validators(result, etag)
+    return result
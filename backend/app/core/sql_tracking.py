@@ -0,0 +1,182 @@
+"""
+ASI-GEST SQL Tracking
+© 2025 Enrico Callegaro - Tutti i diritti riservati.
+
+Conteggio degli statement SQL per richiesta HTTP:
+- numero di statement e tempo totale sul database
+- rilevamento N+1: lo stesso statement (stesso testo SQL parametrizzato)
+  ripetuto almeno SQL_N_PLUS_ONE_THRESHOLD volte nella stessa richiesta
+- log delle query lente (> SQL_SLOW_QUERY_MS) con parametri e route
+- budget di query dichiarato per route (sql_budget)
+
+I valori sono restituiti negli header X-SQL-Count, X-SQL-Time-Ms,
+X-SQL-Budget e X-SQL-N-Plus-One, così i test possono verificarli.
+
+Fuori da una richiesta HTTP (script, job) si può usare track_queries():
+
+    with track_queries() as stats:
+        riconcilia(db)
+    assert stats.count <= 2
+"""
+
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator, Optional
+
+from fastapi import Depends
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .config import settings
+
+logger = logging.getLogger("asigest.sql")
+
+
+class SqlStats:
+    """Statistiche SQL raccolte durante una richiesta (o un blocco track_queries)"""
+
+    def __init__(self, route: str = ""):
+        self.route = route
+        self.count = 0
+        self.total_time = 0.0
+        self.shapes: Counter = Counter()
+        self.budget: Optional[int] = None
+
+    def record(self, statement: str, duration: float) -> None:
+        self.count += 1
+        self.total_time += duration
+        self.shapes[statement] += 1
+
+    @property
+    def n_plus_one(self) -> dict[str, int]:
+        """Statement ripetuti oltre la soglia N+1"""
+        threshold = settings.SQL_N_PLUS_ONE_THRESHOLD
+        return {shape: n for shape, n in self.shapes.items() if n >= threshold}
+
+    @property
+    def budget_exceeded(self) -> bool:
+        return self.budget is not None and self.count > self.budget
+
+
+_current: ContextVar[Optional[SqlStats]] = ContextVar("asigest_sql_stats", default=None)
+
+
+def current_stats() -> Optional[SqlStats]:
+    """Statistiche della richiesta corrente (None fuori da una richiesta)"""
+    return _current.get()
+
+
+@contextmanager
+def track_queries(route: str = "") -> Iterator[SqlStats]:
+    """Raccoglie le statistiche SQL degli statement eseguiti nel blocco"""
+    stats = SqlStats(route)
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+def sql_budget(max_queries: int):
+    """
+    Dichiara il numero massimo di statement SQL per una route.
+
+    Uso:
+        @router.post("/", dependencies=[sql_budget(5)])
+    """
+    def _set_budget() -> None:
+        stats = _current.get()
+        if stats is not None:
+            stats.budget = max_queries
+
+    return Depends(_set_budget)
+
+
+def _short(value: Any, limit: int = 500) -> str:
+    text = repr(value)
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+def instrument_sql(engine: Engine, name: str) -> None:
+    """Registra gli hook di conteggio/tempo sugli statement di un engine"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("asigest_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info["asigest_query_start"].pop()
+        stats = _current.get()
+        if stats is not None:
+            stats.record(statement, duration)
+
+        if duration * 1000 >= settings.SQL_SLOW_QUERY_MS:
+            logger.warning(
+                "Slow query %.1f ms [%s] route=%s sql=%s params=%s",
+                duration * 1000,
+                name,
+                stats.route if stats is not None else "-",
+                " ".join(statement.split()),
+                _short(parameters),
+            )
+
+    @event.listens_for(engine, "handle_error")
+    def _on_error(exception_context):
+        starts = exception_context.connection.info.get("asigest_query_start") if exception_context.connection else None
+        if starts:
+            starts.pop()
+
+
+class SqlTrackingMiddleware:
+    """
+    Middleware ASGI: crea le statistiche SQL per ogni richiesta HTTP,
+    aggiunge gli header X-SQL-* alla risposta e scrive i warning
+    di budget superato e N+1 a fine richiesta.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = SqlStats(f"{scope['method']} {scope['path']}")
+        token = _current.set(stats)
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-sql-count", str(stats.count).encode()))
+                headers.append((b"x-sql-time-ms", f"{stats.total_time * 1000:.1f}".encode()))
+                if stats.budget is not None:
+                    headers.append((b"x-sql-budget", str(stats.budget).encode()))
+                n_plus_one = stats.n_plus_one
+                if n_plus_one:
+                    headers.append((b"x-sql-n-plus-one", str(len(n_plus_one)).encode()))
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            _current.reset(token)
+            self._report(stats)
+
+    @staticmethod
+    def _report(stats: SqlStats) -> None:
+        if stats.budget_exceeded:
+            logger.warning(
+                "SQL budget exceeded route=%s statements=%d budget=%d",
+                stats.route, stats.count, stats.budget,
+            )
+        for shape, repeats in stats.n_plus_one.items():
+            logger.warning(
+                "Possible N+1 route=%s repeats=%d sql=%s",
+                stats.route, repeats, " ".join(shape.split()),
+            )
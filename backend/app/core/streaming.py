@@ -0,0 +1,76 @@
+"""
+ASI-GEST Liste in streaming (export)
+© 2025 Enrico Callegaro - Tutti i diritti riservati.
+
+Una lista costruita con LottoList(items=[...]) tiene in memoria insieme le
+righe ORM, i modelli Pydantic e il corpo JSON: va bene per 100 righe, non
+per un export. Gli endpoint /export leggono invece il risultato a blocchi
+di EXPORT_BATCH_SIZE righe (yield_per: cursore lato server dove il driver
+lo supporta) e per ogni blocco validano, serializzano e inviano le righe.
+La memoria di picco dipende dalla dimensione del blocco, non dal numero
+di righe.
+
+Il corpo ha la stessa forma delle liste, senza paginazione:
+
+    {"items":[{...},{...},...],"total":12345}
+
+total è scritto in fondo, quando è noto. Un errore a metà stream (header
+già inviati) chiude la connessione: il client riceve un JSON troncato e
+deve considerare fallito l'export.
+"""
+
+from typing import AsyncIterable, AsyncIterator, Callable, Iterable, Iterator, Optional, Sequence
+
+from pydantic import BaseModel
+
+from .responses import dump_model
+
+MEDIA_TYPE = "application/json"
+
+# Callback per blocco: (righe ORM, modelli) → completa i modelli (es. join ERP)
+Prepare = Callable[[Sequence, list[BaseModel]], None]
+
+
+def _encode_batch(rows: Sequence, item_schema: type[BaseModel], prepare: Optional[Prepare], first: bool) -> bytes:
+    items = [item_schema.model_validate(row) for row in rows]
+    if prepare is not None:
+        prepare(rows, items)
+    chunk = b",".join(dump_model(item) for item in items)
+    return chunk if first else b"," + chunk
+
+
+def iter_json_list(
+    partitions: Iterable[Sequence],
+    item_schema: type[BaseModel],
+    prepare: Optional[Prepare] = None,
+) -> Iterator[bytes]:
+    """
+    Corpo JSON di una lista, un blocco di righe alla volta.
+
+    Parametri:
+    - partitions: blocchi di righe ORM (es. result.scalars().partitions())
+    - item_schema: schema degli elementi (anche ridotto da ?fields=)
+    - prepare: callback opzionale per blocco, prima della serializzazione
+    """
+    yield b'{"items":['
+    total = 0
+    for rows in partitions:
+        if rows:
+            yield _encode_batch(rows, item_schema, prepare, first=total == 0)
+            total += len(rows)
+    yield b'],"total":%d}' % total
+
+
+async def aiter_json_list(
+    partitions: AsyncIterable[Sequence],
+    item_schema: type[BaseModel],
+    prepare: Optional[Prepare] = None,
+) -> AsyncIterator[bytes]:
+    """Come iter_json_list, per i risultati async (AsyncSession.stream)"""
+    yield b'{"items":['
+    total = 0
+    async for rows in partitions:
+        if rows:
+            yield _encode_batch(rows, item_schema, prepare, first=total == 0)
+            total += len(rows)
+    yield b'],"total":%d}' % total
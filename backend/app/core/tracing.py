@@ -0,0 +1,291 @@
+"""
+ASI-GEST Request Tracing
+© 2025 Enrico Callegaro - Tutti i diritti riservati.
+
+Tracing leggero delle richieste HTTP con span annidati:
+
+    HTTP GET /api/fasi/{id}
+    ├── request.dependencies      (risoluzione dependency, apertura sessione)
+    ├── request.handler           (funzione della route)
+    │   ├── db.pool.checkout      (attesa connessione dal pool)
+    │   └── db.query              (ogni statement SQL)
+    ├── response.validate         (validazione response_model)
+    └── response.serialize        (encoding JSON)
+
+Le richieste sono campionate con TRACE_SAMPLE_RATE (0 = tracing spento):
+per le richieste non campionate ogni hook si riduce a una lettura di
+ContextVar. Le tracce campionate sono esportate in JSONL (un oggetto per
+span, nomi campo OTLP: traceId, spanId, parentSpanId, startTimeUnixNano,
+endTimeUnixNano, attributes) su file o sul log console, da un thread
+separato per non rallentare la richiesta.
+"""
+
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator, Optional
+
+import fastapi.routing
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .config import settings
+
+logger = logging.getLogger("asigest.trace")
+
+# Offset per convertire perf_counter in tempo Unix (ns)
+_PERF_TO_UNIX_NS = time.time_ns() - time.perf_counter_ns()
+
+
+def _unix_ns(perf: float) -> int:
+    return int(perf * 1_000_000_000) + _PERF_TO_UNIX_NS
+
+
+class Trace:
+    """Insieme degli span di una richiesta campionata"""
+
+    __slots__ = ("trace_id", "spans")
+
+    def __init__(self, trace_id: Optional[str] = None):
+        self.trace_id = trace_id or os.urandom(16).hex()
+        self.spans: list["Span"] = []
+
+
+class Span:
+    """Singola operazione temporizzata all'interno di una traccia"""
+
+    __slots__ = ("trace", "name", "span_id", "parent_id", "start", "end", "attributes", "_token")
+
+    def __init__(self, trace: Trace, name: str, parent_id: Optional[str], attributes: dict):
+        self.trace = trace
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.attributes = attributes
+        self._token = None
+
+    def to_dict(self) -> dict:
+        return {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "startTimeUnixNano": _unix_ns(self.start),
+            "endTimeUnixNano": _unix_ns(self.end if self.end is not None else self.start),
+            "durationMs": round(((self.end or self.start) - self.start) * 1000, 3),
+            "attributes": self.attributes,
+        }
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("asigest_trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("asigest_span", default=None)
+
+
+def start_span(name: str, **attributes: Any) -> Optional[Span]:
+    """Apre uno span figlio dello span corrente (None se la richiesta non è campionata)"""
+    trace = _current_trace.get()
+    if trace is None:
+        return None
+    parent = _current_span.get()
+    span = Span(trace, name, parent.span_id if parent else None, attributes)
+    span._token = _current_span.set(span)
+    trace.spans.append(span)
+    return span
+
+
+def end_span(span: Optional[Span], **attributes: Any) -> None:
+    """Chiude uno span aperto con start_span"""
+    if span is None:
+        return
+    span.end = time.perf_counter()
+    if attributes:
+        span.attributes.update(attributes)
+    try:
+        _current_span.reset(span._token)
+    except ValueError:
+        # Chiuso in un contesto diverso da quello di apertura
+        pass
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Context manager per uno span"""
+    current = start_span(name, **attributes)
+    try:
+        yield current
+    finally:
+        end_span(current)
+
+
+def record_span(name: str, start: float, end: float, **attributes: Any) -> None:
+    """Registra uno span già concluso (tempi perf_counter) sotto lo span corrente"""
+    trace = _current_trace.get()
+    if trace is None:
+        return
+    parent = _current_span.get()
+    completed = Span(trace, name, parent.span_id if parent else None, attributes)
+    completed.start = start
+    completed.end = end
+    trace.spans.append(completed)
+
+
+# ========================================
+# Export
+# ========================================
+
+_export_queue: "queue.SimpleQueue[Trace]" = queue.SimpleQueue()
+_exporter_started = False
+_exporter_lock = threading.Lock()
+
+
+def _export_worker() -> None:
+    while True:
+        trace = _export_queue.get()
+        lines = [json.dumps(s.to_dict(), default=str) for s in trace.spans]
+        try:
+            if settings.TRACE_EXPORTER == "console":
+                for line in lines:
+                    logger.info(line)
+            else:
+                directory = os.path.dirname(settings.TRACE_FILE)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(settings.TRACE_FILE, "a", encoding="utf-8") as f:
+                    f.write("\n".join(lines) + "\n")
+        except Exception:
+            logger.exception("Trace export failed")
+
+
+def export_trace(trace: Trace) -> None:
+    """Accoda una traccia per l'export asincrono"""
+    global _exporter_started
+    if not _exporter_started:
+        with _exporter_lock:
+            if not _exporter_started:
+                threading.Thread(target=_export_worker, name="trace-exporter", daemon=True).start()
+                _exporter_started = True
+    _export_queue.put(trace)
+
+
+# ========================================
+# Hook: SQLAlchemy, FastAPI, ASGI
+# ========================================
+
+def instrument_tracing_sql(engine: Engine, name: str) -> None:
+    """Uno span db.query per ogni statement eseguito sull'engine"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if _current_trace.get() is None:
+            return
+        conn.info.setdefault("asigest_trace_spans", []).append(
+            start_span("db.query", engine=name, statement=" ".join(statement.split())[:1000])
+        )
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        spans = conn.info.get("asigest_trace_spans")
+        if spans:
+            end_span(spans.pop(), rowcount=getattr(cursor, "rowcount", None))
+
+    @event.listens_for(engine, "handle_error")
+    def _on_error(exception_context):
+        connection = exception_context.connection
+        spans = connection.info.get("asigest_trace_spans") if connection is not None else None
+        if spans:
+            end_span(spans.pop(), error=str(exception_context.original_exception)[:500])
+
+
+def trace_pool_checkout(engine_name: str, start: float, end: float) -> None:
+    """Observer per InstrumentedQueuePool: span db.pool.checkout"""
+    record_span("db.pool.checkout", start, end, engine=engine_name)
+
+
+def _wrap_async(original, span_name: str):
+    async def wrapper(*args, **kwargs):
+        if _current_trace.get() is None:
+            return await original(*args, **kwargs)
+        with span(span_name):
+            return await original(*args, **kwargs)
+
+    wrapper.__wrapped__ = original
+    return wrapper
+
+
+_fastapi_instrumented = False
+
+
+def instrument_fastapi() -> None:
+    """
+    Span per le fasi interne di FastAPI (dependency, handler, validazione).
+
+    FastAPI 0.104 non offre hook per queste fasi: vengono avvolte le
+    funzioni di modulo usate da fastapi.routing.get_request_handler.
+    """
+    global _fastapi_instrumented
+    if _fastapi_instrumented:
+        return
+    fastapi.routing.solve_dependencies = _wrap_async(
+        fastapi.routing.solve_dependencies, "request.dependencies"
+    )
+    fastapi.routing.run_endpoint_function = _wrap_async(
+        fastapi.routing.run_endpoint_function, "request.handler"
+    )
+    fastapi.routing.serialize_response = _wrap_async(
+        fastapi.routing.serialize_response, "response.validate"
+    )
+    _fastapi_instrumented = True
+
+
+class TracedJSONResponse(ORJSONResponse):
+    """Response class di default: encoding orjson, con span response.serialize"""
+
+    def render(self, content: Any) -> bytes:
+        with span("response.serialize"):
+            return super().render(content)
+
+
+class TracingMiddleware:
+    """Middleware ASGI: campiona la richiesta, apre lo span radice ed esporta"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or random.random() >= settings.TRACE_SAMPLE_RATE:
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace()
+        trace_token = _current_trace.set(trace)
+        root = start_span(
+            f"HTTP {scope['method']} {scope['path']}",
+            **{"http.method": scope["method"], "http.target": scope["path"]},
+        )
+
+        async def send_with_trace(message):
+            if message["type"] == "http.response.start":
+                root.attributes["http.status_code"] = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"x-trace-id", trace.trace_id.encode()))
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_trace)
+        finally:
+            route = scope.get("route")
+            if route is not None and hasattr(route, "path"):
+                root.attributes["http.route"] = route.path
+            end_span(root)
+            _current_trace.reset(trace_token)
+            export_trace(trace)
@@ -5,15 +5,37 @@ ASI-GEST FastAPI Application
 Production management system for electronics assembly.
 """
 
-from fastapi import FastAPI
+import asyncio
+import logging
+import time
+
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from contextlib import asynccontextmanager
 
+from app.core.compression import CompressionMiddleware
 from app.core.config import settings
-from app.core.database import init_db_asi_gest
+from app import IMPORT_STARTED_AT
+from app.core.database import dispose_async_engines, init_db_asi_gest, warm_up_engines
+from app.core.health import health_checker
+from app.core.metrics import render_prometheus
+from app.core.sql_tracking import SqlTrackingMiddleware
+from app.core.tracing import TracedJSONResponse, TracingMiddleware, instrument_fastapi
+from app.core.profiling import ProfilingMiddleware, instrument_fastapi_profiling
+
+from app.schemas.health import DeepHealth
 
 # Import routes
-from app.routes import lotti, fasi, config, gestionale, anagrafiche
+from app.routes import lotti, fasi, config, gestionale, anagrafiche, admin
+
+logging.basicConfig(
+    level=settings.LOG_LEVEL,
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+)
+
+# Tempo di import dell'applicazione (package app, FastAPI, SQLAlchemy, route)
+IMPORT_SECONDS = time.perf_counter() - IMPORT_STARTED_AT
 
 
 @asynccontextmanager
@@ -22,13 +44,29 @@ async def lifespan(app: FastAPI):
     Lifespan events: startup and shutdown.
     """
     # Startup
-    print(f"🚀 Starting {settings.APP_NAME} v{settings.APP_VERSION}")
+    print(f"🚀 Starting {settings.APP_NAME} v{settings.APP_VERSION} (profile: {settings.PROFILE})")
     print(f"📊 ASI_GEST DB: {settings.DB_ASI_GEST_SERVER}/{settings.DB_ASI_GEST_DATABASE}")
     print(f"📊 ASITRON DB: {settings.DB_ASITRON_SERVER}/{settings.DB_ASITRON_DATABASE}")
 
+    startup_started = time.perf_counter()
+    if settings.DB_WARMUP_ON_STARTUP:
+        warm_up = await asyncio.to_thread(warm_up_engines, settings.DB_WARMUP_TIMEOUT)
+        for name, result in warm_up.items():
+            if result["error"]:
+                print(f"⚠️  Warm-up {name}: {result['error']}")
+            else:
+                print(f"🔌 Warm-up {name}: {result['seconds'] * 1000:.0f} ms")
+    startup_seconds = time.perf_counter() - startup_started
+    print(f"⏱️  Import: {IMPORT_SECONDS * 1000:.0f} ms - startup: {startup_seconds * 1000:.0f} ms")
+
+    if settings.HEALTH_CHECK_ENABLED:
+        health_checker.start()
+
     yield
 
     # Shutdown
+    health_checker.stop()
+    await dispose_async_engines()
     print(f"🛑 Shutting down {settings.APP_NAME}")
 
 
@@ -38,6 +76,7 @@ app = FastAPI(
     version=settings.APP_VERSION,
     description="Production management system for electronics assembly (SMD, PTH, testing)",
     lifespan=lifespan,
+    default_response_class=TracedJSONResponse,
 )
 
 # Configure CORS
@@ -47,8 +86,32 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[
+        "ETag", "Last-Modified",
+        "X-SQL-Count", "X-SQL-Time-Ms", "X-SQL-Budget", "X-SQL-N-Plus-One",
+        "X-Trace-Id",
+    ],
 )
 
+# Statement SQL per richiesta (header X-SQL-*, N+1, query lente)
+if settings.SQL_TRACKING_ENABLED:
+    app.add_middleware(SqlTrackingMiddleware)
+
+# Compressione br/gzip dei corpi oltre COMPRESSION_MIN_SIZE
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
+# Profiling su richiesta (header X-Profile-Token o campionamento)
+# Va registrato prima del tracing, così lo span request.handler include il profiler
+if settings.PROFILING_ENABLED:
+    instrument_fastapi_profiling()
+    app.add_middleware(ProfilingMiddleware)
+
+# Tracing campionato (span request → dependency → SQL → validazione → JSON)
+if settings.TRACE_SAMPLE_RATE > 0:
+    instrument_fastapi()
+    app.add_middleware(TracingMiddleware)
+
 
 # Root endpoint
 @app.get("/")
@@ -73,6 +136,33 @@ def health_check():
     }
 
 
+# Deep health check (snapshot aggiornato in background)
+@app.get("/health/deep", response_model=DeepHealth)
+def deep_health_check(response: Response):
+    """
+    Stato di ASI_GEST e ASITRON: latenza dell'ultimo ping, ultimo successo,
+    saturazione dei pool e sync lag ConfigCommessa ↔ commesse ERP.
+
+    Legge lo snapshot calcolato dal controllo in background ogni
+    HEALTH_CHECK_INTERVAL secondi (nessuna query per richiesta).
+    Ritorna 503 se ASI_GEST non è raggiungibile.
+    """
+    snapshot = health_checker.snapshot()
+    if snapshot["status"] == "unhealthy":
+        response.status_code = 503
+    return snapshot
+
+
+# Metrics endpoint (Prometheus)
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Metriche pool connessioni ASI_GEST/ASITRON in formato Prometheus"""
+    return PlainTextResponse(
+        render_prometheus(),
+        media_type="text/plain; version=0.0.4",
+    )
+
+
 # Database initialization endpoint
 @app.post("/init-db")
 def initialize_database():
@@ -101,6 +191,7 @@ app.include_router(fasi.router, prefix="/api/fasi", tags=["Fasi"])
 app.include_router(config.router, prefix="/api/config", tags=["ConfigCommessa"])
 app.include_router(gestionale.router, prefix="/api/gestionale", tags=["Gestionale"])
 app.include_router(anagrafiche.router, prefix="/api", tags=["Anagrafiche"])
+app.include_router(admin.router, prefix="/api/admin", tags=["Admin"])
 
 
 if __name__ == "__main__":
@@ -109,5 +200,7 @@ if __name__ == "__main__":
         "app.main:app",
         host=settings.HOST,
         port=settings.PORT,
-        reload=settings.DEBUG,
+        reload=settings.RELOAD,
+        workers=settings.WORKERS,
+        log_level=settings.LOG_LEVEL.lower(),
     )
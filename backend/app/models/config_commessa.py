@@ -5,7 +5,7 @@ ASI-GEST Models: ConfigCommessa
 Definizione configurazione tecnica delle commesse
 """
 
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -49,6 +49,10 @@ class ConfigCommessa(Base):
     ModificatoDa = Column(String(100), nullable=True)
     DataUltimaModifica = Column(DateTime, nullable=True)
 
+    __table_args__ = (
+        Index("IX_ConfigCommessa_DataModifica", "DataModifica"),
+    )
+
     # Relationships
     # Nota: Fasi si collega a ConfigCommessa tramite CommessaERPId (referenza esterna ERP)
     # Non c'è una FK diretta nel database
@@ -31,6 +31,7 @@ class Fase(Base):
 
     __table_args__ = (
         Index("IX_Fasi_Commessa", "CommessaERPId", "FaseTipoID"),
+        Index("IX_Fasi_DataModifica", "DataModifica"),
     )
 
     NumeroCommessa = Column(String(50), nullable=True)
@@ -49,6 +50,11 @@ class Fase(Base):
 
     Note = Column(Text, nullable=True)
 
+    # Concorrenza ottimistica: incrementato ad ogni UPDATE (WHERE Versione = :v)
+    Versione = Column(Integer, nullable=False, default=1)
+
+    __mapper_args__ = {"version_id_col": Versione}
+
     # Relationships
     fase_tipo = relationship("FaseTipo", back_populates="fasi")
     lotti = relationship("Lotto", back_populates="fase", cascade="all, delete-orphan")
@@ -51,13 +51,19 @@ class Lotto(Base):
 
     Note = Column(Text, nullable=True)
 
+    # Concorrenza ottimistica: incrementato ad ogni UPDATE (WHERE Versione = :v)
+    Versione = Column(Integer, nullable=False, default=1)
+
     __table_args__ = (
         UniqueConstraint("FaseID", "Progressivo", name="UQ_Lotti_Fase_Progressivo"),
         Index("IX_Lotti_Fase", "FaseID", "Progressivo"),
         Index("IX_Lotti_DataInizio", "DataInizio"),
         Index("IX_Lotti_Utente", "UtenteID"),
+        Index("IX_Lotti_DataModifica", "DataModifica"),
     )
 
+    __mapper_args__ = {"version_id_col": Versione}
+
     # Relationships
     fase = relationship("Fase", back_populates="lotti")
     utente = relationship("Utente", back_populates="lotti")
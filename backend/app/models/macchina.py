@@ -5,8 +5,9 @@ ASI-GEST Models: Macchina
 Definizione macchine e impianti di produzione
 """
 
-from sqlalchemy import Column, Integer, String, Boolean, Text
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, Index
 from sqlalchemy.orm import relationship
+from datetime import datetime
 
 from app.core.database import Base
 
@@ -30,6 +31,11 @@ class Macchina(Base):
     Tipo = Column(String(50), nullable=True)
     Attiva = Column(Boolean, default=True, index=True)
     Note = Column(Text, nullable=True)
+    DataModifica = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index("IX_Macchine_DataModifica", "DataModifica"),
+    )
 
     # Relationships
     lotti = relationship("Lotto", back_populates="macchina")
@@ -0,0 +1,40 @@
+"""
+ASI-GEST Models: Tombstone
+© 2025 Enrico Callegaro - Tutti i diritti riservati.
+
+Definizione tombstone - traccia delle righe eliminate per la sincronizzazione delta
+"""
+
+from sqlalchemy import Column, Integer, String, DateTime, Index
+from datetime import datetime
+
+from app.core.database import Base
+
+
+class Tombstone(Base):
+    """
+    Tabella tombstone - una riga per ogni Lotto, Fase, ... eliminato.
+
+    Le liste con ?modified_since= restituiscono gli ID eliminati dopo il
+    watermark del client (vedi app/services/delta_sync.py). Le righe più
+    vecchie di DELTA_SYNC_TOMBSTONE_DAYS vengono rimosse.
+
+    Indexed su: (Entita, DataCancellazione)
+    """
+    __tablename__ = "Tombstones"
+
+    TombstoneID = Column(Integer, primary_key=True, autoincrement=True)
+
+    Entita = Column(String(50), nullable=False)
+    # Esempi: Lotto, Fase, ConfigCommessa
+
+    EntitaID = Column(Integer, nullable=False)
+
+    DataCancellazione = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index("IX_Tombstones_Entita_Data", "Entita", "DataCancellazione"),
+    )
+
+    def __repr__(self):
+        return f"<Tombstone(entita='{self.Entita}', id={self.EntitaID}, data={self.DataCancellazione})>"
@@ -5,7 +5,7 @@ ASI-GEST Models: Utente
 Definizione operatori e utenti di sistema (username, ruolo, reparto)
 """
 
-from sqlalchemy import Column, Integer, String, Boolean, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -31,6 +31,11 @@ class Utente(Base):
     Ruolo = Column(String(50), nullable=True)  # OPERATORE, SUPERVISOR, ADMIN
     Attivo = Column(Boolean, default=True, index=True)
     DataCreazione = Column(DateTime, default=datetime.utcnow, nullable=False)
+    DataModifica = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index("IX_Utenti_DataModifica", "DataModifica"),
+    )
 
     # Relationships
     lotti = relationship("Lotto", back_populates="utente")
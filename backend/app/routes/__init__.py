@@ -3,6 +3,6 @@ ASI-GEST API Routes
 © 2025 Enrico Callegaro - Tutti i diritti riservati.
 """
 
-from . import lotti, fasi, config, gestionale
+from . import lotti, fasi, config, gestionale, anagrafiche, admin
 
-__all__ = ["lotti", "fasi", "config", "gestionale"]
+__all__ = ["lotti", "fasi", "config", "gestionale", "anagrafiche", "admin"]
@@ -0,0 +1,40 @@
+"""
+API Routes for Admin (diagnostica)
+© 2025 Enrico Callegaro - Tutti i diritti riservati.
+
+Endpoint di amministrazione protetti da header X-Admin-Token:
+- elenco e download dei profili cProfile salvati dal ProfilingMiddleware
+"""
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+
+from app.core.profiling import list_profiles, profile_path, require_admin_token
+from app.schemas.admin import ProfileInfo
+
+router = APIRouter(dependencies=[Depends(require_admin_token)])
+
+
+@router.get("/profiles", response_model=list[ProfileInfo])
+def get_profiles():
+    """
+    Lista dei profili salvati, dal più recente.
+
+    Header richiesto:
+    - X-Admin-Token: token di amministrazione (ADMIN_TOKEN)
+    """
+    return list_profiles()
+
+
+@router.get("/profiles/{name}")
+def download_profile(name: str):
+    """
+    Scarica un profilo in formato pstats (.prof).
+
+    Analisi: python -m pstats <file> oppure snakeviz <file>
+    """
+    path = profile_path(name)
+    if not path:
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+    return FileResponse(path, media_type="application/octet-stream", filename=name)
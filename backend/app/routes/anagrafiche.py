@@ -6,12 +6,16 @@ CRUD endpoints for managing operators (Utenti) and equipment (Macchine).
 These are the master data tables for production operations.
 """
 
-from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+from datetime import datetime
+from typing import Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 
-from app.core.database import get_db_asi_gest
+from app.core.admission import INTERACTIVE, REPORTING, admission
+from app.core.database import get_db_asi_gest, get_db_asi_gest_read
+from app.core.fieldsets import load_only_fields, parse_fields, sparse_container, sparse_item
+from app.core.responses import model_response
 from app.models.utente import Utente
 from app.models.macchina import Macchina
 from app.schemas.anagrafiche import (
@@ -19,24 +23,37 @@ from app.schemas.anagrafiche import (
     UtenteUpdate,
     UtenteResponse,
     UtenteList,
+    UtenteDelta,
+    UtenteBulk,
     MacchinaCreate,
     MacchinaUpdate,
     MacchinaResponse,
     MacchinaList,
+    MacchinaDelta,
+    MacchinaBulk,
 )
+from app.schemas.bulk import BulkIdsRequest
+from app.services.bulk_get import get_by_ids, normalize_ids, parse_ids
+from app.services.delta_sync import delta_window, read_delta
 
 router = APIRouter()
 
 
 # ========== UTENTI ENDPOINTS ==========
 
-@router.get("/utenti", response_model=UtenteList)
+@router.get(
+    "/utenti",
+    response_model=Union[UtenteList, UtenteDelta],
+    dependencies=[admission(REPORTING)],
+)
 def list_utenti(
     page: int = Query(1, ge=1, description="Numero pagina"),
     page_size: int = Query(50, ge=1, le=100, description="Elementi per pagina"),
     reparto: Optional[str] = Query(None, description="Filtra per reparto"),
     attivo: Optional[bool] = Query(None, description="Filtra per stato attivo"),
-    db: Session = Depends(get_db_asi_gest),
+    fields: Optional[str] = Query(None, description="Campi da restituire, separati da virgola (es. UtenteID,Username)"),
+    modified_since: Optional[datetime] = Query(None, description="Watermark: solo utenti cambiati dopo"),
+    db: Session = Depends(get_db_asi_gest_read),
 ):
     """
     Lista utenti/operatori con paginazione.
@@ -46,16 +63,36 @@ def list_utenti(
     - page_size: Elementi per pagina (default 50, max 100)
     - reparto: Filtra per reparto (opzionale)
     - attivo: Filtra per stato attivo (True/False, opzionale)
+    - fields: Campi da leggere e restituire (UtenteID sempre incluso, opzionale)
+    - modified_since: Watermark (opzionale)
 
     Ritorna:
     - Lista paginata di utenti con conteggio totale
+    - Con modified_since: UtenteDelta con gli utenti cambiati dopo il
+      watermark (senza paginazione né filtro attivo: le disattivazioni
+      arrivano come righe cambiate) e il nuovo watermark
     """
+    selected = parse_fields(fields, UtenteResponse, always=("UtenteID",))
+    item_schema = sparse_item(UtenteResponse, selected)
+    columns = (load_only_fields(Utente, selected),) if selected else ()
+
     # Build query
     query = db.query(Utente)
 
     # Apply filters
     if reparto is not None:
         query = query.filter(Utente.Reparto == reparto)
+
+    if modified_since is not None:
+        since, watermark = delta_window(modified_since)
+        utenti, deleted = read_delta(db, query.options(*columns).statement, Utente, since)
+        return model_response(sparse_container(UtenteDelta, item_schema)(
+            items=[item_schema.model_validate(utente) for utente in utenti],
+            deleted=deleted,
+            total=len(utenti),
+            watermark=watermark,
+        ))
+
     if attivo is not None:
         query = query.filter(Utente.Attivo == attivo)
 
@@ -64,17 +101,67 @@ def list_utenti(
 
     # Apply pagination
     offset = (page - 1) * page_size
-    utenti = query.order_by(Utente.Username).offset(offset).limit(page_size).all()
+    utenti = query.options(*columns).order_by(Utente.Username).offset(offset).limit(page_size).all()
 
-    return UtenteList(
-        items=utenti,
+    return model_response(sparse_container(UtenteList, item_schema)(
+        items=[item_schema.model_validate(utente) for utente in utenti],
         total=total,
         page=page,
         page_size=page_size,
-    )
+    ))
+
+
+def _utenti_by_ids(db: Session, ids: list[int], fields: Optional[str]) -> Response:
+    """Utenti per ID (ordine della richiesta) con gli ID mancanti"""
+    selected = parse_fields(fields, UtenteResponse, always=("UtenteID",))
+    item_schema = sparse_item(UtenteResponse, selected)
+    query = db.query(Utente)
+    if selected:
+        query = query.options(load_only_fields(Utente, selected))
+
+    utenti, missing = get_by_ids(db, query.statement, Utente, ids)
+    return model_response(sparse_container(UtenteBulk, item_schema)(
+        items=[item_schema.model_validate(utente) for utente in utenti],
+        missing=missing,
+    ))
 
 
-@router.get("/utenti/{utente_id}", response_model=UtenteResponse)
+@router.get("/utenti/bulk", response_model=UtenteBulk, dependencies=[admission(INTERACTIVE)])
+def get_utenti_bulk(
+    ids: str = Query(..., description="ID separati da virgola (es. 1,2,3)"),
+    fields: Optional[str] = Query(None, description="Campi da restituire, separati da virgola"),
+    db: Session = Depends(get_db_asi_gest_read),
+):
+    """
+    Legge più utenti per ID con query IN a blocchi (vedi app/services/bulk_get.py).
+
+    Parametri:
+    - ids: ID separati da virgola; per liste lunghe usare POST /utenti/bulk
+    - fields: Campi da restituire (UtenteID sempre incluso, opzionale)
+
+    Ritorna:
+    - items nell'ordine di ids e missing con gli ID non trovati
+    """
+    return _utenti_by_ids(db, parse_ids(ids), fields)
+
+
+@router.post("/utenti/bulk", response_model=UtenteBulk, dependencies=[admission(INTERACTIVE)])
+def post_utenti_bulk(
+    request: BulkIdsRequest,
+    fields: Optional[str] = Query(None, description="Campi da restituire, separati da virgola"),
+    db: Session = Depends(get_db_asi_gest_read),
+):
+    """
+    Come GET /utenti/bulk, con gli ID nel corpo: {"ids": [1, 2, 3]}.
+    """
+    return _utenti_by_ids(db, normalize_ids(request.ids), fields)
+
+
+@router.get(
+    "/utenti/{utente_id}",
+    response_model=UtenteResponse,
+    dependencies=[admission(INTERACTIVE)],
+)
 def get_utente(
     utente_id: int,
     db: Session = Depends(get_db_asi_gest),
@@ -99,7 +186,12 @@ def get_utente(
     return utente
 
 
-@router.post("/utenti", response_model=UtenteResponse, status_code=201)
+@router.post(
+    "/utenti",
+    response_model=UtenteResponse,
+    status_code=201,
+    dependencies=[admission(INTERACTIVE)],
+)
 def create_utente(
     utente_data: UtenteCreate,
     db: Session = Depends(get_db_asi_gest),
@@ -145,7 +237,11 @@ def create_utente(
         )
 
 
-@router.put("/utenti/{utente_id}", response_model=UtenteResponse)
+@router.put(
+    "/utenti/{utente_id}",
+    response_model=UtenteResponse,
+    dependencies=[admission(INTERACTIVE)],
+)
 def update_utente(
     utente_id: int,
     utente_data: UtenteUpdate,
@@ -199,7 +295,11 @@ def update_utente(
         )
 
 
-@router.delete("/utenti/{utente_id}", response_model=UtenteResponse)
+@router.delete(
+    "/utenti/{utente_id}",
+    response_model=UtenteResponse,
+    dependencies=[admission(INTERACTIVE)],
+)
 def delete_utente(
     utente_id: int,
     db: Session = Depends(get_db_asi_gest),
@@ -241,13 +341,19 @@ def delete_utente(
 
 # ========== MACCHINE ENDPOINTS ==========
 
-@router.get("/macchine", response_model=MacchinaList)
+@router.get(
+    "/macchine",
+    response_model=Union[MacchinaList, MacchinaDelta],
+    dependencies=[admission(REPORTING)],
+)
 def list_macchine(
     page: int = Query(1, ge=1, description="Numero pagina"),
     page_size: int = Query(50, ge=1, le=100, description="Elementi per pagina"),
     reparto: Optional[str] = Query(None, description="Filtra per reparto (SMD, PTH, CONTROLLI)"),
     attiva: Optional[bool] = Query(None, description="Filtra per stato attiva"),
-    db: Session = Depends(get_db_asi_gest),
+    fields: Optional[str] = Query(None, description="Campi da restituire, separati da virgola (es. MacchinaID,Codice)"),
+    modified_since: Optional[datetime] = Query(None, description="Watermark: solo macchine cambiate dopo"),
+    db: Session = Depends(get_db_asi_gest_read),
 ):
     """
     Lista macchine/impianti con paginazione.
@@ -257,16 +363,35 @@ def list_macchine(
     - page_size: Elementi per pagina (default 50, max 100)
     - reparto: Filtra per reparto (SMD, PTH, CONTROLLI) (opzionale)
     - attiva: Filtra per stato attiva (True/False, opzionale)
+    - fields: Campi da leggere e restituire (MacchinaID sempre incluso, opzionale)
+    - modified_since: Watermark (opzionale)
 
     Ritorna:
     - Lista paginata di macchine con conteggio totale
+    - Con modified_since: MacchinaDelta con le macchine cambiate dopo il
+      watermark (senza paginazione né filtro attiva) e il nuovo watermark
     """
+    selected = parse_fields(fields, MacchinaResponse, always=("MacchinaID",))
+    item_schema = sparse_item(MacchinaResponse, selected)
+    columns = (load_only_fields(Macchina, selected),) if selected else ()
+
     # Build query
     query = db.query(Macchina)
 
     # Apply filters
     if reparto is not None:
         query = query.filter(Macchina.Reparto == reparto)
+
+    if modified_since is not None:
+        since, watermark = delta_window(modified_since)
+        macchine, deleted = read_delta(db, query.options(*columns).statement, Macchina, since)
+        return model_response(sparse_container(MacchinaDelta, item_schema)(
+            items=[item_schema.model_validate(macchina) for macchina in macchine],
+            deleted=deleted,
+            total=len(macchine),
+            watermark=watermark,
+        ))
+
     if attiva is not None:
         query = query.filter(Macchina.Attiva == attiva)
 
@@ -275,17 +400,67 @@ def list_macchine(
 
     # Apply pagination
     offset = (page - 1) * page_size
-    macchine = query.order_by(Macchina.Codice).offset(offset).limit(page_size).all()
+    macchine = query.options(*columns).order_by(Macchina.Codice).offset(offset).limit(page_size).all()
 
-    return MacchinaList(
-        items=macchine,
+    return model_response(sparse_container(MacchinaList, item_schema)(
+        items=[item_schema.model_validate(macchina) for macchina in macchine],
         total=total,
         page=page,
         page_size=page_size,
-    )
+    ))
+
+
+def _macchine_by_ids(db: Session, ids: list[int], fields: Optional[str]) -> Response:
+    """Macchine per ID (ordine della richiesta) con gli ID mancanti"""
+    selected = parse_fields(fields, MacchinaResponse, always=("MacchinaID",))
+    item_schema = sparse_item(MacchinaResponse, selected)
+    query = db.query(Macchina)
+    if selected:
+        query = query.options(load_only_fields(Macchina, selected))
+
+    macchine, missing = get_by_ids(db, query.statement, Macchina, ids)
+    return model_response(sparse_container(MacchinaBulk, item_schema)(
+        items=[item_schema.model_validate(macchina) for macchina in macchine],
+        missing=missing,
+    ))
 
 
-@router.get("/macchine/{macchina_id}", response_model=MacchinaResponse)
+@router.get("/macchine/bulk", response_model=MacchinaBulk, dependencies=[admission(INTERACTIVE)])
+def get_macchine_bulk(
+    ids: str = Query(..., description="ID separati da virgola (es. 1,2,3)"),
+    fields: Optional[str] = Query(None, description="Campi da restituire, separati da virgola"),
+    db: Session = Depends(get_db_asi_gest_read),
+):
+    """
+    Legge più macchine per ID con query IN a blocchi (vedi app/services/bulk_get.py).
+
+    Parametri:
+    - ids: ID separati da virgola; per liste lunghe usare POST /macchine/bulk
+    - fields: Campi da restituire (MacchinaID sempre incluso, opzionale)
+
+    Ritorna:
+    - items nell'ordine di ids e missing con gli ID non trovati
+    """
+    return _macchine_by_ids(db, parse_ids(ids), fields)
+
+
+@router.post("/macchine/bulk", response_model=MacchinaBulk, dependencies=[admission(INTERACTIVE)])
+def post_macchine_bulk(
+    request: BulkIdsRequest,
+    fields: Optional[str] = Query(None, description="Campi da restituire, separati da virgola"),
+    db: Session = Depends(get_db_asi_gest_read),
+):
+    """
+    Come GET /macchine/bulk, con gli ID nel corpo: {"ids": [1, 2, 3]}.
+    """
+    return _macchine_by_ids(db, normalize_ids(request.ids), fields)
+
+
+@router.get(
+    "/macchine/{macchina_id}",
+    response_model=MacchinaResponse,
+    dependencies=[admission(INTERACTIVE)],
+)
 def get_macchina(
     macchina_id: int,
     db: Session = Depends(get_db_asi_gest),
@@ -310,7 +485,12 @@ def get_macchina(
     return macchina
 
 
-@router.post("/macchine", response_model=MacchinaResponse, status_code=201)
+@router.post(
+    "/macchine",
+    response_model=MacchinaResponse,
+    status_code=201,
+    dependencies=[admission(INTERACTIVE)],
+)
 def create_macchina(
     macchina_data: MacchinaCreate,
     db: Session = Depends(get_db_asi_gest),
@@ -356,7 +536,11 @@ def create_macchina(
         )
 
 
-@router.put("/macchine/{macchina_id}", response_model=MacchinaResponse)
+@router.put(
+    "/macchine/{macchina_id}",
+    response_model=MacchinaResponse,
+    dependencies=[admission(INTERACTIVE)],
+)
 def update_macchina(
     macchina_id: int,
     macchina_data: MacchinaUpdate,
@@ -410,7 +594,11 @@ def update_macchina(
         )
 
 
-@router.delete("/macchine/{macchina_id}", response_model=MacchinaResponse)
+@router.delete(
+    "/macchine/{macchina_id}",
+    response_model=MacchinaResponse,
+    dependencies=[admission(INTERACTIVE)],
+)
 def delete_macchina(
     macchina_id: int,
     db: Session = Depends(get_db_asi_gest),
@@ -4,30 +4,56 @@ API Routes for ConfigCommessa (Work Order Configuration)
 """
 
 from datetime import datetime
-from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Optional, Union
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import select, func
 
-from app.core.database import get_db_asi_gest
+from app.core.admission import INTERACTIVE, REPORTING, admission
+from app.core.conditional import etag_matches, list_etag, not_modified, set_list_validators
+from app.core.database import asitron_session, get_db_asi_gest, get_db_asi_gest_read
+from app.core.fieldsets import load_only_fields, parse_fields, sparse_container, sparse_item
+from app.core.responses import model_response
 from app.models import ConfigCommessa, Fase
 from app.schemas import (
     ConfigCommessaCreate,
     ConfigCommessaUpdate,
     ConfigCommessaResponse,
     ConfigCommessaWithFasi,
+    ConfigCommessaResolved,
     ConfigCommessaList,
+    ConfigCommessaDelta,
 )
+from app.services.config_json import (
+    dump_config_json,
+    get_resolved_config,
+    invalidate_config,
+)
+from app.services.delta_sync import delta_window, read_delta
+from app.services.erp_join import join_commesse_erp
+from app.services.erp_snapshot import mark_stale
 
 router = APIRouter()
 
+# Campi calcolati di ConfigCommessaResponse → colonne da leggere con ?fields=
+CONFIG_COMPUTED_FIELDS = {"CommessaERP": ("CommessaERPId",)}
+
 
-@router.get("/", response_model=ConfigCommessaList)
+@router.get(
+    "/",
+    response_model=Union[ConfigCommessaList, ConfigCommessaDelta],
+    dependencies=[admission(REPORTING)],
+)
 def list_config(
+    response: Response,
     attivo: Optional[bool] = Query(None, description="Filtra per stato (attivo/inattivo)"),
     page: int = Query(1, ge=1, description="Numero pagina"),
     page_size: int = Query(50, ge=1, le=100, description="Elementi per pagina"),
-    db: Session = Depends(get_db_asi_gest),
+    include_erp: bool = Query(False, description="Includi testata commessa ASITRON"),
+    modified_since: Optional[datetime] = Query(None, description="Watermark: solo configurazioni cambiate o eliminate dopo"),
+    fields: Optional[str] = Query(None, description="Campi da restituire, separati da virgola (es. ConfigCommessaID,CodiceArticolo)"),
+    if_none_match: Optional[str] = Header(None, description="ETag della lista già in possesso del client"),
+    db: Session = Depends(get_db_asi_gest_read),
 ):
     """
     Lista tutte le configurazioni commesse con paginazione e filtri.
@@ -36,37 +62,94 @@ def list_config(
     - attivo: Filtra per configurazioni attive (True) o inattive (False)
     - page: Numero di pagina (default 1)
     - page_size: Elementi per pagina (default 50, max 100)
+    - include_erp: Se True, aggiunge la testata commessa ASITRON (cliente, consegna)
+      con una sola query a blocchi per pagina; con ASITRON non raggiungibile
+      usa le testate in cache (CommessaERP=None per le altre) e la risposta
+      ha l'header Warning
+    - If-None-Match: ETag della lista; se invariata risponde 304 senza leggere
+      la pagina (non con include_erp, i cui dati ERP non sono nel validatore)
+    - modified_since: Watermark; risponde ConfigCommessaDelta con le
+      configurazioni cambiate e gli ID eliminati dopo (senza paginazione né
+      filtro attivo: le disattivazioni arrivano come righe cambiate)
+    - fields: Campi da leggere e restituire (ConfigCommessaID sempre
+      incluso, CommessaERP con include_erp); ConfigJSON non viene mai letto
     """
+    selected = parse_fields(
+        fields,
+        ConfigCommessaResponse,
+        always=("ConfigCommessaID", "CommessaERP") if include_erp else ("ConfigCommessaID",),
+    )
+    item_schema = sparse_item(ConfigCommessaResponse, selected)
+    columns = (load_only_fields(ConfigCommessa, selected, CONFIG_COMPUTED_FIELDS),) if selected else ()
+
     # Build query
     stmt = select(ConfigCommessa)
 
-    if attivo is not None:
-        stmt = stmt.where(ConfigCommessa.Attivo == attivo)
-
-    # Count total
-    count_stmt = select(func.count()).select_from(stmt.subquery())
-    total = db.execute(count_stmt).scalar()
-
-    # Apply pagination
-    stmt = stmt.order_by(ConfigCommessa.ConfigCommessaID.desc())
-    stmt = stmt.offset((page - 1) * page_size).limit(page_size)
-
-    # Execute query
-    result = db.execute(stmt)
-    configs = result.scalars().all()
-
-    return ConfigCommessaList(
-        items=[ConfigCommessaResponse.model_validate(config) for config in configs],
+    deleted = watermark = None
+    if modified_since is not None:
+        since, watermark = delta_window(modified_since)
+        configs, deleted = read_delta(db, stmt.options(*columns), ConfigCommessa, since)
+    else:
+        if attivo is not None:
+            stmt = stmt.where(ConfigCommessa.Attivo == attivo)
+
+        # Count total e DataModifica massima (validatori dell'ETag) in un solo statement
+        filtered = stmt.subquery()
+        total, last_modified = db.execute(
+            select(func.count(), func.max(filtered.c.DataModifica))
+        ).one()
+        etag = None
+        if not include_erp:
+            etag = list_etag(total, last_modified, "config", attivo, page, page_size, selected)
+            if etag_matches(if_none_match, etag):
+                return not_modified(etag, last_modified)
+
+        # Apply pagination
+        stmt = stmt.options(*columns).order_by(ConfigCommessa.ConfigCommessaID.desc())
+        stmt = stmt.offset((page - 1) * page_size).limit(page_size)
+
+        # Execute query
+        result = db.execute(stmt)
+        configs = result.scalars().all()
+
+    items = [item_schema.model_validate(config) for config in configs]
+    if include_erp:
+        try:
+            with asitron_session() as db_erp:
+                joined, stale_since = join_commesse_erp(db_erp, configs)
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error querying ASITRON database: {str(e)}"
+            )
+        for item, (_, commessa) in zip(items, joined):
+            item.CommessaERP = commessa
+        # ASITRON non raggiungibile: testate dalla sola cache, header Warning
+        mark_stale(response, stale_since)
+
+    if watermark is not None:
+        return model_response(sparse_container(ConfigCommessaDelta, item_schema)(
+            items=items, deleted=deleted, total=len(items), watermark=watermark,
+        ), response)
+
+    if etag:
+        set_list_validators(response, etag, last_modified)
+    return model_response(sparse_container(ConfigCommessaList, item_schema)(
+        items=items,
         total=total,
         page=page,
         page_size=page_size,
-    )
+    ), response)
 
 
-@router.get("/{config_id}", response_model=ConfigCommessaWithFasi)
+@router.get(
+    "/{config_id}",
+    response_model=ConfigCommessaWithFasi,
+    dependencies=[admission(INTERACTIVE)],
+)
 def get_config(
     config_id: int,
-    db: Session = Depends(get_db_asi_gest),
+    db: Session = Depends(get_db_asi_gest_read),
 ):
     """
     Recupera dettagli di una configurazione con le fasi associate.
@@ -90,7 +173,7 @@ def get_config(
     fasi = db.execute(fasi_stmt).scalars().all()
 
     # Extract unique FaseTipi from fasi
-    fasi_tipo_list = list(set([{"FaseTipoID": f.FaseTipoID} for f in fasi]))
+    fasi_tipo_list = [{"FaseTipoID": tipo_id} for tipo_id in sorted({f.FaseTipoID for f in fasi})]
 
     config_dict = ConfigCommessaResponse.model_validate(config).model_dump()
     config_dict["FasiTipo"] = fasi_tipo_list
@@ -98,7 +181,43 @@ def get_config(
     return ConfigCommessaWithFasi(**config_dict)
 
 
-@router.post("/", response_model=ConfigCommessaResponse, status_code=201)
+@router.get(
+    "/{config_id}/resolved",
+    response_model=ConfigCommessaResolved,
+    dependencies=[admission(INTERACTIVE)],
+)
+def get_config_resolved(
+    config_id: int,
+    db: Session = Depends(get_db_asi_gest_read),
+):
+    """
+    Recupera la configurazione di produzione risolta di una commessa.
+
+    Unisce i flag di colonna (FlagSMD, FlagPTH, FlagControlli, FlagTerzista),
+    con i relativi default, alle impostazioni di ConfigJSON. Il risultato è
+    in cache per ConfigCommessaID: ConfigJSON viene riletto e parsato solo
+    quando la configurazione è stata modificata.
+    """
+    try:
+        resolved = get_resolved_config(db, config_id)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=422,
+            detail=f"ConfigJSON non valido per ConfigCommessa {config_id}: {str(e)}"
+        )
+
+    if not resolved:
+        raise HTTPException(status_code=404, detail="ConfigCommessa not found")
+
+    return resolved
+
+
+@router.post(
+    "/",
+    response_model=ConfigCommessaResponse,
+    status_code=201,
+    dependencies=[admission(INTERACTIVE)],
+)
 def create_config(
     config_data: ConfigCommessaCreate,
     db: Session = Depends(get_db_asi_gest),
@@ -110,6 +229,7 @@ def create_config(
     - CodiceArticolo: Codice articolo (es. "45.001.234")
     - Descrizione: Descrizione dell'articolo
     - Note: Note sulla configurazione (opzionale)
+    - ConfigJSON: Impostazioni di produzione (opzionale, validate sullo schema)
 
     Note: CommessaERPId deve essere assegnato separatamente tramite put.
     La configurazione viene creata con stato Attivo=True.
@@ -120,6 +240,7 @@ def create_config(
         CodiceArticolo=config_data.CodiceArticolo,
         Descrizione=config_data.Descrizione,
         Note=config_data.Note,
+        ConfigJSON=dump_config_json(config_data.ConfigJSON),
         DataCreazione=datetime.utcnow(),
         Attivo=True,
     )
@@ -131,7 +252,11 @@ def create_config(
     return ConfigCommessaResponse.model_validate(new_config)
 
 
-@router.put("/{config_id}", response_model=ConfigCommessaResponse)
+@router.put(
+    "/{config_id}",
+    response_model=ConfigCommessaResponse,
+    dependencies=[admission(INTERACTIVE)],
+)
 def update_config(
     config_id: int,
     config_data: ConfigCommessaUpdate,
@@ -144,6 +269,7 @@ def update_config(
     - Descrizione: Descrizione dell'articolo
     - Note: Note sulla configurazione
     - Attivo: Se False, disabilita la configurazione (soft delete)
+    - ConfigJSON: Impostazioni di produzione (sostituisce il JSON esistente)
 
     Non è possibile aggiornare CodiceArticolo direttamente.
     """
@@ -162,15 +288,19 @@ def update_config(
     if config_data.Attivo is not None:
         config.Attivo = config_data.Attivo
 
+    if config_data.ConfigJSON is not None:
+        config.ConfigJSON = dump_config_json(config_data.ConfigJSON)
+
     config.DataUltimaModifica = datetime.utcnow()
 
     db.commit()
+    invalidate_config(config_id)
     db.refresh(config)
 
     return ConfigCommessaResponse.model_validate(config)
 
 
-@router.delete("/{config_id}", status_code=204)
+@router.delete("/{config_id}", status_code=204, dependencies=[admission(INTERACTIVE)])
 def delete_config(
     config_id: int,
     db: Session = Depends(get_db_asi_gest),
@@ -192,5 +322,6 @@ def delete_config(
     config.DataUltimaModifica = datetime.utcnow()
 
     db.commit()
+    invalidate_config(config_id)
 
     return None
@@ -4,12 +4,32 @@ API Routes for Fasi (Production Phases)
 """
 
 from datetime import datetime
-from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+from itertools import chain
+from typing import Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, Query, Header, Response
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from sqlalchemy import select, func
-
-from app.core.database import get_db_asi_gest
+from sqlalchemy.orm.exc import StaleDataError
+
+from app.core.admission import CRITICAL, INTERACTIVE, REPORTING, admission
+from app.core.concurrency import check_if_match, raise_conflict, set_etag
+from app.core.conditional import etag_matches, list_etag, not_modified, set_list_validators
+from app.core.config import settings
+from app.core.database import (
+    SessionLocalAsitron,
+    asitron_session,
+    get_async_db_asi_gest_read,
+    get_db_asi_gest,
+    get_db_asi_gest_read,
+    get_engine_asitron,
+)
+from app.core.fieldsets import load_only_fields, parse_fields, sparse_container, sparse_item
+from app.core.responses import model_response
+from app.core.sql_tracking import sql_budget
+from app.core.streaming import MEDIA_TYPE, iter_json_list
 from app.models import Fase, FaseTipo, ConfigCommessa, Lotto
 from app.schemas import (
     FaseCreate,
@@ -17,18 +37,39 @@ from app.schemas import (
     FaseResponse,
     FaseWithDetails,
     FaseList,
+    FaseDelta,
+    FaseBulk,
+    BulkIdsRequest,
+    RiconciliazioneResult,
 )
+from app.services.bulk_get import get_by_ids, normalize_ids, parse_ids
+from app.services.delta_sync import delta_window, read_delta
+from app.services.erp_join import join_commesse_erp
+from app.services.erp_snapshot import mark_stale
+from app.services.riconciliazione import iter_discrepanze, riconcilia
 
 router = APIRouter()
 
+# Campi calcolati di FaseResponse → colonne da leggere con ?fields=
+FASE_COMPUTED_FIELDS = {"Completata": ("Stato",), "CommessaERP": ("CommessaERPId",)}
+
 
-@router.get("/", response_model=FaseList)
+@router.get(
+    "/",
+    response_model=Union[FaseList, FaseDelta],
+    dependencies=[admission(REPORTING), sql_budget(3)],
+)
 def list_fasi(
+    response: Response,
     config_commessa_id: Optional[int] = Query(None, description="Filtra per ConfigCommessaID"),
     completata: Optional[bool] = Query(None, description="Filtra per fasi completate"),
     page: int = Query(1, ge=1, description="Numero pagina"),
     page_size: int = Query(50, ge=1, le=100, description="Elementi per pagina"),
-    db: Session = Depends(get_db_asi_gest),
+    include_erp: bool = Query(False, description="Includi testata commessa ASITRON"),
+    modified_since: Optional[datetime] = Query(None, description="Watermark: solo fasi cambiate o eliminate dopo"),
+    fields: Optional[str] = Query(None, description="Campi da restituire, separati da virgola (es. FaseID,NumeroCommessa)"),
+    if_none_match: Optional[str] = Header(None, description="ETag della lista già in possesso del client"),
+    db: Session = Depends(get_db_asi_gest_read),
 ):
     """
     Lista tutte le fasi con paginazione e filtri.
@@ -38,7 +79,21 @@ def list_fasi(
     - completata: Filtra per fasi completate (True) o non completate (False)
     - page: Numero di pagina (default 1)
     - page_size: Elementi per pagina (default 50, max 100)
+    - include_erp: Se True, aggiunge la testata commessa ASITRON (cliente, consegna)
+      con una sola query a blocchi per pagina; con ASITRON non raggiungibile
+      usa le testate in cache (CommessaERP=None per le altre) e la risposta
+      ha l'header Warning
+    - If-None-Match: ETag della lista; se invariata risponde 304 senza leggere
+      la pagina (non con include_erp, i cui dati ERP non sono nel validatore)
+    - modified_since: Watermark; risponde FaseDelta con le fasi cambiate e
+      gli ID eliminati dopo (senza paginazione né filtro completata)
+    - fields: Campi da leggere e restituire (FaseID sempre incluso,
+      CommessaERP con include_erp); senza, tutti i campi
     """
+    selected = parse_fields(fields, FaseResponse, always=("FaseID", "CommessaERP") if include_erp else ("FaseID",))
+    item_schema = sparse_item(FaseResponse, selected)
+    columns = (load_only_fields(Fase, selected, FASE_COMPUTED_FIELDS),) if selected else ()
+
     # Build query
     stmt = select(Fase)
 
@@ -50,33 +105,238 @@ def list_fasi(
         # Use CommessaERPId to filter fasi
         stmt = stmt.where(Fase.CommessaERPId == config.CommessaERPId)
 
-    if completata is not None:
-        stmt = stmt.where(Fase.Stato == ("CHIUSA" if completata else "APERTA"))
+    deleted = watermark = None
+    if modified_since is not None:
+        since, watermark = delta_window(modified_since)
+        fasi, deleted = read_delta(db, stmt.options(*columns), Fase, since)
+    else:
+        if completata is not None:
+            stmt = stmt.where(Fase.Stato == ("CHIUSA" if completata else "APERTA"))
+
+        # Count total e DataModifica massima (validatori dell'ETag) in un solo statement
+        filtered = stmt.subquery()
+        total, last_modified = db.execute(
+            select(func.count(), func.max(filtered.c.DataModifica))
+        ).one()
+        etag = None
+        if not include_erp:
+            etag = list_etag(
+                total, last_modified, "fasi", config_commessa_id, completata, page, page_size, selected,
+            )
+            if etag_matches(if_none_match, etag):
+                return not_modified(etag, last_modified)
+
+        # Apply pagination
+        stmt = stmt.options(*columns).order_by(Fase.FaseID.desc())
+        stmt = stmt.offset((page - 1) * page_size).limit(page_size)
+
+        # Execute query
+        result = db.execute(stmt)
+        fasi = result.scalars().all()
+
+    items = [item_schema.model_validate(fase) for fase in fasi]
+    if include_erp:
+        try:
+            with asitron_session() as db_erp:
+                joined, stale_since = join_commesse_erp(db_erp, fasi)
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error querying ASITRON database: {str(e)}"
+            )
+        for item, (_, commessa) in zip(items, joined):
+            item.CommessaERP = commessa
+        # ASITRON non raggiungibile: testate dalla sola cache, header Warning
+        mark_stale(response, stale_since)
+
+    if watermark is not None:
+        return model_response(sparse_container(FaseDelta, item_schema)(
+            items=items, deleted=deleted, total=len(items), watermark=watermark,
+        ), response)
+
+    if etag:
+        set_list_validators(response, etag, last_modified)
+    return model_response(sparse_container(FaseList, item_schema)(
+        items=items,
+        total=total,
+        page=page,
+        page_size=page_size,
+    ), response)
 
-    # Count total
-    count_stmt = select(func.count()).select_from(stmt.subquery())
-    total = db.execute(count_stmt).scalar()
 
-    # Apply pagination
-    stmt = stmt.order_by(Fase.FaseID.desc())
-    stmt = stmt.offset((page - 1) * page_size).limit(page_size)
+@router.get("/export", response_model=FaseList, dependencies=[admission(REPORTING), sql_budget(2)])
+def export_fasi(
+    config_commessa_id: Optional[int] = Query(None, description="Filtra per ConfigCommessaID"),
+    completata: Optional[bool] = Query(None, description="Filtra per fasi completate"),
+    include_erp: bool = Query(False, description="Includi testata commessa ASITRON"),
+    fields: Optional[str] = Query(None, description="Campi da restituire, separati da virgola"),
+    db: Session = Depends(get_db_asi_gest_read),
+):
+    """
+    Esporta tutte le fasi filtrate in streaming, senza paginazione.
+
+    Parametri:
+    - config_commessa_id, completata, fields: come la lista
+    - include_erp: testate commesse ASITRON, una query a blocchi (con cache)
+      per ogni blocco di EXPORT_BATCH_SIZE fasi; con ASITRON non
+      raggiungibile usa la cache come la lista. L'header Warning riflette il
+      primo blocco (gli header partono prima degli altri)
+
+    Le righe vengono lette, serializzate e inviate a blocchi: la memoria
+    resta costante qualunque sia il numero di fasi. Corpo:
+    {"items": [...], "total": N} (vedi app/core/streaming.py).
+    """
+    selected = parse_fields(fields, FaseResponse, always=("FaseID", "CommessaERP") if include_erp else ("FaseID",))
+    item_schema = sparse_item(FaseResponse, selected)
 
-    # Execute query
+    stmt = select(Fase)
+    if selected:
+        stmt = stmt.options(load_only_fields(Fase, selected, FASE_COMPUTED_FIELDS))
+    if config_commessa_id:
+        config = db.get(ConfigCommessa, config_commessa_id)
+        if not config:
+            raise HTTPException(status_code=404, detail="ConfigCommessa not found")
+        stmt = stmt.where(Fase.CommessaERPId == config.CommessaERPId)
+    if completata is not None:
+        stmt = stmt.where(Fase.Stato == ("CHIUSA" if completata else "APERTA"))
+    stmt = stmt.order_by(Fase.FaseID.desc()).execution_options(yield_per=settings.EXPORT_BATCH_SIZE)
+
+    # Sessione ASITRON solo con include_erp, chiusa a fine streaming
+    db_erp = None
+    if include_erp:
+        try:
+            get_engine_asitron()
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error querying ASITRON database: {str(e)}"
+            )
+        db_erp = SessionLocalAsitron()
+
+    # La query parte qui: un errore iniziale è ancora una risposta 500
     result = db.execute(stmt)
-    fasi = result.scalars().all()
+    if db_erp is None:
+        return StreamingResponse(iter_json_list(result.scalars().partitions(), item_schema), media_type=MEDIA_TYPE)
+
+    # Join del primo blocco prima degli header: con ASITRON non raggiungibile
+    # la risposta parte con Warning
+    partitions = result.scalars().partitions()
+    first = next(partitions, [])
+    try:
+        first_joined, stale_since = join_commesse_erp(db_erp, first)
+    except Exception as e:
+        db_erp.close()
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error querying ASITRON database: {str(e)}"
+        )
+    pending = [commessa for _, commessa in first_joined]
 
-    return FaseList(
-        items=[FaseResponse.model_validate(fase) for fase in fasi],
-        total=total,
-        page=page,
-        page_size=page_size,
+    def add_commesse_erp(fasi, items):
+        nonlocal pending
+        if pending is not None:
+            commesse, pending = pending, None
+        else:
+            commesse = [commessa for _, commessa in join_commesse_erp(db_erp, fasi)[0]]
+        for item, commessa in zip(items, commesse):
+            item.CommessaERP = commessa
+
+    response = StreamingResponse(
+        iter_json_list(chain([first], partitions), item_schema, add_commesse_erp),
+        media_type=MEDIA_TYPE,
+        background=BackgroundTask(db_erp.close),
     )
+    mark_stale(response, stale_since)
+    return response
 
 
-@router.get("/{fase_id}", response_model=FaseWithDetails)
-def get_fase(
-    fase_id: int,
+@router.get("/riconciliazione", dependencies=[admission(REPORTING)])
+def list_discrepanze(
+    db: Session = Depends(get_db_asi_gest_read),
+):
+    """
+    Verifica le quantità di tutte le fasi aperte rispetto ai lotti.
+
+    Una sola query aggregata (Fasi LEFT JOIN Lotti GROUP BY FaseID).
+    Le discrepanze sono restituite in streaming, una per riga (NDJSON).
+    """
+    def generate():
+        for discrepanza in iter_discrepanze(db):
+            yield discrepanza.model_dump_json() + "\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
+@router.post(
+    "/riconciliazione",
+    response_model=RiconciliazioneResult,
+    dependencies=[admission(REPORTING)],
+)
+def run_riconciliazione(
+    applica: bool = Query(False, description="Scrive QtaProdotta/QtaResidua corrette"),
     db: Session = Depends(get_db_asi_gest),
+):
+    """
+    Esegue la riconciliazione quantità Fasi/Lotti.
+
+    Parametri:
+    - applica: Se True, corregge QtaProdotta e QtaResidua con UPDATE a blocchi.
+      Se False (default), ritorna solo il riepilogo.
+    """
+    return riconcilia(db, applica=applica)
+
+
+def _fasi_by_ids(db: Session, ids: list[int], fields: Optional[str]) -> Response:
+    """Fasi per ID (ordine della richiesta) con gli ID mancanti"""
+    selected = parse_fields(fields, FaseResponse, always=("FaseID",))
+    item_schema = sparse_item(FaseResponse, selected)
+    stmt = select(Fase)
+    if selected:
+        stmt = stmt.options(load_only_fields(Fase, selected, FASE_COMPUTED_FIELDS))
+
+    fasi, missing = get_by_ids(db, stmt, Fase, ids)
+    return model_response(sparse_container(FaseBulk, item_schema)(
+        items=[item_schema.model_validate(fase) for fase in fasi],
+        missing=missing,
+    ))
+
+
+@router.get("/bulk", response_model=FaseBulk, dependencies=[admission(INTERACTIVE), sql_budget(5)])
+def get_fasi_bulk(
+    ids: str = Query(..., description="ID separati da virgola (es. 1,2,3)"),
+    fields: Optional[str] = Query(None, description="Campi da restituire, separati da virgola"),
+    db: Session = Depends(get_db_asi_gest_read),
+):
+    """
+    Legge più fasi per ID con query IN a blocchi (vedi app/services/bulk_get.py).
+
+    Gli elementi seguono l'ordine di ids; gli ID non trovati sono in missing.
+    Per liste lunghe usare POST /bulk.
+    """
+    return _fasi_by_ids(db, parse_ids(ids), fields)
+
+
+@router.post("/bulk", response_model=FaseBulk, dependencies=[admission(INTERACTIVE), sql_budget(5)])
+def post_fasi_bulk(
+    request: BulkIdsRequest,
+    fields: Optional[str] = Query(None, description="Campi da restituire, separati da virgola"),
+    db: Session = Depends(get_db_asi_gest_read),
+):
+    """
+    Come GET /bulk, con gli ID nel corpo: {"ids": [1, 2, 3]}.
+    """
+    return _fasi_by_ids(db, normalize_ids(request.ids), fields)
+
+
+@router.get(
+    "/{fase_id}",
+    response_model=FaseWithDetails,
+    dependencies=[admission(INTERACTIVE), sql_budget(2)],
+)
+async def get_fase(
+    fase_id: int,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db_asi_gest_read),
 ):
     """
     Recupera dettagli di una singola fase con informazioni correlate.
@@ -85,6 +345,8 @@ def get_fase(
     - FaseTipo: tipo di fase (SMD, PTH, CONTROLLO, etc.)
     - ConfigCommessa: configurazione tecnica della commessa
     - Statistiche dai lotti (numero, quantità prodotta, scarti)
+
+    L'header ETag contiene la Versione della fase (da usare con If-Match).
     """
     # Query con join per recuperare dettagli
     stmt = (
@@ -104,7 +366,7 @@ def get_fase(
         .where(Fase.FaseID == fase_id)
     )
 
-    result = db.execute(stmt).first()
+    result = (await db.execute(stmt)).first()
 
     if not result:
         raise HTTPException(status_code=404, detail="Fase not found")
@@ -125,25 +387,25 @@ def get_fase(
         func.coalesce(func.sum(Lotto.QtaScarti), 0).label("qty_scarti"),
     ).where(Lotto.FaseID == fase_id)
 
-    lotti_stats = db.execute(lotti_stmt).first()
+    lotti_stats = (await db.execute(lotti_stmt)).first()
 
-    # Costruisci response con dettagli
-    fase_dict = FaseResponse.model_validate(fase).model_dump()
-    fase_dict.update({
-        "FaseTipoCodice": fase_tipo_cod,
-        "FaseTipoDescrizione": fase_tipo_desc,
-        "FaseTipoTipo": fase_tipo_tipo,
-        "ConfigCommessaArticolo": config_articolo,
-        "ConfigCommessaDescrizione": config_desc,
-        "NumeroLotti": lotti_stats.count if lotti_stats else 0,
-        "QuantitaProdotta": int(lotti_stats.qty_prodotta) if lotti_stats else 0,
-        "QuantitaScarti": int(lotti_stats.qty_scarti) if lotti_stats else 0,
-    })
+    # Costruisci response con dettagli (una sola validazione, dai campi ORM)
+    fase_details = FaseWithDetails.model_validate(fase)
+    fase_details.FaseTipoCodice = fase_tipo_cod
+    fase_details.FaseTipoDescrizione = fase_tipo_desc
+    fase_details.FaseTipoTipo = fase_tipo_tipo
+    fase_details.ConfigCommessaArticolo = config_articolo
+    fase_details.ConfigCommessaDescrizione = config_desc
+    if lotti_stats:
+        fase_details.NumeroLotti = lotti_stats.count
+        fase_details.QuantitaProdotta = int(lotti_stats.qty_prodotta)
+        fase_details.QuantitaScarti = int(lotti_stats.qty_scarti)
 
-    return FaseWithDetails(**fase_dict)
+    set_etag(response, fase.Versione)
+    return model_response(fase_details, response)
 
 
-@router.post("/", response_model=FaseResponse, status_code=201)
+@router.post("/", response_model=FaseResponse, status_code=201, dependencies=[admission(CRITICAL)])
 def create_fase(
     fase_data: FaseCreate,
     db: Session = Depends(get_db_asi_gest),
@@ -191,10 +453,16 @@ def create_fase(
     return FaseResponse.model_validate(new_fase)
 
 
-@router.put("/{fase_id}", response_model=FaseResponse)
+@router.put(
+    "/{fase_id}",
+    response_model=FaseResponse,
+    dependencies=[admission(CRITICAL), sql_budget(3)],
+)
 def update_fase(
     fase_id: int,
     fase_data: FaseUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None, description="ETag (Versione) letto dal client"),
     db: Session = Depends(get_db_asi_gest),
 ):
     """
@@ -204,12 +472,18 @@ def update_fase(
     - Quantita: Quantità da produrre
     - Note: Note sulla fase
     - Completata: Se True, chiude la fase impostando Stato="CHIUSA" e DataChiusura
+
+    Concorrenza ottimistica: con If-Match la modifica viene applicata solo se
+    la Versione corrisponde, altrimenti 409. L'UPDATE è comunque condizionato
+    alla versione letta, quindi due modifiche concorrenti non si sovrascrivono.
     """
     fase = db.get(Fase, fase_id)
 
     if not fase:
         raise HTTPException(status_code=404, detail="Fase not found")
 
+    check_if_match(fase.Versione, if_match)
+
     # Update campi
     if fase_data.Quantita is not None:
         fase.Quantita = fase_data.Quantita
@@ -228,13 +502,18 @@ def update_fase(
 
     fase.DataModifica = datetime.utcnow()
 
-    db.commit()
+    try:
+        db.commit()
+    except StaleDataError:
+        db.rollback()
+        raise_conflict()
     db.refresh(fase)
 
+    set_etag(response, fase.Versione)
     return FaseResponse.model_validate(fase)
 
 
-@router.delete("/{fase_id}", status_code=204)
+@router.delete("/{fase_id}", status_code=204, dependencies=[admission(CRITICAL)])
 def delete_fase(
     fase_id: int,
     db: Session = Depends(get_db_asi_gest),
@@ -5,6 +5,13 @@ API Routes for Gestionale (Read-only integration with ASITRON database)
 Routes for querying ASITRON production management data.
 All endpoints are read-only and do not modify the source database.
 
+Se ASITRON non è raggiungibile (circuit breaker aperto o errore di
+connessione) viene servito l'ultimo risultato valido, segnalato con
+stale=true e header Warning; senza risultato precedente si risponde 503.
+
+Le liste hanno un ETag calcolato dal corpo: con If-None-Match invariato
+si risponde 304 senza corpo (vedi app/core/conditional.py).
+
 Mapping (per MAPPING_GESTIONALE_REALE_ASI_GEST.md):
 - COMMESSE → AnagraficaCommesse table
 - ARTICOLI → ANAGRAFICAARTICOLI table
@@ -12,11 +19,14 @@ Mapping (per MAPPING_GESTIONALE_REALE_ASI_GEST.md):
 """
 
 from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import select, func, text
 
+from app.core.admission import REPORTING, admission
 from app.core.database import get_db_asitron
+from app.core.responses import conditional_model_response
+from app.services.erp_snapshot import mark_stale, with_stale_fallback
 from app.schemas.gestionale import (
     CommessaGestionale,
     ArticoloGestionale,
@@ -26,13 +36,16 @@ from app.schemas.gestionale import (
     ClienteList,
 )
 
-router = APIRouter()
+# Consultazione gestionale: classe REPORTING (scartata per prima sotto carico)
+router = APIRouter(dependencies=[admission(REPORTING)])
 
 
 @router.get("/commesse", response_model=CommessaList)
 def list_commesse(
+    response: Response,
     aperte: Optional[bool] = Query(True, description="Filtra per commesse aperte (True) o chiuse (False)"),
     limit: int = Query(100, ge=1, le=500, description="Numero massimo di risultati"),
+    if_none_match: Optional[str] = Header(None, description="ETag della lista già in possesso del client"),
     db: Session = Depends(get_db_asitron),
 ):
     """
@@ -82,7 +95,7 @@ def list_commesse(
         ORDER BY a.AnnoCom DESC, a.NumCom DESC
     """)
 
-    try:
+    def fetch() -> list[CommessaGestionale]:
         result = db.execute(sql)
         rows = result.fetchall()
 
@@ -102,8 +115,19 @@ def list_commesse(
                 ANNOTAZIONI=row[10],
             )
             commesse.append(commessa)
+        return commesse
 
-        return CommessaList(items=commesse, total=len(commesse))
+    try:
+        commesse, stale_since = with_stale_fallback(("commesse", aperte, limit), fetch)
+        mark_stale(response, stale_since)
+        return conditional_model_response(CommessaList(
+            items=commesse,
+            total=len(commesse),
+            stale=stale_since is not None,
+            stale_since=stale_since,
+        ), response, if_none_match)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -114,6 +138,7 @@ def list_commesse(
 @router.get("/commesse/{progressivo}", response_model=CommessaGestionale)
 def get_commessa(
     progressivo: int,
+    response: Response,
     db: Session = Depends(get_db_asitron),
 ):
     """
@@ -146,14 +171,14 @@ def get_commessa(
         WHERE a.Progressivo = :progressivo
     """)
 
-    try:
+    def fetch() -> Optional[CommessaGestionale]:
         result = db.execute(sql, {"progressivo": progressivo})
         row = result.first()
 
         if not row:
-            raise HTTPException(status_code=404, detail="Commessa not found")
+            return None
 
-        commessa = CommessaGestionale(
+        return CommessaGestionale(
             PROGRESSIVO=row[0],
             ESERCIZIO=row[1],
             NUMEROCOM=row[2],
@@ -167,6 +192,12 @@ def get_commessa(
             ANNOTAZIONI=row[10],
         )
 
+    try:
+        commessa, stale_since = with_stale_fallback(("commessa", progressivo), fetch)
+        if commessa is None:
+            raise HTTPException(status_code=404, detail="Commessa not found")
+
+        mark_stale(response, stale_since)
         return commessa
     except HTTPException:
         raise
@@ -179,8 +210,10 @@ def get_commessa(
 
 @router.get("/articoli", response_model=ArticoloList)
 def list_articoli(
+    response: Response,
     search: Optional[str] = Query(None, max_length=50, description="Ricerca per CODICE"),
     limit: int = Query(100, ge=1, le=500, description="Numero massimo di risultati"),
+    if_none_match: Optional[str] = Header(None, description="ETag della lista già in possesso del client"),
     db: Session = Depends(get_db_asitron),
 ):
     """
@@ -212,7 +245,7 @@ def list_articoli(
         ORDER BY CODICE ASC
     """)
 
-    try:
+    def fetch() -> list[ArticoloGestionale]:
         result = db.execute(sql, params)
         rows = result.fetchall()
 
@@ -224,8 +257,19 @@ def list_articoli(
                 TIPOLOGIA=row[2],
             )
             articoli.append(articolo)
+        return articoli
 
-        return ArticoloList(items=articoli, total=len(articoli))
+    try:
+        articoli, stale_since = with_stale_fallback(("articoli", search, limit), fetch)
+        mark_stale(response, stale_since)
+        return conditional_model_response(ArticoloList(
+            items=articoli,
+            total=len(articoli),
+            stale=stale_since is not None,
+            stale_since=stale_since,
+        ), response, if_none_match)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -235,8 +279,10 @@ def list_articoli(
 
 @router.get("/clienti", response_model=ClienteList)
 def list_clienti(
+    response: Response,
     search: Optional[str] = Query(None, max_length=50, description="Ricerca per DSCCONTO1 (nome cliente)"),
     limit: int = Query(100, ge=1, le=500, description="Numero massimo di risultati"),
+    if_none_match: Optional[str] = Header(None, description="ETag della lista già in possesso del client"),
     db: Session = Depends(get_db_asitron),
 ):
     """
@@ -274,7 +320,7 @@ def list_clienti(
         ORDER BY DSCCONTO1 ASC
     """)
 
-    try:
+    def fetch() -> list[ClienteGestionale]:
         result = db.execute(sql, params)
         rows = result.fetchall()
 
@@ -292,8 +338,19 @@ def list_clienti(
                 CAP=row[8],
             )
             clienti.append(cliente)
+        return clienti
 
-        return ClienteList(items=clienti, total=len(clienti))
+    try:
+        clienti, stale_since = with_stale_fallback(("clienti", search, limit), fetch)
+        mark_stale(response, stale_since)
+        return conditional_model_response(ClienteList(
+            items=clienti,
+            total=len(clienti),
+            stale=stale_since is not None,
+            stale_since=stale_since,
+        ), response, if_none_match)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -4,12 +4,28 @@ API Routes for Lotti (Production Batches)
 """
 
 from datetime import datetime
-from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, Query, Header, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
 from sqlalchemy import select, func
 
-from app.core.database import get_db_asi_gest
+from app.core.admission import CRITICAL, INTERACTIVE, REPORTING, admission
+from app.core.concurrency import check_if_match, raise_conflict, set_etag
+from app.core.conditional import etag_matches, list_etag, not_modified, set_list_validators
+from app.core.config import settings
+from app.core.database import (
+    get_async_db_asi_gest,
+    get_async_db_asi_gest_read,
+    get_db_asi_gest,
+    get_db_asi_gest_read,
+)
+from app.core.fieldsets import load_only_fields, parse_fields, sparse_container, sparse_item
+from app.core.responses import model_response
+from app.core.sql_tracking import sql_budget
+from app.core.streaming import MEDIA_TYPE, aiter_json_list
 from app.models import Lotto, Fase, Utente, FaseTipo
 from app.schemas import (
     LottoCreate,
@@ -17,7 +33,12 @@ from app.schemas import (
     LottoResponse,
     LottoWithDetails,
     LottoList,
+    LottoDelta,
+    LottoBulk,
+    BulkIdsRequest,
 )
+from app.services.bulk_get import get_by_ids, normalize_ids, parse_ids
+from app.services.delta_sync import delta_window, read_delta
 
 # Import AsitronCore business logic
 try:
@@ -35,56 +56,179 @@ except ImportError:
 router = APIRouter()
 
 
-@router.get("/", response_model=LottoList)
-def list_lotti(
+@router.get(
+    "/",
+    response_model=Union[LottoList, LottoDelta],
+    dependencies=[admission(REPORTING), sql_budget(2)],
+)
+async def list_lotti(
+    response: Response,
     fase_id: Optional[int] = Query(None, description="Filtra per FaseID"),
     aperto: Optional[bool] = Query(None, description="Filtra per lotti aperti (DataFine NULL)"),
     page: int = Query(1, ge=1, description="Numero pagina"),
     page_size: int = Query(50, ge=1, le=100, description="Elementi per pagina"),
-    db: Session = Depends(get_db_asi_gest),
+    modified_since: Optional[datetime] = Query(None, description="Watermark: solo lotti cambiati o eliminati dopo"),
+    fields: Optional[str] = Query(None, description="Campi da restituire, separati da virgola (es. LottoID,Progressivo)"),
+    if_none_match: Optional[str] = Header(None, description="ETag della lista già in possesso del client"),
+    db: AsyncSession = Depends(get_async_db_asi_gest_read),
 ):
     """
     Lista tutti i lotti con paginazione e filtri.
+
+    Route async: non occupa un thread del threadpool durante le query.
+    Con If-None-Match uguale all'ETag corrente risponde 304 senza leggere
+    la pagina.
+
+    Con modified_since risponde LottoDelta (righe cambiate, ID eliminati e
+    nuovo watermark, senza paginazione né filtro aperto): vedi
+    app/services/delta_sync.py.
+
+    Con fields legge e restituisce solo i campi indicati (LottoID sempre
+    incluso): vedi app/core/fieldsets.py.
     """
+    selected = parse_fields(fields, LottoResponse, always=("LottoID",))
+    item_schema = sparse_item(LottoResponse, selected)
+    columns = (load_only_fields(Lotto, selected),) if selected else ()
+
     # Build query
     stmt = select(Lotto)
 
     if fase_id:
         stmt = stmt.where(Lotto.FaseID == fase_id)
 
+    if modified_since is not None:
+        since, watermark = delta_window(modified_since)
+        delta_stmt = stmt.options(*columns)
+        lotti, deleted = await db.run_sync(lambda session: read_delta(session, delta_stmt, Lotto, since))
+        return model_response(sparse_container(LottoDelta, item_schema)(
+            items=[item_schema.model_validate(lotto) for lotto in lotti],
+            deleted=deleted,
+            total=len(lotti),
+            watermark=watermark,
+        ))
+
     if aperto is not None:
         if aperto:
             stmt = stmt.where(Lotto.DataFine.is_(None))
         else:
             stmt = stmt.where(Lotto.DataFine.isnot(None))
 
-    # Count total
-    count_stmt = select(func.count()).select_from(stmt.subquery())
-    total = db.execute(count_stmt).scalar()
+    # Count total e DataModifica massima (validatori dell'ETag) in un solo statement
+    filtered = stmt.subquery()
+    total, last_modified = (await db.execute(
+        select(func.count(), func.max(filtered.c.DataModifica))
+    )).one()
+    etag = list_etag(total, last_modified, "lotti", fase_id, aperto, page, page_size, selected)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, last_modified)
 
     # Apply pagination
-    stmt = stmt.order_by(Lotto.LottoID.desc())
+    stmt = stmt.options(*columns).order_by(Lotto.LottoID.desc())
     stmt = stmt.offset((page - 1) * page_size).limit(page_size)
 
     # Execute query
-    result = db.execute(stmt)
+    result = await db.execute(stmt)
     lotti = result.scalars().all()
 
-    return LottoList(
-        items=[LottoResponse.model_validate(lotto) for lotto in lotti],
+    set_list_validators(response, etag, last_modified)
+    return model_response(sparse_container(LottoList, item_schema)(
+        items=[item_schema.model_validate(lotto) for lotto in lotti],
         total=total,
         page=page,
         page_size=page_size,
+    ), response)
+
+
+@router.get("/export", response_model=LottoList, dependencies=[admission(REPORTING), sql_budget(1)])
+async def export_lotti(
+    fase_id: Optional[int] = Query(None, description="Filtra per FaseID"),
+    aperto: Optional[bool] = Query(None, description="Filtra per lotti aperti (DataFine NULL)"),
+    fields: Optional[str] = Query(None, description="Campi da restituire, separati da virgola"),
+    db: AsyncSession = Depends(get_async_db_asi_gest_read),
+):
+    """
+    Esporta tutti i lotti filtrati in streaming, senza paginazione.
+
+    Le righe vengono lette, serializzate e inviate a blocchi di
+    EXPORT_BATCH_SIZE: la memoria resta costante qualunque sia il numero
+    di lotti. Corpo: {"items": [...], "total": N} (vedi app/core/streaming.py).
+    """
+    selected = parse_fields(fields, LottoResponse, always=("LottoID",))
+    item_schema = sparse_item(LottoResponse, selected)
+
+    stmt = select(Lotto)
+    if selected:
+        stmt = stmt.options(load_only_fields(Lotto, selected))
+    if fase_id:
+        stmt = stmt.where(Lotto.FaseID == fase_id)
+    if aperto is not None:
+        stmt = stmt.where(Lotto.DataFine.is_(None) if aperto else Lotto.DataFine.isnot(None))
+    stmt = stmt.order_by(Lotto.LottoID.desc()).execution_options(yield_per=settings.EXPORT_BATCH_SIZE)
+
+    # La query parte qui: un errore iniziale è ancora una risposta 500
+    result = await db.stream(stmt)
+    return StreamingResponse(
+        aiter_json_list(result.scalars().partitions(), item_schema),
+        media_type=MEDIA_TYPE,
     )
 
 
-@router.get("/{lotto_id}", response_model=LottoWithDetails)
+async def _lotti_by_ids(db: AsyncSession, ids: list[int], fields: Optional[str]) -> Response:
+    """Lotti per ID (ordine della richiesta) con gli ID mancanti"""
+    selected = parse_fields(fields, LottoResponse, always=("LottoID",))
+    item_schema = sparse_item(LottoResponse, selected)
+    stmt = select(Lotto)
+    if selected:
+        stmt = stmt.options(load_only_fields(Lotto, selected))
+
+    lotti, missing = await db.run_sync(lambda session: get_by_ids(session, stmt, Lotto, ids))
+    return model_response(sparse_container(LottoBulk, item_schema)(
+        items=[item_schema.model_validate(lotto) for lotto in lotti],
+        missing=missing,
+    ))
+
+
+@router.get("/bulk", response_model=LottoBulk, dependencies=[admission(INTERACTIVE), sql_budget(5)])
+async def get_lotti_bulk(
+    ids: str = Query(..., description="ID separati da virgola (es. 1,2,3)"),
+    fields: Optional[str] = Query(None, description="Campi da restituire, separati da virgola"),
+    db: AsyncSession = Depends(get_async_db_asi_gest_read),
+):
+    """
+    Legge più lotti per ID con query IN a blocchi (vedi app/services/bulk_get.py).
+
+    Gli elementi seguono l'ordine di ids; gli ID non trovati sono in missing.
+    Per liste lunghe usare POST /bulk.
+    """
+    return await _lotti_by_ids(db, parse_ids(ids), fields)
+
+
+@router.post("/bulk", response_model=LottoBulk, dependencies=[admission(INTERACTIVE), sql_budget(5)])
+async def post_lotti_bulk(
+    request: BulkIdsRequest,
+    fields: Optional[str] = Query(None, description="Campi da restituire, separati da virgola"),
+    db: AsyncSession = Depends(get_async_db_asi_gest_read),
+):
+    """
+    Come GET /bulk, con gli ID nel corpo: {"ids": [1, 2, 3]}.
+    """
+    return await _lotti_by_ids(db, normalize_ids(request.ids), fields)
+
+
+@router.get(
+    "/{lotto_id}",
+    response_model=LottoWithDetails,
+    dependencies=[admission(INTERACTIVE), sql_budget(1)],
+)
 def get_lotto(
     lotto_id: int,
-    db: Session = Depends(get_db_asi_gest),
+    response: Response,
+    db: Session = Depends(get_db_asi_gest_read),
 ):
     """
     Recupera dettagli di un singolo lotto con informazioni correlate.
+
+    L'header ETag contiene la Versione del lotto (da usare con If-Match).
     """
     # Query con join per recuperare dettagli
     stmt = (
@@ -93,8 +237,7 @@ def get_lotto(
             Fase.NumeroCommessa,
             FaseTipo.Codice.label("FaseTipoCodice"),
             FaseTipo.Descrizione.label("FaseTipoDescrizione"),
-            Utente.Nome.label("UtenteNome"),
-            Utente.Cognome.label("UtenteCognome"),
+            Utente.NomeCompleto.label("UtenteNome"),
         )
         .join(Fase, Lotto.FaseID == Fase.FaseID)
         .join(FaseTipo, Fase.FaseTipoID == FaseTipo.FaseTipoID)
@@ -107,33 +250,36 @@ def get_lotto(
     if not result:
         raise HTTPException(status_code=404, detail="Lotto not found")
 
-    lotto, num_commessa, fase_tipo_cod, fase_tipo_desc, utente_nome, utente_cognome = result
+    lotto, num_commessa, fase_tipo_cod, fase_tipo_desc, utente_nome = result
 
-    # Costruisci response con dettagli
-    lotto_dict = LottoResponse.model_validate(lotto).model_dump()
-    lotto_dict.update({
-        "FaseNumeroCommessa": num_commessa,
-        "FaseTipoCodice": fase_tipo_cod,
-        "FaseTipoDescrizione": fase_tipo_desc,
-        "UtenteNome": utente_nome,
-        "UtenteCognome": utente_cognome,
-    })
+    # Costruisci response con dettagli (una sola validazione, dai campi ORM)
+    lotto_details = LottoWithDetails.model_validate(lotto)
+    lotto_details.FaseNumeroCommessa = num_commessa
+    lotto_details.FaseTipoCodice = fase_tipo_cod
+    lotto_details.FaseTipoDescrizione = fase_tipo_desc
+    lotto_details.UtenteNome = utente_nome
 
     # Calcola resa e durata
     if lotto.QtaInput and lotto.QtaOutput:
-        lotto_dict["Resa"] = round((lotto.QtaOutput / lotto.QtaInput) * 100, 2)
+        lotto_details.Resa = round((lotto.QtaOutput / lotto.QtaInput) * 100, 2)
 
     if lotto.DataFine:
         durata_seconds = (lotto.DataFine - lotto.DataInizio).total_seconds()
-        lotto_dict["Durata"] = int(durata_seconds / 60)  # in minuti
+        lotto_details.Durata = int(durata_seconds / 60)  # in minuti
 
-    return LottoWithDetails(**lotto_dict)
+    set_etag(response, lotto.Versione)
+    return model_response(lotto_details, response)
 
 
-@router.post("/", response_model=LottoResponse, status_code=201)
-def create_lotto(
+@router.post(
+    "/",
+    response_model=LottoResponse,
+    status_code=201,
+    dependencies=[admission(CRITICAL), sql_budget(5)],
+)
+async def create_lotto(
     lotto_data: LottoCreate,
-    db: Session = Depends(get_db_asi_gest),
+    db: AsyncSession = Depends(get_async_db_asi_gest),
 ):
     """
     Crea un nuovo lotto (apertura lotto).
@@ -141,52 +287,65 @@ def create_lotto(
     Il progressivo viene calcolato automaticamente usando AsitronCore.
     """
     # Verifica che la fase esista
-    fase = db.get(Fase, lotto_data.FaseID)
+    fase = await db.get(Fase, lotto_data.FaseID)
     if not fase:
         raise HTTPException(status_code=404, detail="Fase not found")
 
     # Verifica che l'utente esista
-    utente = db.get(Utente, lotto_data.UtenteID)
+    utente = await db.get(Utente, lotto_data.UtenteID)
     if not utente:
         raise HTTPException(status_code=404, detail="Utente not found")
 
-    # Calcola progressivo usando AsitronCore
-    progressivo = calcola_progressivo_lotto(lotto_data.FaseID, db)
+    # Calcola progressivo usando AsitronCore (API sync: gira sulla sessione sottostante)
+    progressivo = await db.run_sync(
+        lambda session: calcola_progressivo_lotto(lotto_data.FaseID, session)
+    )
 
-    # Crea nuovo lotto
+    # Crea nuovo lotto (SerialeMacchina non ha una colonna su Lotti)
     new_lotto = Lotto(
         FaseID=lotto_data.FaseID,
         Progressivo=progressivo,
         UtenteID=lotto_data.UtenteID,
         QtaInput=lotto_data.QtaInput,
-        QtaOutput=lotto_data.QtaOutput,
-        QtaScarti=lotto_data.QtaScarti,
-        SerialeMacchina=lotto_data.SerialeMacchina,
+        QtaOutput=lotto_data.QtaOutput or 0,
+        QtaScarti=lotto_data.QtaScarti or 0,
         Note=lotto_data.Note,
         DataInizio=datetime.utcnow(),
     )
 
     db.add(new_lotto)
-    db.commit()
-    db.refresh(new_lotto)
+    await db.commit()
+    await db.refresh(new_lotto)
 
     return LottoResponse.model_validate(new_lotto)
 
 
-@router.put("/{lotto_id}/close", response_model=LottoResponse)
-def close_lotto(
+@router.put(
+    "/{lotto_id}/close",
+    response_model=LottoResponse,
+    dependencies=[admission(CRITICAL), sql_budget(3)],
+)
+async def close_lotto(
     lotto_id: int,
     close_data: LottoClose,
-    db: Session = Depends(get_db_asi_gest),
+    response: Response,
+    if_match: Optional[str] = Header(None, description="ETag (Versione) letto dal client"),
+    db: AsyncSession = Depends(get_async_db_asi_gest),
 ):
     """
     Chiude un lotto impostando DataFine e quantità finali.
+
+    Concorrenza ottimistica: con If-Match la chiusura viene applicata solo se
+    la Versione corrisponde, altrimenti 409. Due chiusure concorrenti dello
+    stesso lotto non possono sovrascriversi (UPDATE ... WHERE Versione = :v).
     """
-    lotto = db.get(Lotto, lotto_id)
+    lotto = await db.get(Lotto, lotto_id)
 
     if not lotto:
         raise HTTPException(status_code=404, detail="Lotto not found")
 
+    check_if_match(lotto.Versione, if_match)
+
     if lotto.DataFine:
         raise HTTPException(status_code=400, detail="Lotto already closed")
 
@@ -197,13 +356,18 @@ def close_lotto(
         lotto.Note = close_data.Note
     lotto.DataFine = datetime.utcnow()
 
-    db.commit()
-    db.refresh(lotto)
+    try:
+        await db.commit()
+    except StaleDataError:
+        await db.rollback()
+        raise_conflict()
+    await db.refresh(lotto)
 
+    set_etag(response, lotto.Versione)
     return LottoResponse.model_validate(lotto)
 
 
-@router.delete("/{lotto_id}", status_code=204)
+@router.delete("/{lotto_id}", status_code=204, dependencies=[admission(CRITICAL)])
 def delete_lotto(
     lotto_id: int,
     db: Session = Depends(get_db_asi_gest),
@@ -10,6 +10,8 @@ from .lotto import (
     LottoResponse,
     LottoWithDetails,
     LottoList,
+    LottoDelta,
+    LottoBulk,
 )
 from .fase import (
     FaseBase,
@@ -18,15 +20,23 @@ from .fase import (
     FaseResponse,
     FaseWithDetails,
     FaseList,
+    FaseDelta,
+    FaseBulk,
+    FaseDiscrepanza,
+    RiconciliazioneResult,
 )
 from .config_commessa import (
+    ConfigCommessaSettings,
     ConfigCommessaBase,
     ConfigCommessaCreate,
     ConfigCommessaUpdate,
     ConfigCommessaResponse,
     ConfigCommessaWithFasi,
+    ConfigCommessaResolved,
     ConfigCommessaList,
+    ConfigCommessaDelta,
 )
+from .bulk import BulkIdsRequest
 from .gestionale import (
     CommessaGestionale,
     ArticoloGestionale,
@@ -45,6 +55,8 @@ __all__ = [
     "LottoResponse",
     "LottoWithDetails",
     "LottoList",
+    "LottoDelta",
+    "LottoBulk",
     # Fase
     "FaseBase",
     "FaseCreate",
@@ -52,13 +64,22 @@ __all__ = [
     "FaseResponse",
     "FaseWithDetails",
     "FaseList",
+    "FaseDelta",
+    "FaseBulk",
+    "FaseDiscrepanza",
+    "RiconciliazioneResult",
     # ConfigCommessa
+    "ConfigCommessaSettings",
     "ConfigCommessaBase",
     "ConfigCommessaCreate",
     "ConfigCommessaUpdate",
     "ConfigCommessaResponse",
     "ConfigCommessaWithFasi",
+    "ConfigCommessaResolved",
     "ConfigCommessaList",
+    "ConfigCommessaDelta",
+    # Bulk
+    "BulkIdsRequest",
     # Gestionale
     "CommessaGestionale",
     "ArticoloGestionale",
@@ -0,0 +1,14 @@
+"""
+Pydantic schemas for Admin (diagnostica)
+© 2025 Enrico Callegaro - Tutti i diritti riservati.
+"""
+
+from datetime import datetime
+from pydantic import BaseModel
+
+
+class ProfileInfo(BaseModel):
+    """Schema for a saved request profile"""
+    name: str
+    size: int
+    created: datetime
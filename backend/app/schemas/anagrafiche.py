@@ -54,6 +54,20 @@ class UtenteList(BaseModel):
     page_size: int
 
 
+class UtenteDelta(BaseModel):
+    """Schema for Utenti changed since a watermark (?modified_since=)"""
+    items: list[UtenteResponse]
+    deleted: list[int] = Field(default_factory=list, description="ID eliminati dopo il watermark")
+    total: int
+    watermark: datetime = Field(..., description="Valore di modified_since per la lettura successiva")
+
+
+class UtenteBulk(BaseModel):
+    """Schema for Utenti read by ID (/bulk)"""
+    items: list[UtenteResponse]
+    missing: list[int] = Field(default_factory=list, description="ID richiesti e non trovati")
+
+
 # ========== MACCHINE SCHEMAS ==========
 
 class MacchinaBase(BaseModel):
@@ -95,3 +109,17 @@ class MacchinaList(BaseModel):
     total: int
     page: int
     page_size: int
+
+
+class MacchinaDelta(BaseModel):
+    """Schema for Macchine changed since a watermark (?modified_since=)"""
+    items: list[MacchinaResponse]
+    deleted: list[int] = Field(default_factory=list, description="ID eliminati dopo il watermark")
+    total: int
+    watermark: datetime = Field(..., description="Valore di modified_since per la lettura successiva")
+
+
+class MacchinaBulk(BaseModel):
+    """Schema for Macchine read by ID (/bulk)"""
+    items: list[MacchinaResponse]
+    missing: list[int] = Field(default_factory=list, description="ID richiesti e non trovati")
@@ -0,0 +1,11 @@
+"""
+Pydantic schemas for bulk reads by ID
+© 2025 Enrico Callegaro - Tutti i diritti riservati.
+"""
+
+from pydantic import BaseModel, Field
+
+
+class BulkIdsRequest(BaseModel):
+    """Schema for POST /bulk body (alternative to ?ids= for long lists)"""
+    ids: list[int] = Field(..., min_length=1, description="ID da leggere, nell'ordine desiderato")
@@ -7,6 +7,25 @@ from datetime import datetime
 from typing import Optional
 from pydantic import BaseModel, Field, ConfigDict
 
+from .gestionale import CommessaGestionale
+
+
+class ConfigCommessaSettings(BaseModel):
+    """
+    Schema tipizzato di ConfigCommessa.ConfigJSON (impostazioni di produzione).
+
+    I flag, se presenti, sovrascrivono le colonne FlagSMD/FlagPTH/FlagControlli.
+    Chiavi aggiuntive sono ammesse e conservate.
+    """
+    model_config = ConfigDict(extra="allow")
+
+    FlagSMD: Optional[bool] = None
+    FlagPTH: Optional[bool] = None
+    FlagControlli: Optional[bool] = None
+    ProgrammaFeeder: Optional[str] = Field(None, max_length=100, description="Programma feeder di default")
+    TempoSetupMin: Optional[int] = Field(None, ge=0, description="Tempo di setup previsto in minuti")
+    LatiSMD: Optional[int] = Field(None, ge=1, le=2, description="Numero lati SMD (1 o 2)")
+
 
 class ConfigCommessaBase(BaseModel):
     """Base schema for ConfigCommessa"""
@@ -17,7 +36,7 @@ class ConfigCommessaBase(BaseModel):
 
 class ConfigCommessaCreate(ConfigCommessaBase):
     """Schema for creating a new ConfigCommessa"""
-    pass
+    ConfigJSON: Optional[ConfigCommessaSettings] = Field(None, description="Impostazioni di produzione")
 
 
 class ConfigCommessaUpdate(BaseModel):
@@ -25,6 +44,7 @@ class ConfigCommessaUpdate(BaseModel):
     Descrizione: Optional[str] = Field(None, max_length=200)
     Note: Optional[str] = None
     Attivo: Optional[bool] = None
+    ConfigJSON: Optional[ConfigCommessaSettings] = None
 
 
 class ConfigCommessaResponse(ConfigCommessaBase):
@@ -36,15 +56,37 @@ class ConfigCommessaResponse(ConfigCommessaBase):
     DataCreazione: datetime
     DataModifica: datetime
 
+    # Testata commessa ASITRON (solo con include_erp=true)
+    CommessaERP: Optional[CommessaGestionale] = None
+
 
 class ConfigCommessaWithFasi(ConfigCommessaResponse):
     """Schema for ConfigCommessa with associated phase types"""
     FasiTipo: list[dict] = Field(default_factory=list, description="Lista tipi fase associati")
 
 
+class ConfigCommessaResolved(BaseModel):
+    """Schema for resolved ConfigCommessa settings (colonne + ConfigJSON)"""
+    ConfigCommessaID: int
+    FlagSMD: bool
+    FlagPTH: bool
+    FlagControlli: bool
+    FlagTerzista: bool
+    Impostazioni: ConfigCommessaSettings
+    DataModifica: datetime
+
+
 class ConfigCommessaList(BaseModel):
     """Schema for list of ConfigCommessa"""
     items: list[ConfigCommessaResponse]
     total: int
     page: int = 1
     page_size: int = 50
+
+
+class ConfigCommessaDelta(BaseModel):
+    """Schema for ConfigCommessa changed since a watermark (?modified_since=)"""
+    items: list[ConfigCommessaResponse]
+    deleted: list[int] = Field(default_factory=list, description="ID eliminati dopo il watermark")
+    total: int
+    watermark: datetime = Field(..., description="Valore di modified_since per la lettura successiva")
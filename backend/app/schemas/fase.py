@@ -7,6 +7,8 @@ from datetime import datetime
 from typing import Optional
 from pydantic import BaseModel, Field, ConfigDict
 
+from .gestionale import CommessaGestionale
+
 
 class FaseBase(BaseModel):
     """Base schema for Fase"""
@@ -38,6 +40,10 @@ class FaseResponse(FaseBase):
     Completata: bool
     DataCreazione: datetime
     DataModifica: datetime
+    Versione: int = 1
+
+    # Testata commessa ASITRON (solo con include_erp=true)
+    CommessaERP: Optional[CommessaGestionale] = None
 
 
 class FaseWithDetails(FaseResponse):
@@ -63,3 +69,44 @@ class FaseList(BaseModel):
     total: int
     page: int = 1
     page_size: int = 50
+
+
+class FaseDelta(BaseModel):
+    """Schema for Fasi changed since a watermark (?modified_since=)"""
+    items: list[FaseResponse]
+    deleted: list[int] = Field(default_factory=list, description="ID eliminati dopo il watermark")
+    total: int
+    watermark: datetime = Field(..., description="Valore di modified_since per la lettura successiva")
+
+
+class FaseBulk(BaseModel):
+    """Schema for Fasi read by ID (/bulk)"""
+    items: list[FaseResponse]
+    missing: list[int] = Field(default_factory=list, description="ID richiesti e non trovati")
+
+
+class FaseDiscrepanza(BaseModel):
+    """Schema for a Fase whose quantities disagree with its Lotti totals"""
+    FaseID: int
+    CommessaERPId: int
+    Stato: str
+    Quantita: Optional[int] = None
+    QtaPrevista: Optional[int] = None
+    QtaProdotta: Optional[int] = None
+    QtaResidua: Optional[int] = None
+    Versione: int
+
+    # Valori calcolati dai lotti
+    NumeroLotti: int = 0
+    QtaProdottaLotti: int = 0
+    QtaResiduaCalcolata: Optional[int] = None
+
+    # Motivi della discrepanza (QtaProdotta, QtaResidua, QtaPrevista)
+    Campi: list[str] = Field(default_factory=list)
+
+
+class RiconciliazioneResult(BaseModel):
+    """Schema for quantity reconciliation summary"""
+    FasiVerificate: int
+    Discrepanze: int
+    Aggiornate: int
@@ -58,15 +58,24 @@ class CommessaList(BaseModel):
     """Schema for list of Commesse"""
     items: list[CommessaGestionale]
     total: int
+    # Risultato servito dall'ultimo snapshot valido (ASITRON non raggiungibile)
+    stale: bool = False
+    stale_since: Optional[datetime] = None
 
 
 class ArticoloList(BaseModel):
     """Schema for list of Articoli"""
     items: list[ArticoloGestionale]
     total: int
+    # Risultato servito dall'ultimo snapshot valido (ASITRON non raggiungibile)
+    stale: bool = False
+    stale_since: Optional[datetime] = None
 
 
 class ClienteList(BaseModel):
     """Schema for list of Clienti"""
     items: list[ClienteGestionale]
     total: int
+    # Risultato servito dall'ultimo snapshot valido (ASITRON non raggiungibile)
+    stale: bool = False
+    stale_since: Optional[datetime] = None
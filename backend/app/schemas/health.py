@@ -0,0 +1,37 @@
+"""
+Pydantic schemas for Health (/health/deep)
+© 2025 Enrico Callegaro - Tutti i diritti riservati.
+"""
+
+from datetime import datetime
+from typing import Literal, Optional
+from pydantic import BaseModel
+
+
+class PoolStatus(BaseModel):
+    """Schema for connection pool usage"""
+    size: int
+    checked_out: int
+    overflow: int
+    capacity: int
+    saturation: float
+    checkout_timeouts: int
+
+
+class DatabaseHealth(BaseModel):
+    """Schema for the status of a single database"""
+    status: Literal["up", "saturated", "down", "unknown"]
+    latency_ms: Optional[float] = None
+    last_check: Optional[datetime] = None
+    last_success: Optional[datetime] = None
+    last_error: Optional[str] = None
+    pool: Optional[PoolStatus] = None
+
+
+class DeepHealth(BaseModel):
+    """Schema for /health/deep response"""
+    status: Literal["healthy", "degraded", "unhealthy"]
+    checked_at: datetime
+    age_seconds: float
+    databases: dict[str, DatabaseHealth]
+    sync_lag_seconds: Optional[float] = None
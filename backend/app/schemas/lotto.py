@@ -42,6 +42,7 @@ class LottoResponse(LottoBase):
     DataFine: Optional[datetime] = None
     DataCreazione: datetime
     DataModifica: datetime
+    Versione: int = 1
 
 
 class LottoWithDetails(LottoResponse):
@@ -66,3 +67,17 @@ class LottoList(BaseModel):
     total: int
     page: int = 1
     page_size: int = 50
+
+
+class LottoDelta(BaseModel):
+    """Schema for Lotti changed since a watermark (?modified_since=)"""
+    items: list[LottoResponse]
+    deleted: list[int] = Field(default_factory=list, description="ID eliminati dopo il watermark")
+    total: int
+    watermark: datetime = Field(..., description="Valore di modified_since per la lettura successiva")
+
+
+class LottoBulk(BaseModel):
+    """Schema for Lotti read by ID (/bulk)"""
+    items: list[LottoResponse]
+    missing: list[int] = Field(default_factory=list, description="ID richiesti e non trovati")
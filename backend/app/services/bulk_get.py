@@ -0,0 +1,78 @@
+"""
+ASI-GEST Service: Lettura a blocchi per ID
+© 2025 Enrico Callegaro - Tutti i diritti riservati.
+
+Il frontend risolve i riferimenti (lotti, fasi, utenti, macchine di una
+schermata) un ID alla volta. Gli endpoint /bulk leggono fino a
+BULK_MAX_IDS entità con query IN a blocchi da BULK_IN_CHUNK_SIZE (SQL
+Server: max 2100 parametri per statement), quindi con un numero di round
+trip costante per schermata:
+
+- gli ID duplicati vengono letti una volta sola
+- gli elementi seguono l'ordine della richiesta
+- gli ID non trovati sono elencati in "missing" (nessun 404)
+"""
+
+from typing import Any, Iterable, Sequence
+
+from fastapi import HTTPException
+from sqlalchemy import Select, inspect
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+
+
+def normalize_ids(ids: Iterable[int]) -> list[int]:
+    """
+    ID senza duplicati, nell'ordine della richiesta.
+
+    Errori:
+    - 400: nessun ID o più di BULK_MAX_IDS
+    """
+    unique = list(dict.fromkeys(ids))
+    if not unique:
+        raise HTTPException(status_code=400, detail="Nessun ID richiesto")
+    if len(unique) > settings.BULK_MAX_IDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Troppi ID richiesti: {len(unique)} (max {settings.BULK_MAX_IDS})",
+        )
+    return unique
+
+
+def parse_ids(ids: str) -> list[int]:
+    """
+    ID dal parametro ?ids=1,2,3.
+
+    Errori:
+    - 400: valori non interi, nessun ID o più di BULK_MAX_IDS
+    """
+    try:
+        values = [int(value) for value in ids.split(",") if value.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids deve essere una lista di interi separati da virgola")
+    return normalize_ids(values)
+
+
+def get_by_ids(db: Session, stmt: Select, model: Any, ids: Sequence[int]) -> tuple[list, list[int]]:
+    """
+    Righe per chiave primaria, con query IN a blocchi.
+
+    Parametri:
+    - db: sessione ASI_GEST (per le route async: via run_sync)
+    - stmt: select(model), eventualmente con load_only (?fields=)
+    - model: modello ORM (Lotto, Fase, ...)
+    - ids: ID normalizzati (normalize_ids / parse_ids)
+
+    Ritorna:
+    - (righe nell'ordine di ids, ID non trovati)
+    """
+    pk = inspect(model).primary_key[0]
+    found = {}
+    for start in range(0, len(ids), settings.BULK_IN_CHUNK_SIZE):
+        chunk = ids[start:start + settings.BULK_IN_CHUNK_SIZE]
+        for row in db.execute(stmt.where(pk.in_(chunk))).scalars():
+            found[getattr(row, pk.key)] = row
+    rows = [found[id_] for id_ in ids if id_ in found]
+    missing = [id_ for id_ in ids if id_ not in found]
+    return rows, missing
@@ -0,0 +1,108 @@
+"""
+ASI-GEST Service: ConfigJSON commesse
+© 2025 Enrico Callegaro - Tutti i diritti riservati.
+
+ConfigCommessa.ConfigJSON contiene le impostazioni di produzione come testo.
+Il JSON viene validato una sola volta in scrittura (schema Pydantic
+ConfigCommessaSettings, compilato all'import) e in lettura la versione
+risolta viene tenuta in cache per ConfigCommessaID.
+
+La voce in cache è associata a DataModifica: se la riga è stata modificata
+da un altro processo la voce non corrisponde e viene ricalcolata.
+"""
+
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models import ConfigCommessa
+from app.schemas.config_commessa import ConfigCommessaSettings, ConfigCommessaResolved
+
+# Default dei flag (come da modello ConfigCommessa)
+FLAG_DEFAULTS = {
+    "FlagSMD": True,
+    "FlagPTH": False,
+    "FlagControlli": True,
+    "FlagTerzista": False,
+}
+
+# Cache: ConfigCommessaID → (DataModifica, ConfigCommessaResolved)
+_resolved_cache = TTLCache(ttl_seconds=None, max_entries=settings.CONFIG_CACHE_MAX_ENTRIES)
+
+
+def parse_config_json(raw: Optional[str]) -> ConfigCommessaSettings:
+    """
+    Parsing e validazione del ConfigJSON memorizzato.
+
+    Solleva pydantic.ValidationError se il testo non rispetta lo schema.
+    """
+    if not raw:
+        return ConfigCommessaSettings()
+    return ConfigCommessaSettings.model_validate_json(raw)
+
+
+def dump_config_json(config_settings: Optional[ConfigCommessaSettings]) -> Optional[str]:
+    """Serializza le impostazioni già validate per la colonna ConfigJSON"""
+    if config_settings is None:
+        return None
+    return config_settings.model_dump_json(exclude_none=True)
+
+
+def _resolve(row, config_settings: ConfigCommessaSettings) -> ConfigCommessaResolved:
+    flags = {}
+    for flag, default in FLAG_DEFAULTS.items():
+        value = getattr(config_settings, flag, None)
+        if value is None:
+            value = getattr(row, flag)
+        flags[flag] = default if value is None else value
+
+    return ConfigCommessaResolved(
+        ConfigCommessaID=row.ConfigCommessaID,
+        Impostazioni=config_settings,
+        DataModifica=row.DataModifica,
+        **flags,
+    )
+
+
+def get_resolved_config(db: Session, config_id: int) -> Optional[ConfigCommessaResolved]:
+    """
+    Ritorna la configurazione risolta (flag di colonna + ConfigJSON).
+
+    Legge sempre la sola testata (senza colonne Text) per verificare
+    DataModifica; ConfigJSON viene letto e parsato solo in caso di cache miss.
+    Ritorna None se la configurazione non esiste.
+    """
+    row = db.execute(
+        select(
+            ConfigCommessa.ConfigCommessaID,
+            ConfigCommessa.FlagSMD,
+            ConfigCommessa.FlagPTH,
+            ConfigCommessa.FlagControlli,
+            ConfigCommessa.FlagTerzista,
+            ConfigCommessa.DataModifica,
+        ).where(ConfigCommessa.ConfigCommessaID == config_id)
+    ).first()
+
+    if row is None:
+        _resolved_cache.invalidate(config_id)
+        return None
+
+    cached = _resolved_cache.get(config_id)
+    if cached is not None and cached[0] == row.DataModifica:
+        return cached[1]
+
+    raw = db.execute(
+        select(ConfigCommessa.ConfigJSON).where(ConfigCommessa.ConfigCommessaID == config_id)
+    ).scalar()
+
+    resolved = _resolve(row, parse_config_json(raw))
+    _resolved_cache.set(config_id, (row.DataModifica, resolved))
+    return resolved
+
+
+def invalidate_config(config_id: int) -> None:
+    """Invalida la configurazione risolta in cache (da chiamare dopo ogni update)"""
+    _resolved_cache.invalidate(config_id)
@@ -0,0 +1,135 @@
+"""
+ASI-GEST Service: Sincronizzazione delta delle liste
+© 2025 Enrico Callegaro - Tutti i diritti riservati.
+
+Terminali e dashboard rileggono le liste a intervalli regolari. Con
+?modified_since=<watermark> le liste di lotti, fasi, config, utenti e
+macchine restituiscono solo:
+
+- items: le righe con DataModifica > watermark (indice IX_<tabella>_DataModifica)
+- deleted: gli ID eliminati dopo il watermark (tabella Tombstones)
+- watermark: il valore da inviare alla lettura successiva
+
+Il watermark restituito è l'ora del server meno DELTA_SYNC_SAFETY_SECONDS,
+letta prima delle query: una transazione che assegna DataModifica ma
+termina il commit dopo la lettura, o un piccolo scarto fra gli orologi dei
+worker, ricade nel margine. Le righe del margine possono arrivare due
+volte: il client le applica come upsert.
+
+I filtri di stato (aperto, completata, attivo, attiva) non vengono applicati
+in modalità delta, così una riga che esce dal filtro (lotto chiuso, utente
+disattivato) arriva comunque al client; restano i filtri di ambito (fase,
+commessa, reparto). I tombstone non hanno ambito: il client ignora gli ID
+che non conosce.
+
+Con un watermark più vecchio della conservazione dei tombstone
+(DELTA_SYNC_TOMBSTONE_DAYS) o con più di DELTA_SYNC_MAX_ROWS righe cambiate
+la risposta è 410 Gone: il client ricarica la lista completa.
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from fastapi import HTTPException
+from sqlalchemy import Select, delete, event, insert, inspect, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import ConfigCommessa, Fase, Lotto, Macchina, Tombstone, Utente
+
+# Entità di cui si registrano le cancellazioni (Tombstone.Entita = nome del modello)
+TRACKED_MODELS = (Lotto, Fase, ConfigCommessa, Utente, Macchina)
+
+RELOAD_REQUIRED = "Delta non disponibile per questo modified_since: ricaricare la lista completa"
+
+
+def _utc_naive(value: datetime) -> datetime:
+    """Datetime in UTC senza timezone, come DataModifica nel database"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def delta_window(modified_since: datetime) -> tuple[datetime, datetime]:
+    """
+    Normalizza il watermark del client e calcola quello della risposta.
+
+    Parametri:
+    - modified_since: watermark ricevuto dal client (naive = UTC)
+
+    Ritorna:
+    - (since, watermark): entrambi UTC naive
+
+    Errori:
+    - 410: watermark più vecchio della conservazione dei tombstone
+    """
+    now = datetime.utcnow()
+    since = _utc_naive(modified_since)
+    if since < now - timedelta(days=settings.DELTA_SYNC_TOMBSTONE_DAYS):
+        raise HTTPException(status_code=410, detail=RELOAD_REQUIRED)
+    return since, now - timedelta(seconds=settings.DELTA_SYNC_SAFETY_SECONDS)
+
+
+def read_delta(db: Session, stmt: Select, model: Any, since: datetime) -> tuple[list, list[int]]:
+    """
+    Righe cambiate e ID eliminati dopo since.
+
+    Parametri:
+    - db: sessione ASI_GEST (per le route async: via run_sync)
+    - stmt: select(model) con i soli filtri di ambito
+    - model: modello ORM (Lotto, Fase, ...)
+    - since: watermark normalizzato da delta_window
+
+    Ritorna:
+    - (righe ordinate per DataModifica, ID eliminati)
+
+    Errori:
+    - 410: più di DELTA_SYNC_MAX_ROWS righe cambiate
+    """
+    pk = inspect(model).primary_key[0]
+    rows = db.execute(
+        stmt.where(model.DataModifica > since)
+        .order_by(model.DataModifica, pk)
+        .limit(settings.DELTA_SYNC_MAX_ROWS + 1)
+    ).scalars().all()
+    if len(rows) > settings.DELTA_SYNC_MAX_ROWS:
+        raise HTTPException(status_code=410, detail=RELOAD_REQUIRED)
+
+    deleted = db.execute(
+        select(Tombstone.EntitaID)
+        .where(Tombstone.Entita == model.__name__, Tombstone.DataCancellazione > since)
+        .order_by(Tombstone.DataCancellazione)
+    ).scalars().all()
+    return rows, list(deleted)
+
+
+@event.listens_for(Session, "after_flush")
+def _record_tombstones(session: Session, flush_context) -> None:
+    """
+    Registra un tombstone per ogni entità tracciata eliminata nel flush.
+
+    Il tombstone viene scritto nella stessa transazione della DELETE (un
+    rollback annulla entrambi). Le cancellazioni sono rare: qui si eliminano
+    anche i tombstone oltre la conservazione per le stesse entità.
+    """
+    deleted = [obj for obj in session.deleted if isinstance(obj, TRACKED_MODELS)]
+    if not deleted:
+        return
+
+    now = datetime.utcnow()
+    entities = sorted({type(obj).__name__ for obj in deleted})
+    connection = session.connection()
+    connection.execute(insert(Tombstone), [
+        {
+            "Entita": type(obj).__name__,
+            "EntitaID": inspect(obj).identity[0],
+            "DataCancellazione": now,
+        }
+        for obj in deleted
+    ])
+    connection.execute(
+        delete(Tombstone).where(
+            Tombstone.Entita.in_(entities),
+            Tombstone.DataCancellazione < now - timedelta(days=settings.DELTA_SYNC_TOMBSTONE_DAYS),
+        )
+    )
@@ -0,0 +1,153 @@
+"""
+ASI-GEST Service: Join ASI_GEST ↔ ASITRON
+© 2025 Enrico Callegaro - Tutti i diritti riservati.
+
+Fasi e ConfigCommessa referenziano le commesse del gestionale tramite
+CommessaERPId (= AnagraficaCommesse.Progressivo), senza FK fra i due database.
+
+Questo servizio risolve le testate ERP per un blocco di righe locali:
+1. raccoglie i CommessaERPId distinti
+2. legge dalla cache quelli già noti
+3. recupera i mancanti con una query IN a blocchi (chunk)
+4. esegue l'hash join in memoria
+
+Il numero di round trip verso ASITRON è quindi costante per pagina,
+indipendentemente dal numero di commesse distinte. Con ASITRON non
+raggiungibile (circuit breaker aperto) il join usa solo la cache e
+restituisce stale_since: la route lo segnala con mark_stale (header
+Warning, come le liste del gestionale) e le righe senza testata in cache
+hanno CommessaERP=None.
+"""
+
+import logging
+from datetime import datetime
+from typing import Any, Iterable, Optional, Sequence, TypeVar
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.schemas.gestionale import CommessaGestionale
+from app.services.erp_snapshot import ERP_UNAVAILABLE
+
+logger = logging.getLogger("asigest.erp")
+
+T = TypeVar("T")
+
+# Cache testate commesse: CommessaERPId → (istante di lettura, CommessaGestionale o None = non trovata)
+_commesse_cache = TTLCache(
+    ttl_seconds=settings.ERP_CACHE_TTL_SECONDS,
+    max_entries=settings.ERP_CACHE_MAX_ENTRIES,
+)
+
+_COMMESSE_BY_ID_SQL = text("""
+    SELECT
+        a.Progressivo,
+        a.AnnoCom,
+        a.NumCom,
+        a.Riferimento,
+        a.CliCommitt,
+        COALESCE(c.DSCCONTO1, '') as NomeCliente,
+        a.DataEmissione,
+        a.DataConsegnaContr,
+        a.DataConsegnaContr as DATAFINEPIANO,
+        a.StatoCommessa,
+        a.Oggetto
+    FROM dbo.AnagraficaCommesse a
+    LEFT JOIN dbo.ANAGRAFICACF c ON a.CliCommitt = c.CODCONTO
+    WHERE a.Progressivo IN :ids
+""").bindparams(bindparam("ids", expanding=True))
+
+
+def _chunks(values: list, size: int) -> Iterable[list]:
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _row_to_commessa(row: Any) -> CommessaGestionale:
+    return CommessaGestionale(
+        PROGRESSIVO=row[0],
+        ESERCIZIO=row[1],
+        NUMEROCOM=row[2],
+        RIFCOMMCLI=row[3],
+        CODCLIENTE=row[4],
+        NomeCliente=row[5],
+        DATAEMISSIONE=row[6],
+        DATAINIZIOPIANO=row[7],
+        DATAFINEPIANO=row[8],
+        STATOCHIUSO=row[9],
+        ANNOTAZIONI=row[10],
+    )
+
+
+def get_commesse_erp(
+    db: Session,
+    commessa_ids: Iterable[Optional[int]],
+) -> tuple[dict[int, CommessaGestionale], Optional[datetime]]:
+    """
+    Recupera le testate commessa ASITRON per un insieme di CommessaERPId.
+
+    Gli ID nulli o a 0 (placeholder di ConfigCommessa non ancora collegate)
+    vengono ignorati. Gli ID non presenti nel gestionale vengono messi in
+    cache come assenti, per non ripetere la query ad ogni pagina.
+
+    Ritorna:
+    - (testate per CommessaERPId, stale_since): stale_since è None se le
+      testate mancanti sono state lette; con ASITRON non raggiungibile è
+      la lettura più vecchia fra quelle servite dalla cache (l'istante
+      corrente se nessuna era in cache)
+    """
+    ids = {commessa_id for commessa_id in commessa_ids if commessa_id}
+    if not ids:
+        return {}, None
+
+    found, missing = _commesse_cache.get_many(ids)
+
+    stale_since = None
+    if missing:
+        read_at = datetime.utcnow()
+        fetched: dict[int, Optional[CommessaGestionale]] = dict.fromkeys(missing)
+        try:
+            for chunk in _chunks(sorted(missing), settings.ERP_IN_CHUNK_SIZE):
+                for row in db.execute(_COMMESSE_BY_ID_SQL, {"ids": chunk}):
+                    commessa = _row_to_commessa(row)
+                    fetched[commessa.PROGRESSIVO] = commessa
+        except ERP_UNAVAILABLE as e:
+            # Gestionale non raggiungibile: le righe locali restano servite,
+            # con le sole testate già in cache
+            logger.warning("ASITRON unavailable, ERP join limited to cache: %s", e)
+            db.rollback()
+            stale_since = min((entry[0] for entry in found.values()), default=read_at)
+        else:
+            entries = {key: (read_at, value) for key, value in fetched.items()}
+            _commesse_cache.set_many(entries)
+            found.update(entries)
+
+    return {key: value for key, (_, value) in found.items() if value is not None}, stale_since
+
+
+def join_commesse_erp(
+    db: Session,
+    rows: Sequence[T],
+    key: str = "CommessaERPId",
+) -> tuple[list[tuple[T, Optional[CommessaGestionale]]], Optional[datetime]]:
+    """
+    Hash join in memoria fra righe locali e testate commessa ASITRON.
+
+    Ritorna:
+    - (lista (riga, commessa) nello stesso ordine di `rows`, stale_since):
+      commessa è None se la riga non è collegata, la commessa non esiste o
+      ASITRON non è raggiungibile e la testata non è in cache; stale_since
+      come in get_commesse_erp
+    """
+    commesse, stale_since = get_commesse_erp(db, (getattr(row, key) for row in rows))
+    return [(row, commesse.get(getattr(row, key))) for row in rows], stale_since
+
+
+def invalidate_commesse_erp(commessa_id: Optional[int] = None) -> None:
+    """Invalida una singola commessa in cache, o tutta la cache se None"""
+    if commessa_id is None:
+        _commesse_cache.clear()
+    else:
+        _commesse_cache.invalidate(commessa_id)
@@ -0,0 +1,70 @@
+"""
+ASI-GEST Service: Snapshot ultimo risultato valido ASITRON
+© 2025 Enrico Callegaro - Tutti i diritti riservati.
+
+Durante un fermo del gestionale (errore di connessione o circuit breaker
+aperto) le liste di consultazione restano utilizzabili: ogni risultato
+letto con successo viene conservato in memoria, e in caso di errore si
+restituisce l'ultimo risultato valido segnalato come stale.
+
+Uso in una route:
+
+    commesse, stale_since = with_stale_fallback(("commesse", aperte, limit), fetch)
+    mark_stale(response, stale_since)
+"""
+
+from datetime import datetime
+from typing import Callable, Hashable, Optional, TypeVar
+
+from fastapi import HTTPException, Response
+from sqlalchemy import exc
+
+from app.core.cache import TTLCache
+from app.core.circuit_breaker import CircuitOpenError
+from app.core.config import settings
+from app.core.database import breaker_asitron
+
+T = TypeVar("T")
+
+# Errori per cui il gestionale è considerato non raggiungibile
+ERP_UNAVAILABLE = (CircuitOpenError, exc.OperationalError, exc.InterfaceError, exc.TimeoutError)
+
+# Chiave della query → (istante di lettura, risultato)
+_snapshots = TTLCache(
+    ttl_seconds=settings.ERP_STALE_MAX_AGE_SECONDS,
+    max_entries=settings.ERP_STALE_MAX_ENTRIES,
+)
+
+
+def with_stale_fallback(key: Hashable, fetch: Callable[[], T]) -> tuple[T, Optional[datetime]]:
+    """
+    Esegue fetch() e ne conserva il risultato.
+
+    Ritorna (risultato, None) se la lettura riesce, oppure
+    (ultimo risultato valido, istante di lettura) se ASITRON non è
+    raggiungibile. Senza snapshot disponibile solleva 503.
+    """
+    try:
+        value = fetch()
+    except ERP_UNAVAILABLE as e:
+        cached = _snapshots.get(key)
+        if cached is not None:
+            read_at, value = cached
+            return value, read_at
+        retry_after = e.retry_after if isinstance(e, CircuitOpenError) else breaker_asitron.retry_after()
+        raise HTTPException(
+            status_code=503,
+            detail="ASITRON database unavailable, retry later",
+            headers={"Retry-After": str(max(int(retry_after), 1))},
+        )
+
+    _snapshots.set(key, (datetime.utcnow(), value))
+    return value, None
+
+
+def mark_stale(response: Response, stale_since: Optional[datetime]) -> None:
+    """Header di avviso per risposte servite dallo snapshot"""
+    if stale_since is None:
+        return
+    response.headers["Warning"] = '110 - "Response is Stale"'
+    response.headers["X-Data-Stale-Since"] = stale_since.isoformat() + "Z"
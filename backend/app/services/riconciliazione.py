@@ -0,0 +1,187 @@
+"""
+ASI-GEST Service: Riconciliazione quantità Fasi/Lotti
+© 2025 Enrico Callegaro - Tutti i diritti riservati.
+
+Confronta QtaPrevista/QtaProdotta/QtaResidua di tutte le fasi aperte
+con i totali effettivi dei lotti, usando una sola query aggregata
+(Fasi LEFT JOIN Lotti GROUP BY FaseID) invece di una query per fase.
+
+Le discrepanze possono essere restituite in streaming oppure corrette
+con UPDATE a blocchi.
+
+Uso da riga di comando (es. job notturno):
+    python -m app.services.riconciliazione            # solo verifica
+    python -m app.services.riconciliazione --applica  # corregge i valori
+"""
+
+from datetime import datetime
+from typing import Iterator, Optional
+
+from sqlalchemy import select, func, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
+
+from app.core.config import settings
+from app.models import Fase, Lotto
+from app.schemas.fase import FaseDiscrepanza, RiconciliazioneResult
+
+
+def _fasi_aperte_stmt():
+    """Query aggregata: una riga per fase non chiusa con i totali dei lotti"""
+    return (
+        select(
+            Fase.FaseID,
+            Fase.CommessaERPId,
+            Fase.Stato,
+            Fase.Quantita,
+            Fase.QtaPrevista,
+            Fase.QtaProdotta,
+            Fase.QtaResidua,
+            Fase.Versione,
+            func.count(Lotto.LottoID).label("NumeroLotti"),
+            func.coalesce(func.sum(Lotto.QtaOutput), 0).label("QtaProdottaLotti"),
+        )
+        .outerjoin(Lotto, Lotto.FaseID == Fase.FaseID)
+        .where(Fase.Stato != "CHIUSA")
+        .group_by(
+            Fase.FaseID,
+            Fase.CommessaERPId,
+            Fase.Stato,
+            Fase.Quantita,
+            Fase.QtaPrevista,
+            Fase.QtaProdotta,
+            Fase.QtaResidua,
+            Fase.Versione,
+        )
+        .order_by(Fase.FaseID)
+    )
+
+
+def _check(row) -> Optional[FaseDiscrepanza]:
+    """Ritorna la discrepanza per una riga aggregata, None se la fase è coerente"""
+    prodotta = int(row.QtaProdottaLotti)
+    prevista = row.QtaPrevista if row.QtaPrevista is not None else row.Quantita
+    residua = max(prevista - prodotta, 0) if prevista is not None else None
+
+    campi = []
+    if row.QtaProdotta != prodotta:
+        campi.append("QtaProdotta")
+    if row.QtaResidua != residua:
+        campi.append("QtaResidua")
+    if row.Quantita is not None and row.QtaPrevista is not None and row.Quantita != row.QtaPrevista:
+        campi.append("QtaPrevista")
+
+    if not campi:
+        return None
+
+    return FaseDiscrepanza(
+        FaseID=row.FaseID,
+        CommessaERPId=row.CommessaERPId,
+        Stato=row.Stato,
+        Quantita=row.Quantita,
+        QtaPrevista=row.QtaPrevista,
+        QtaProdotta=row.QtaProdotta,
+        QtaResidua=row.QtaResidua,
+        Versione=row.Versione,
+        NumeroLotti=row.NumeroLotti,
+        QtaProdottaLotti=prodotta,
+        QtaResiduaCalcolata=residua,
+        Campi=campi,
+    )
+
+
+def iter_discrepanze(db: Session, stats: Optional[dict] = None) -> Iterator[FaseDiscrepanza]:
+    """
+    Genera le discrepanze delle fasi aperte leggendo il risultato a blocchi.
+
+    Se `stats` è un dict, vi viene aggiornato il conteggio "FasiVerificate".
+    """
+    stmt = _fasi_aperte_stmt().execution_options(yield_per=settings.RICONCILIAZIONE_BATCH_SIZE)
+    verificate = 0
+    for row in db.execute(stmt):
+        verificate += 1
+        discrepanza = _check(row)
+        if discrepanza is not None:
+            yield discrepanza
+    if stats is not None:
+        stats["FasiVerificate"] = verificate
+
+
+def applica_correzioni(
+    db: Session,
+    discrepanze: list[FaseDiscrepanza],
+    batch_size: Optional[int] = None,
+) -> int:
+    """
+    Scrive QtaProdotta/QtaResidua calcolate con UPDATE per chiave primaria
+    a blocchi (executemany), con commit per blocco.
+
+    Ogni UPDATE è condizionato alla Versione letta: se una fase del blocco è
+    stata modificata nel frattempo il blocco viene annullato e sarà ripreso
+    alla prossima esecuzione.
+
+    Ritorna il numero di fasi aggiornate.
+    """
+    batch_size = batch_size or settings.RICONCILIAZIONE_BATCH_SIZE
+    aggiornate = 0
+
+    for start in range(0, len(discrepanze), batch_size):
+        now = datetime.utcnow()
+        batch = [
+            {
+                "FaseID": d.FaseID,
+                "QtaProdotta": d.QtaProdottaLotti,
+                "QtaResidua": d.QtaResiduaCalcolata,
+                "Versione": d.Versione,
+                "DataModifica": now,
+            }
+            for d in discrepanze[start:start + batch_size]
+            if "QtaProdotta" in d.Campi or "QtaResidua" in d.Campi
+        ]
+        if not batch:
+            continue
+        try:
+            db.execute(update(Fase), batch)
+            db.commit()
+        except StaleDataError:
+            db.rollback()
+            continue
+        aggiornate += len(batch)
+
+    return aggiornate
+
+
+def riconcilia(db: Session, applica: bool = False) -> RiconciliazioneResult:
+    """
+    Esegue la riconciliazione completa.
+
+    Con applica=True le discrepanze vengono prima lette tutte (la connessione
+    non può avere un cursore aperto durante gli UPDATE) e poi corrette a blocchi.
+    """
+    stats: dict = {}
+    discrepanze = list(iter_discrepanze(db, stats))
+    aggiornate = applica_correzioni(db, discrepanze) if applica else 0
+
+    return RiconciliazioneResult(
+        FasiVerificate=stats.get("FasiVerificate", 0),
+        Discrepanze=len(discrepanze),
+        Aggiornate=aggiornate,
+    )
+
+
+if __name__ == "__main__":
+    import sys
+
+    from app.core.database import SessionLocalAsiGest, get_engine_asi_gest
+
+    get_engine_asi_gest()
+    db = SessionLocalAsiGest()
+    try:
+        result = riconcilia(db, applica="--applica" in sys.argv)
+    finally:
+        db.close()
+
+    print(
+        f"✓ Fasi verificate: {result.FasiVerificate} - "
+        f"discrepanze: {result.Discrepanze} - aggiornate: {result.Aggiornate}"
+    )
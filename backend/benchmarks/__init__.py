@@ -0,0 +1,9 @@
+"""
+ASI-GEST Benchmarks
+© 2025 Enrico Callegaro - Tutti i diritti riservati.
+
+Script di misura delle prestazioni, eseguiti su un database locale
+(SQLite) senza toccare ASI_GEST/ASITRON di produzione:
+
+    python -m benchmarks.async_vs_sync
+"""
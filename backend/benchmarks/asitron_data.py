@@ -0,0 +1,221 @@
+"""
+ASI-GEST Benchmark: database ASITRON fittizio
+© 2025 Enrico Callegaro - Tutti i diritti riservati.
+
+Crea su SQLite le tabelle del gestionale lette da ASI-GEST
+(AnagraficaCommesse, ANAGRAFICAARTICOLI, ANAGRAFICACF), con gli stessi
+nomi di colonna, e le popola con volumi realistici. Con
+DB_ASITRON_URL=sqlite:///... l'applicazione legge questo database
+tramite lo shim di app/core/fake_asitron.py (TOP, dbo.).
+
+I Progressivo delle commesse vanno da 1 a --commesse: con il default
+(30000) coprono i CommessaERPId generati da benchmarks.datagen
+(da ERP_ID_BASE + 1), quindi il join ASI_GEST ↔ ASITRON trova le testate.
+
+Uso:
+    python -m benchmarks.asitron_data --url sqlite:///./asitron_bench.db
+    python -m benchmarks.asitron_data --url sqlite:///./asitron_bench.db --commesse 5000 --drop
+"""
+
+import argparse
+import random
+import time
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import Column, Date, DateTime, Index, Integer, MetaData, String, Table
+
+metadata = MetaData()
+
+anagrafica_commesse = Table(
+    "AnagraficaCommesse", metadata,
+    Column("Progressivo", Integer, primary_key=True, autoincrement=False),
+    Column("AnnoCom", Integer, nullable=False),
+    Column("NumCom", Integer, nullable=False),
+    Column("Riferimento", String(50)),
+    Column("CliCommitt", String(20)),
+    Column("Oggetto", String(200)),
+    Column("DataEmissione", Date),
+    Column("DataConsegnaContr", Date),
+    Column("StatoCommessa", Integer, nullable=False),  # 0 = aperta
+    Column("DATAMODIFICA", DateTime),
+    Index("IX_AnagraficaCommesse_Anno_Num", "AnnoCom", "NumCom"),
+    Index("IX_AnagraficaCommesse_Stato", "StatoCommessa"),
+)
+
+anagrafica_articoli = Table(
+    "ANAGRAFICAARTICOLI", metadata,
+    Column("CODICE", String(50), primary_key=True),
+    Column("DESCRIZIONE", String(200)),
+    Column("ARTTIPOLOGIA", Integer),  # decimal su SQL Server
+)
+
+anagrafica_cf = Table(
+    "ANAGRAFICACF", metadata,
+    Column("CODCONTO", String(20), primary_key=True),
+    Column("DSCCONTO1", String(100), nullable=False),
+    Column("DSCCONTO2", String(100)),
+    Column("PARTITAIVA", String(20)),
+    Column("CODFISCALE", String(20)),
+    Column("INDIRIZZO", String(100)),
+    Column("LOCALITA", String(50)),
+    Column("PROVINCIA", String(2)),
+    Column("CAP", String(5)),
+    Index("IX_ANAGRAFICACF_DSCCONTO1", "DSCCONTO1"),
+)
+
+BATCH_SIZE = 10_000
+
+RAGIONI_SOCIALI = ["Elettronica", "Automazioni", "Sistemi", "Controlli", "Impianti", "Tecnologie", "Meccatronica"]
+FORME = ["S.r.l.", "S.p.A.", "S.n.c.", "S.a.s."]
+LOCALITA = [
+    ("Padova", "PD", "35100"), ("Vicenza", "VI", "36100"), ("Treviso", "TV", "31100"),
+    ("Verona", "VR", "37100"), ("Milano", "MI", "20100"), ("Bologna", "BO", "40100"),
+    ("Torino", "TO", "10100"), ("Venezia", "VE", "30100"),
+]
+OGGETTI = ["Scheda controllo", "Alimentatore", "Scheda I/O", "Modulo display", "Scheda potenza", "Sensore"]
+
+
+def _insert(conn, table: Table, rows: list[dict]) -> None:
+    for start in range(0, len(rows), BATCH_SIZE):
+        conn.execute(table.insert(), rows[start:start + BATCH_SIZE])
+
+
+def _clienti(rng: random.Random, n: int) -> list[dict]:
+    rows = []
+    for i in range(1, n + 1):
+        # Circa un terzo fornitori (F), il resto clienti (C)
+        prefisso = "F" if i % 3 == 0 else "C"
+        localita, provincia, cap = rng.choice(LOCALITA)
+        piva = f"{rng.randint(0, 99999999999):011d}"
+        rows.append({
+            "CODCONTO": f"{prefisso}{i:05d}",
+            "DSCCONTO1": f"{rng.choice(RAGIONI_SOCIALI)} {rng.choice(LOCALITA)[0]} {i} {rng.choice(FORME)}",
+            "DSCCONTO2": f"Divisione {rng.randint(1, 9)}" if rng.random() < 0.2 else None,
+            "PARTITAIVA": piva,
+            "CODFISCALE": piva,
+            "INDIRIZZO": f"Via Industria {rng.randint(1, 200)}",
+            "LOCALITA": localita,
+            "PROVINCIA": provincia,
+            "CAP": cap,
+        })
+    return rows
+
+
+def _articoli(rng: random.Random, n: int) -> list[dict]:
+    return [
+        {
+            "CODICE": f"{rng.choice(['45', '46', '50', '60'])}.{i // 1000:03d}.{i % 1000:03d}",
+            "DESCRIZIONE": f"{rng.choice(OGGETTI)} rev.{rng.randint(1, 9)}",
+            "ARTTIPOLOGIA": rng.choice([1, 1, 1, 2, 3, 4]),
+        }
+        for i in range(1, n + 1)
+    ]
+
+
+def _commesse(rng: random.Random, n: int, clienti: list[str], days: int) -> list[dict]:
+    today = date.today()
+    start = today - timedelta(days=days)
+    numero_per_anno: dict[int, int] = {}
+    rows = []
+    for progressivo in range(1, n + 1):
+        # Progressivo crescente nel tempo, come nel gestionale
+        emissione = start + timedelta(days=days * progressivo // n)
+        numero = numero_per_anno.get(emissione.year, 0) + 1
+        numero_per_anno[emissione.year] = numero
+        aperta = (today - emissione).days < 90 or rng.random() < 0.03
+        rows.append({
+            "Progressivo": progressivo,
+            "AnnoCom": emissione.year,
+            "NumCom": numero,
+            "Riferimento": f"ORD-{rng.randint(1000, 99999)}",
+            "CliCommitt": rng.choice(clienti),
+            "Oggetto": f"{rng.choice(OGGETTI)} - lotto {rng.randint(1, 50)}",
+            "DataEmissione": emissione,
+            "DataConsegnaContr": emissione + timedelta(days=rng.randint(15, 120)),
+            "StatoCommessa": 0 if aperta else 1,
+            "DATAMODIFICA": datetime.combine(emissione, datetime.min.time()) + timedelta(
+                days=rng.randint(0, 30), minutes=rng.randint(0, 1440)
+            ),
+        })
+    return rows
+
+
+def generate(
+    url: str,
+    commesse: int = 30_000,
+    articoli: int = 50_000,
+    clienti: int = 3_000,
+    seed: int = 42,
+    drop: bool = False,
+    days: int = 3650,
+) -> dict:
+    """
+    Crea le tabelle ASITRON su url e le popola.
+
+    Parametri:
+    - commesse, articoli, clienti: righe da generare
+    - seed: seed del generatore casuale (riproducibilità)
+    - drop: elimina e ricrea le tabelle esistenti
+    - days: ampiezza dello storico commesse
+
+    Ritorna i conteggi generati e il tempo impiegato.
+    """
+    from sqlalchemy import create_engine, func, select
+
+    engine = create_engine(url)
+    started = time.perf_counter()
+    try:
+        if drop:
+            metadata.drop_all(engine)
+        metadata.create_all(engine)
+
+        with engine.connect() as conn:
+            if conn.execute(select(func.count()).select_from(anagrafica_commesse)).scalar():
+                raise RuntimeError("Il database contiene già dati: usare --drop per rigenerarli")
+
+        rng = random.Random(seed)
+        clienti_rows = _clienti(rng, clienti)
+        codici_clienti = [row["CODCONTO"] for row in clienti_rows if row["CODCONTO"].startswith("C")]
+        with engine.begin() as conn:
+            _insert(conn, anagrafica_cf, clienti_rows)
+            _insert(conn, anagrafica_articoli, _articoli(rng, articoli))
+            _insert(conn, anagrafica_commesse, _commesse(rng, commesse, codici_clienti, days))
+    finally:
+        engine.dispose()
+
+    return {
+        "commesse": commesse,
+        "articoli": articoli,
+        "clienti": clienti,
+        "seed": seed,
+        "seconds": round(time.perf_counter() - started, 1),
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Crea e popola un database ASITRON fittizio (SQLite)")
+    parser.add_argument("--url", default="sqlite:///./asitron_bench.db", help="URL SQLAlchemy del database")
+    parser.add_argument("--commesse", type=int, default=30_000)
+    parser.add_argument("--articoli", type=int, default=50_000)
+    parser.add_argument("--clienti", type=int, default=3_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--drop", action="store_true", help="Elimina e ricrea le tabelle")
+    args = parser.parse_args(argv)
+
+    if args.clienti < 3:
+        parser.error("servono almeno 3 clienti")
+
+    print(f"Generazione ASITRON fittizio su {args.url}")
+    result = generate(
+        args.url, commesse=args.commesse, articoli=args.articoli, clienti=args.clienti,
+        seed=args.seed, drop=args.drop,
+    )
+    print(
+        f"✓ {result['commesse']} commesse, {result['articoli']} articoli, "
+        f"{result['clienti']} clienti in {result['seconds']} s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""
+ASI-GEST Benchmark: route async vs route sync
+© 2025 Enrico Callegaro - Tutti i diritti riservati.
+
+Confronta throughput e latenze (p50/p95/p99) delle route portate ad
+async def (AsyncSession) con l'equivalente sync (Session nel threadpool),
+sullo stesso database SQLite locale e con gli stessi statement SQL:
+
+- lotti_list:  GET /api/lotti/?page_size=50
+- fase_detail: GET /api/fasi/{id}
+
+Le richieste sono inviate in-process (httpx + ASGITransport) da N client
+concorrenti; le route sync sono limitate dal threadpool (40 thread),
+quelle async solo dal pool di connessioni.
+
+Uso:
+    python -m benchmarks.async_vs_sync --clients 200 --requests 20
+    python -m benchmarks.async_vs_sync --output bench_async.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+from typing import Optional
+
+from benchmarks.common import configure_env, run_load
+
+
+def seed(engine, fasi: int, lotti_per_fase: int) -> None:
+    """Dati minimi per le route misurate"""
+    from datetime import datetime, timedelta
+
+    from sqlalchemy import insert
+
+    from app.core.database import Base
+    from app.models import ConfigCommessa, Fase, FaseTipo, Lotto, Utente
+
+    Base.metadata.create_all(engine)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(insert(FaseTipo), [{"FaseTipoID": 1, "Codice": "SMD", "Descrizione": "SMD", "Tipo": "SMD"}])
+        conn.execute(insert(Utente), [{"UtenteID": 1, "Username": "bench", "NomeCompleto": "Bench"}])
+        conn.execute(insert(ConfigCommessa), [
+            {"ConfigCommessaID": i, "CommessaERPId": i, "CodiceArticolo": f"ART{i}", "Descrizione": f"Commessa {i}"}
+            for i in range(1, fasi + 1)
+        ])
+        conn.execute(insert(Fase), [
+            {"FaseID": i, "CommessaERPId": i, "ConfigCommessaID": i, "FaseTipoID": 1,
+             "Quantita": 1000, "NumeroCommessa": str(i)}
+            for i in range(1, fasi + 1)
+        ])
+        conn.execute(insert(Lotto), [
+            {"FaseID": fase_id, "Progressivo": n, "DataInizio": now - timedelta(minutes=n),
+             "DataFine": now, "QtaOutput": 10, "QtaScarti": 0, "UtenteID": 1}
+            for fase_id in range(1, fasi + 1)
+            for n in range(1, lotti_per_fase + 1)
+        ])
+
+
+def build_sync_app(session_factory):
+    """
+    Route sync equivalenti a lotti_list e fase_detail (stessi statement
+    delle route async), per il confronto sul threadpool.
+    """
+    from fastapi import Depends, FastAPI, HTTPException, Query
+    from sqlalchemy import func, select
+
+    from app.models import ConfigCommessa, Fase, FaseTipo, Lotto
+    from app.schemas import FaseResponse, FaseWithDetails, LottoList, LottoResponse
+
+    app = FastAPI()
+
+    def get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @app.get("/api/lotti/", response_model=LottoList)
+    def list_lotti(page: int = Query(1), page_size: int = Query(50), db=Depends(get_db)):
+        stmt = select(Lotto)
+        total = db.execute(select(func.count()).select_from(stmt.subquery())).scalar()
+        stmt = stmt.order_by(Lotto.LottoID.desc()).offset((page - 1) * page_size).limit(page_size)
+        lotti = db.execute(stmt).scalars().all()
+        return LottoList(
+            items=[LottoResponse.model_validate(lotto) for lotto in lotti],
+            total=total, page=page, page_size=page_size,
+        )
+
+    @app.get("/api/fasi/{fase_id}", response_model=FaseWithDetails)
+    def get_fase(fase_id: int, db=Depends(get_db)):
+        row = db.execute(
+            select(
+                Fase,
+                FaseTipo.Codice, FaseTipo.Descrizione, FaseTipo.Tipo,
+                ConfigCommessa.CodiceArticolo, ConfigCommessa.Descrizione,
+            )
+            .join(FaseTipo, Fase.FaseTipoID == FaseTipo.FaseTipoID)
+            .join(ConfigCommessa, Fase.CommessaERPId == ConfigCommessa.CommessaERPId)
+            .where(Fase.FaseID == fase_id)
+        ).first()
+        if not row:
+            raise HTTPException(status_code=404, detail="Fase not found")
+        stats = db.execute(
+            select(
+                func.count(Lotto.LottoID),
+                func.coalesce(func.sum(Lotto.QtaOutput), 0),
+                func.coalesce(func.sum(Lotto.QtaScarti), 0),
+            ).where(Lotto.FaseID == fase_id)
+        ).first()
+        fase_dict = FaseResponse.model_validate(row[0]).model_dump()
+        fase_dict.update({
+            "FaseTipoCodice": row[1], "FaseTipoDescrizione": row[2], "FaseTipoTipo": row[3],
+            "ConfigCommessaArticolo": row[4], "ConfigCommessaDescrizione": row[5],
+            "NumeroLotti": stats[0], "QuantitaProdotta": int(stats[1]), "QuantitaScarti": int(stats[2]),
+        })
+        return FaseWithDetails(**fase_dict)
+
+    return app
+
+
+def build_async_app():
+    """App con le route async reali (lotti, fasi)"""
+    from fastapi import FastAPI
+
+    from app.routes import fasi, lotti
+
+    app = FastAPI()
+    app.include_router(lotti.router, prefix="/api/lotti")
+    app.include_router(fasi.router, prefix="/api/fasi")
+    return app
+
+
+async def benchmark(clients: int, requests_per_client: int, fasi: int, lotti_per_fase: int) -> dict:
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from app.core.database import dispose_async_engines
+
+    db_path = os.environ["DB_ASI_GEST_ASYNC_URL"].split("///", 1)[1]
+    # Le sessioni sync vengono chiuse nel teardown della dependency, che a
+    # sua volta attende un thread libero: con un pool più piccolo dei client
+    # le route sync resterebbero bloccate in attesa di una connessione
+    engine = create_engine(
+        f"sqlite:///{db_path}",
+        connect_args={"check_same_thread": False},
+        pool_size=40,
+        max_overflow=clients,
+    )
+    seed(engine, fasi, lotti_per_fase)
+
+    scenarios = {
+        "lotti_list": lambda: "/api/lotti/?page_size=50",
+        "fase_detail": lambda: f"/api/fasi/{random.randint(1, fasi)}",
+    }
+    apps = {
+        "sync": build_sync_app(sessionmaker(bind=engine, autoflush=False)),
+        "async": build_async_app(),
+    }
+
+    results: dict = {
+        "clients": clients,
+        "requests_per_client": requests_per_client,
+        "dataset": {"fasi": fasi, "lotti": fasi * lotti_per_fase},
+        "scenarios": {},
+    }
+    try:
+        for name, next_path in scenarios.items():
+            results["scenarios"][name] = {}
+            for mode, app in apps.items():
+                summary = await run_load(app, next_path, clients, requests_per_client)
+                results["scenarios"][name][mode] = summary
+                print(
+                    f"{name:<12} {mode:<5} {summary['throughput_rps']:>8.1f} req/s  "
+                    f"p50 {summary['p50_ms']:>7.1f} ms  p95 {summary['p95_ms']:>7.1f} ms  "
+                    f"p99 {summary['p99_ms']:>7.1f} ms  errors {summary['errors']}"
+                )
+    finally:
+        await dispose_async_engines()
+        engine.dispose()
+    return results
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark route async vs sync (SQLite locale)")
+    parser.add_argument("--clients", type=int, default=200, help="Client concorrenti")
+    parser.add_argument("--requests", type=int, default=20, help="Richieste per client")
+    parser.add_argument("--fasi", type=int, default=500)
+    parser.add_argument("--lotti-per-fase", type=int, default=20)
+    parser.add_argument("--output", help="File JSON con i risultati")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        configure_env(os.path.join(tmp, "asi_gest_bench.db"))
+        results = asyncio.run(benchmark(args.clients, args.requests, args.fasi, args.lotti_per_fase))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"✓ Risultati salvati in {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+ASI-GEST Benchmark: funzioni comuni
+© 2025 Enrico Callegaro - Tutti i diritti riservati.
+
+Configurazione dell'ambiente locale (SQLite), generazione del carico
+in-process (httpx + ASGITransport) e calcolo dei percentili, condivisi
+dagli script in benchmarks/.
+"""
+
+import asyncio
+import os
+import subprocess
+import time
+from collections import Counter
+from typing import Callable, Optional, Union
+
+# Richiesta: path (GET) oppure (metodo, path, body JSON)
+Request = Union[str, tuple[str, str, Optional[dict]]]
+
+
+def configure_env(asi_gest_path: str, asitron_path: Optional[str] = None) -> None:
+    """
+    Punta l'applicazione su database SQLite locali, senza servizi esterni.
+
+    Va chiamata prima di importare app.* (le impostazioni vengono lette
+    all'import di app.core.config).
+    """
+    os.environ.update({
+        "PROFILE": "test",
+        "DB_ASI_GEST_URL": f"sqlite:///{asi_gest_path}",
+        "DB_ASI_GEST_ASYNC_URL": f"sqlite+aiosqlite:///{asi_gest_path}",
+        "DB_ASI_GEST_READ_ISOLATION": "",
+        "DB_WARMUP_ON_STARTUP": "False",
+        "HEALTH_CHECK_ENABLED": "False",
+        "ADMISSION_ENABLED": "False",
+        "SQL_TRACKING_ENABLED": "False",
+    })
+    if asitron_path:
+        os.environ["DB_ASITRON_URL"] = f"sqlite:///{asitron_path}"
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Percentile nearest-rank (values già ordinati)"""
+    if not values:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(values) + 0.5)) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+
+def summarize(
+    latencies: list[float],
+    errors: int,
+    elapsed: float,
+    samples: bool = False,
+    status_codes: Optional[Counter] = None,
+) -> dict:
+    """
+    Riepilogo di una serie di latenze (secondi): throughput e p50/p95/p99.
+
+    Con samples=True include le singole latenze in ms (per il confronto
+    statistico fra due esecuzioni).
+    """
+    ordered = sorted(latencies)
+    summary = {
+        "requests": len(ordered),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(ordered) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 2),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 2),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2) if ordered else 0.0,
+    }
+    if status_codes:
+        summary["status_codes"] = {str(code): n for code, n in sorted(status_codes.items())}
+    if samples:
+        summary["samples_ms"] = [round(value * 1000, 3) for value in latencies]
+    return summary
+
+
+async def run_load(
+    app,
+    next_request: Callable[[], Request],
+    clients: int,
+    requests_per_client: int,
+    warmup: int = 10,
+    samples: bool = False,
+) -> dict:
+    """
+    Esegue clients × requests_per_client richieste concorrenti sull'app ASGI.
+
+    Parametri:
+    - next_request: ritorna la prossima richiesta (path GET o metodo, path, body)
+    - warmup: richieste iniziali non misurate (connessioni e statement in cache)
+    """
+    import httpx
+
+    latencies: list[float] = []
+    errors = 0
+    status_codes: Counter = Counter()
+    # Le eccezioni non gestite diventano 500 (come sotto uvicorn), non errori del client
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        async def send():
+            request = next_request()
+            if isinstance(request, str):
+                return await client.get(request)
+            method, path, body = request
+            return await client.request(method, path, json=body)
+
+        for _ in range(warmup):
+            await send()
+
+        async def worker():
+            nonlocal errors
+            for _ in range(requests_per_client):
+                start = time.perf_counter()
+                response = await send()
+                latencies.append(time.perf_counter() - start)
+                status_codes[response.status_code] += 1
+                if response.status_code >= 400:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(clients)))
+        elapsed = time.perf_counter() - start
+
+    return summarize(latencies, errors, elapsed, samples=samples, status_codes=status_codes)
+
+
+def git_commit() -> Optional[str]:
+    """Commit corrente del repository (None fuori da git)"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
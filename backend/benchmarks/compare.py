@@ -0,0 +1,291 @@
+"""
+ASI-GEST Benchmark: confronto con una baseline
+© 2025 Enrico Callegaro - Tutti i diritti riservati.
+
+Salva una baseline dei benchmark (benchmarks.runner) e confronta le
+esecuzioni successive, per accorgersi prima del deploy se una modifica ha
+rallentato un endpoint.
+
+Per ogni endpoint presente in entrambe le esecuzioni:
+- variazione percentuale di p50 e p95
+- test di Mann-Whitney U unilaterale sulle distribuzioni delle latenze
+  (H1: le latenze correnti sono maggiori), con correzione per i pareggi
+- regressione se la metrica scelta peggiora oltre --threshold (%) e la
+  differenza è significativa (p < --alpha), oppure se la quota di errori
+  aumenta di oltre un punto percentuale
+
+Codici di uscita:
+- 0: nessuna regressione
+- 1: almeno un endpoint in regressione
+- 2: baseline mancante o non confrontabile (dataset o carico diversi,
+  endpoint con errori nella baseline); il comando baseline non salva
+  un'esecuzione con endpoint in errore ed esce con 2
+
+Uso:
+    python -m benchmarks.compare baseline --db ./bench.db
+    python -m benchmarks.compare check --db ./bench.db --threshold 15
+    python -m benchmarks.compare diff bench_baseline.json bench_results.json
+
+Le misure in-process su SQLite hanno un rumore fra esecuzioni di qualche
+punto percentuale: baseline e confronto vanno eseguiti sulla stessa
+macchina, con lo stesso dataset e lo stesso carico (--clients, --requests).
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+from statistics import NormalDist
+from typing import Optional
+
+from benchmarks import runner
+
+EXIT_OK = 0
+EXIT_REGRESSION = 1
+EXIT_NOT_COMPARABLE = 2
+
+DEFAULT_BASELINE = "bench_baseline.json"
+# Campioni minimi per endpoint perché il test statistico abbia senso
+MIN_SAMPLES = 8
+# Aumento della quota di errori tollerato (es. 409 occasionali da scritture concorrenti)
+ERROR_RATE_TOLERANCE = 0.01
+
+
+def _ranks(values: list[float]) -> tuple[list[float], float]:
+    """Ranghi medi (pareggi compresi) e termine di correzione Σ(t³ - t)"""
+    order = sorted(range(len(values)), key=values.__getitem__)
+    ranks = [0.0] * len(values)
+    ties = 0.0
+    i = 0
+    while i < len(order):
+        j = i
+        while j + 1 < len(order) and values[order[j + 1]] == values[order[i]]:
+            j += 1
+        rank = (i + j) / 2 + 1
+        for k in range(i, j + 1):
+            ranks[order[k]] = rank
+        t = j - i + 1
+        ties += t ** 3 - t
+        i = j + 1
+    return ranks, ties
+
+
+def mann_whitney_greater(baseline: list[float], current: list[float]) -> float:
+    """
+    p-value unilaterale del test di Mann-Whitney U (approssimazione normale).
+
+    Ipotesi alternativa: i valori di current tendono a essere maggiori di
+    quelli di baseline. Valori piccoli indicano un peggioramento reale.
+    """
+    n1, n2 = len(current), len(baseline)
+    if not n1 or not n2:
+        return 1.0
+    ranks, ties = _ranks(current + baseline)
+    u = sum(ranks[:n1]) - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    variance = n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+    # Correzione di continuità
+    z = (u - n1 * n2 / 2 - 0.5) / math.sqrt(variance)
+    return 1 - NormalDist().cdf(z)
+
+
+def _change(baseline: float, current: float) -> float:
+    if not baseline:
+        return 0.0
+    return (current - baseline) / baseline * 100
+
+
+def _error_rate(result: dict) -> float:
+    return result["errors"] / result["requests"] if result["requests"] else 0.0
+
+
+def compare_endpoint(
+    baseline: dict,
+    current: dict,
+    metric: str = "p50",
+    threshold: float = 15.0,
+    alpha: float = 0.01,
+) -> dict:
+    """
+    Confronta i risultati di un endpoint.
+
+    Ritorna variazioni, p-value e verdetto: "regression", "improvement",
+    "unchanged" oppure "errors" (aumento della quota di errori).
+    """
+    changes = {m: round(_change(baseline[f"{m}_ms"], current[f"{m}_ms"]), 1) for m in ("p50", "p95")}
+    base_samples = baseline.get("samples_ms") or []
+    cur_samples = current.get("samples_ms") or []
+
+    p_worse = p_better = None
+    if len(base_samples) >= MIN_SAMPLES and len(cur_samples) >= MIN_SAMPLES:
+        p_worse = mann_whitney_greater(base_samples, cur_samples)
+        p_better = mann_whitney_greater(cur_samples, base_samples)
+
+    # Senza campioni vale solo la soglia sulla metrica
+    significant_worse = p_worse is None or p_worse < alpha
+    significant_better = p_better is None or p_better < alpha
+    change = changes[metric]
+
+    if _error_rate(current) > _error_rate(baseline) + ERROR_RATE_TOLERANCE:
+        verdict = "errors"
+    elif change > threshold and significant_worse:
+        verdict = "regression"
+    elif change < -threshold and significant_better:
+        verdict = "improvement"
+    else:
+        verdict = "unchanged"
+
+    return {
+        "baseline_p50_ms": baseline["p50_ms"],
+        "current_p50_ms": current["p50_ms"],
+        "p50_change_pct": changes["p50"],
+        "baseline_p95_ms": baseline["p95_ms"],
+        "current_p95_ms": current["p95_ms"],
+        "p95_change_pct": changes["p95"],
+        "baseline_errors": baseline["errors"],
+        "current_errors": current["errors"],
+        "p_value": None if p_worse is None else round(p_worse, 5),
+        "verdict": verdict,
+    }
+
+
+def comparability_problems(baseline: dict, current: dict) -> list[str]:
+    """Differenze di dataset o carico che rendono il confronto non valido"""
+    problems = []
+    if baseline.get("failed_endpoints"):
+        problems.append(f"endpoint con errori nella baseline: {', '.join(baseline['failed_endpoints'])}")
+    for key in ("dataset", "clients", "requests_per_client", "erp"):
+        if baseline["meta"].get(key) != current["meta"].get(key):
+            problems.append(
+                f"{key}: baseline {baseline['meta'].get(key)} ≠ corrente {current['meta'].get(key)}"
+            )
+    return problems
+
+
+def compare(
+    baseline: dict,
+    current: dict,
+    metric: str = "p50",
+    threshold: float = 15.0,
+    alpha: float = 0.01,
+) -> dict[str, dict]:
+    """Confronto per endpoint (solo quelli presenti in entrambe le esecuzioni)"""
+    return {
+        name: compare_endpoint(baseline["endpoints"][name], result, metric, threshold, alpha)
+        for name, result in current["endpoints"].items()
+        if name in baseline["endpoints"]
+    }
+
+
+def print_report(report: dict[str, dict], baseline: dict, current: dict) -> None:
+    print(
+        f"Baseline {baseline['meta'].get('git_commit')} ({baseline['meta'].get('timestamp')}) → "
+        f"corrente {current['meta'].get('git_commit')} ({current['meta'].get('timestamp')})"
+    )
+    print(
+        f"{'endpoint':<30} {'p50 base':>9} {'p50 ora':>9} {'Δ%':>7} "
+        f"{'p95 base':>9} {'p95 ora':>9} {'Δ%':>7} {'p-value':>8}  esito"
+    )
+    for name, row in report.items():
+        p_value = "-" if row["p_value"] is None else f"{row['p_value']:.4f}"
+        print(
+            f"{name:<30} {row['baseline_p50_ms']:>9.1f} {row['current_p50_ms']:>9.1f} "
+            f"{row['p50_change_pct']:>+7.1f} {row['baseline_p95_ms']:>9.1f} {row['current_p95_ms']:>9.1f} "
+            f"{row['p95_change_pct']:>+7.1f} {p_value:>8}  {row['verdict']}"
+        )
+    missing = sorted(set(baseline["endpoints"]) - set(current["endpoints"]))
+    if missing:
+        print(f"Non misurati in questa esecuzione: {', '.join(missing)}")
+
+
+def _load(path: str) -> Optional[dict]:
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save(path: str, results: dict) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+
+def _evaluate(baseline: dict, current: dict, args: argparse.Namespace) -> int:
+    problems = comparability_problems(baseline, current)
+    if problems and not args.force:
+        print("✗ Esecuzioni non confrontabili (usare --force per confrontare comunque):")
+        for problem in problems:
+            print(f"  - {problem}")
+        return EXIT_NOT_COMPARABLE
+
+    report = compare(baseline, current, args.metric, args.threshold, args.alpha)
+    print_report(report, baseline, current)
+
+    failed = [name for name, row in report.items() if row["verdict"] in ("regression", "errors")]
+    if failed:
+        print(f"✗ Regressioni ({args.metric} oltre {args.threshold}%, p < {args.alpha}): {', '.join(failed)}")
+        return EXIT_REGRESSION
+    print("✓ Nessuna regressione")
+    return EXIT_OK
+
+
+def _add_thresholds(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--metric", choices=("p50", "p95"), default="p50", help="Metrica per la soglia")
+    parser.add_argument("--threshold", type=float, default=15.0, help="Peggioramento massimo ammesso (%%)")
+    parser.add_argument("--alpha", type=float, default=0.01, help="Livello di significatività del test")
+    parser.add_argument("--force", action="store_true", help="Confronta anche con dataset o carico diversi")
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Baseline e confronto dei benchmark ASI-GEST")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    baseline_cmd = commands.add_parser("baseline", help="Esegue i benchmark e salva la baseline")
+    runner.add_arguments(baseline_cmd)
+    baseline_cmd.add_argument("--baseline", default=DEFAULT_BASELINE, help="File della baseline")
+
+    check_cmd = commands.add_parser("check", help="Esegue i benchmark e li confronta con la baseline")
+    runner.add_arguments(check_cmd)
+    check_cmd.add_argument("--baseline", default=DEFAULT_BASELINE, help="File della baseline")
+    check_cmd.add_argument("--output", help="Salva anche i risultati correnti")
+    _add_thresholds(check_cmd)
+
+    diff_cmd = commands.add_parser("diff", help="Confronta due file di risultati già salvati")
+    diff_cmd.add_argument("baseline_file")
+    diff_cmd.add_argument("current_file")
+    _add_thresholds(diff_cmd)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "baseline":
+        results = runner.run(baseline_cmd, args)
+        if results["failed_endpoints"]:
+            # Le latenze di un endpoint in errore misurano il percorso d'errore
+            print(f"✗ Baseline non salvata, endpoint con errori: {', '.join(results['failed_endpoints'])}")
+            return EXIT_NOT_COMPARABLE
+        _save(args.baseline, results)
+        print(f"✓ Baseline salvata in {args.baseline}")
+        return EXIT_OK
+
+    if args.command == "check":
+        baseline = _load(args.baseline)
+        if baseline is None:
+            print(f"✗ Baseline non trovata: {args.baseline} (crearla con il comando baseline)")
+            return EXIT_NOT_COMPARABLE
+        current = runner.run(check_cmd, args)
+        if args.output:
+            _save(args.output, current)
+        return _evaluate(baseline, current, args)
+
+    baseline, current = _load(args.baseline_file), _load(args.current_file)
+    if baseline is None or current is None:
+        print("✗ File di risultati non trovato")
+        return EXIT_NOT_COMPARABLE
+    return _evaluate(baseline, current, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,369 @@
+"""
+ASI-GEST Benchmark: generatore di dati sintetici
+© 2025 Enrico Callegaro - Tutti i diritti riservati.
+
+Popola un database ASI_GEST locale (FaseTipo, Utenti, Macchine,
+ConfigCommessa, Fasi, Lotti, LogEventi) con volumi configurabili,
+per misurare le prestazioni su quantità realistiche.
+
+I dati sono deterministici (stesso seed → stesso database) e coerenti:
+- le fasi sono distribuite fra le commesse, i lotti fra le fasi
+- QtaProdotta/QtaResidua delle fasi corrispondono ai lotti, tranne una
+  piccola quota di fasi aperte lasciata disallineata per la riconciliazione
+- le fasi delle commesse più vecchie sono chiuse; l'ultimo lotto di
+  alcune fasi aperte è ancora aperto (DataFine NULL)
+- CommessaERPId parte da ERP_ID_BASE, per l'abbinamento con un ASITRON fittizio
+
+Uso:
+    python -m benchmarks.datagen --url sqlite:///./bench.db --scale small
+    python -m benchmarks.datagen --url sqlite:///./bench.db --scale full --drop
+    python -m benchmarks.datagen --url sqlite:///./bench.db --commesse 200 --fasi 5000 --lotti 100000
+"""
+
+import argparse
+import json
+import random
+import time
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta
+from typing import Optional
+
+ERP_ID_BASE = 24000
+
+FASI_TIPO = [
+    # Codice, Descrizione, Tipo, RichiedeSeriale, RichiedeControllo
+    ("SMD", "Montaggio SMD", "SMD", True, False),
+    ("SMD_BOT", "Montaggio SMD lato bottom", "SMD", True, False),
+    ("PTH", "Montaggio PTH Tradizionale", "PTH", True, False),
+    ("CTRL_AOI", "Controllo ottico AOI", "CONTROLLO", False, True),
+    ("CTRL_ICT", "Collaudo in-circuit", "CONTROLLO", False, True),
+    ("CTRL_FUNZ", "Collaudo funzionale", "CONTROLLO", False, True),
+    ("MAG", "Gestione Magazzino", "ALTRO", False, False),
+    ("TERZISTA", "Lavorazione Terzista", "ALTRO", False, False),
+]
+
+REPARTI = ["SMD", "PTH", "CONTROLLI"]
+RUOLI = ["OPERATORE"] * 8 + ["SUPERVISOR", "ADMIN"]
+TIPI_MACCHINA = {"SMD": "PICK_PLACE", "PTH": "WAVE", "CONTROLLI": "AOI"}
+NOMI = ["Mario", "Luigi", "Anna", "Paolo", "Giulia", "Marco", "Sara", "Luca", "Elena", "Franco"]
+COGNOMI = ["Rossi", "Verdi", "Bianchi", "Neri", "Russo", "Ferrari", "Esposito", "Romano", "Colombo", "Ricci"]
+TIPI_SCARTO = ["SALDATURA", "COMPONENTE", "POSIZIONAMENTO", "CORTOCIRCUITO"]
+EVENTI = [
+    # Tipo, Entita, Severity
+    ("LOTTO_APERTO", "Lotto", "INFO"),
+    ("LOTTO_CHIUSO", "Lotto", "INFO"),
+    ("FASE_CREATA", "Fase", "INFO"),
+    ("FASE_CHIUSA", "Fase", "INFO"),
+    ("CONFIG_MODIFICATA", "ConfigCommessa", "INFO"),
+    ("SCARTI_ELEVATI", "Lotto", "WARNING"),
+    ("ERRORE_SYNC_ERP", "ConfigCommessa", "ERROR"),
+]
+
+
+@dataclass(frozen=True)
+class Scale:
+    """Volumi da generare"""
+    commesse: int
+    fasi: int
+    lotti: int
+    utenti: int
+    macchine: int
+    log_eventi: int
+
+
+SCALES = {
+    "tiny": Scale(commesse=20, fasi=200, lotti=2_000, utenti=10, macchine=6, log_eventi=1_000),
+    "small": Scale(commesse=100, fasi=2_000, lotti=40_000, utenti=30, macchine=12, log_eventi=10_000),
+    "medium": Scale(commesse=500, fasi=20_000, lotti=300_000, utenti=80, macchine=30, log_eventi=100_000),
+    "full": Scale(commesse=1_000, fasi=50_000, lotti=1_000_000, utenti=150, macchine=60, log_eventi=500_000),
+}
+
+BATCH_SIZE = 10_000
+FASI_PER_CHUNK = 2_000
+# Quota di fasi aperte con QtaProdotta/QtaResidua non allineate ai lotti
+DISCREPANZE_RATE = 0.01
+
+
+def _insert(conn, model, rows: list[dict]) -> None:
+    from sqlalchemy import insert
+
+    for start in range(0, len(rows), BATCH_SIZE):
+        conn.execute(insert(model), rows[start:start + BATCH_SIZE])
+
+
+def _split(total: int, parts: int, rng: random.Random) -> list[int]:
+    """Distribuisce total in parts quote (somma esatta, ±50% attorno alla media)"""
+    if parts == 0:
+        return []
+    weights = [rng.uniform(0.5, 1.5) for _ in range(parts)]
+    scale = total / sum(weights)
+    counts = [int(w * scale) for w in weights]
+    for i in rng.sample(range(parts), total - sum(counts)):
+        counts[i] += 1
+    return counts
+
+
+def _anagrafiche(conn, scale: Scale, rng: random.Random, now: datetime) -> None:
+    from app.models import FaseTipo, Macchina, Utente
+
+    _insert(conn, FaseTipo, [
+        {
+            "FaseTipoID": i, "Codice": codice, "Descrizione": descrizione, "Tipo": tipo,
+            "RichiedeSeriale": seriale, "RichiedeControllo": controllo,
+            "OrdineVisualizzazione": i * 10, "Attivo": True, "DataCreazione": now,
+        }
+        for i, (codice, descrizione, tipo, seriale, controllo) in enumerate(FASI_TIPO, start=1)
+    ])
+    _insert(conn, Utente, [
+        {
+            "UtenteID": i,
+            "Username": f"operatore{i:04d}",
+            "NomeCompleto": f"{rng.choice(NOMI)} {rng.choice(COGNOMI)}",
+            "Email": f"operatore{i:04d}@asitron.it",
+            "Reparto": REPARTI[i % len(REPARTI)],
+            "Ruolo": rng.choice(RUOLI),
+            "Attivo": rng.random() > 0.05,
+            "DataCreazione": now - timedelta(days=rng.randint(30, 1500)),
+        }
+        for i in range(1, scale.utenti + 1)
+    ])
+    _insert(conn, Macchina, [
+        {
+            "MacchinaID": i,
+            "Codice": f"{REPARTI[i % len(REPARTI)]}-{i:03d}",
+            "Descrizione": f"{TIPI_MACCHINA[REPARTI[i % len(REPARTI)]]} {i}",
+            "Reparto": REPARTI[i % len(REPARTI)],
+            "Tipo": TIPI_MACCHINA[REPARTI[i % len(REPARTI)]],
+            "Attiva": rng.random() > 0.1,
+        }
+        for i in range(1, scale.macchine + 1)
+    ])
+
+
+def _commesse(conn, scale: Scale, rng: random.Random, start: datetime, days: int) -> list[datetime]:
+    """ConfigCommessa; ritorna la data di apertura di ogni commessa"""
+    from app.models import ConfigCommessa
+
+    aperture = sorted(start + timedelta(days=rng.uniform(0, days)) for _ in range(scale.commesse))
+    now = start + timedelta(days=days)
+    rows = []
+    for i, apertura in enumerate(aperture, start=1):
+        config_json = None
+        if rng.random() < 0.3:
+            config_json = json.dumps({"ProgrammaFeeder": f"FEED-{i:05d}", "FlagPTH": rng.random() < 0.5})
+        rows.append({
+            "ConfigCommessaID": i,
+            "CommessaERPId": ERP_ID_BASE + i,
+            "CodiceArticolo": f"45.{i // 1000:03d}.{i % 1000:03d}",
+            "Descrizione": f"Scheda elettronica {i}",
+            "FlagSMD": True,
+            "FlagPTH": rng.random() < 0.4,
+            "FlagControlli": True,
+            "FlagTerzista": rng.random() < 0.1,
+            "Revisione": f"R{rng.randint(1, 5)}",
+            "Attivo": rng.random() > 0.05,
+            "ConfigJSON": config_json,
+            "DataCreazione": apertura,
+            # Mai nel futuro: resterebbe in ogni delta (?modified_since=) e
+            # bloccherebbe la DataModifica massima dell'ETag della lista
+            "DataModifica": min(apertura + timedelta(days=rng.uniform(0, 30)), now),
+        })
+    _insert(conn, ConfigCommessa, rows)
+    return aperture
+
+
+def _fasi_e_lotti(conn, scale: Scale, rng: random.Random, aperture: list[datetime], now: datetime) -> None:
+    from app.models import Fase, Lotto
+
+    fasi_per_commessa = _split(scale.fasi, scale.commesse, rng)
+    lotti_per_fase = _split(scale.lotti, scale.fasi, rng)
+    # Le commesse aperte negli ultimi 60 giorni hanno fasi ancora in corso
+    soglia_aperte = now - timedelta(days=60)
+
+    fase_id = 0
+    lotto_id = 0
+    fasi_rows: list[dict] = []
+    lotti_rows: list[dict] = []
+
+    def flush():
+        _insert(conn, Fase, fasi_rows)
+        _insert(conn, Lotto, lotti_rows)
+        fasi_rows.clear()
+        lotti_rows.clear()
+
+    for commessa, (apertura, n_fasi) in enumerate(zip(aperture, fasi_per_commessa), start=1):
+        for n in range(n_fasi):
+            fase_id += 1
+            aperta = apertura >= soglia_aperte
+            quantita = rng.randint(10, 500) * 10
+            inizio = apertura + timedelta(hours=rng.uniform(0, 72) + n * 4)
+            n_lotti = lotti_per_fase[fase_id - 1]
+            prodotta = 0
+
+            for progressivo in range(1, n_lotti + 1):
+                lotto_id += 1
+                durata = timedelta(minutes=rng.randint(15, 240))
+                data_inizio = inizio + timedelta(hours=progressivo * 2)
+                in_corso = aperta and progressivo == n_lotti and rng.random() < 0.3
+                output = rng.randint(20, 400)
+                scarti = rng.randint(0, 8) if rng.random() < 0.4 else 0
+                if not in_corso:
+                    prodotta += output
+                data_fine = None if in_corso else data_inizio + durata
+                lotti_rows.append({
+                    "LottoID": lotto_id,
+                    "FaseID": fase_id,
+                    "Progressivo": progressivo,
+                    "DataInizio": data_inizio,
+                    "DataFine": data_fine,
+                    "DataCreazione": data_inizio,
+                    "DataModifica": data_fine or data_inizio,
+                    "QtaInput": output + scarti,
+                    "QtaOutput": 0 if in_corso else output,
+                    "QtaScarti": 0 if in_corso else scarti,
+                    "UtenteID": rng.randint(1, scale.utenti),
+                    "MacchinaID": rng.randint(1, scale.macchine) if scale.macchine else None,
+                    "ProgrammaFeeder": f"FEED-{commessa:05d}" if rng.random() < 0.5 else None,
+                    "TempoSetupMin": rng.randint(5, 60) if progressivo == 1 else None,
+                    "TipoScarto": rng.choice(TIPI_SCARTO) if scarti else None,
+                    "Versione": 2 if data_fine else 1,
+                })
+
+            qta_prodotta = prodotta
+            if aperta and rng.random() < DISCREPANZE_RATE:
+                qta_prodotta = max(prodotta - rng.randint(1, 100), 0)
+            fine = inizio + timedelta(hours=(n_lotti + 1) * 2)
+            fasi_rows.append({
+                "FaseID": fase_id,
+                "CommessaERPId": ERP_ID_BASE + commessa,
+                "ConfigCommessaID": commessa,
+                "FaseTipoID": n % len(FASI_TIPO) + 1,
+                "NumeroCommessa": f"{apertura.year}/{commessa:05d}",
+                "Stato": "APERTA" if aperta else "CHIUSA",
+                "DataCreazione": apertura,
+                "DataModifica": min(fine, now),
+                "DataApertura": inizio,
+                "DataChiusura": None if aperta else fine,
+                "Quantita": quantita,
+                "QtaPrevista": quantita,
+                "QtaProdotta": qta_prodotta,
+                "QtaResidua": max(quantita - qta_prodotta, 0),
+                "Versione": 1 + n_lotti,
+            })
+
+            if len(fasi_rows) >= FASI_PER_CHUNK:
+                flush()
+    flush()
+
+
+def _log_eventi(conn, scale: Scale, rng: random.Random, start: datetime, days: int) -> None:
+    from app.models import LogEvento
+
+    rows = []
+    for i in range(1, scale.log_eventi + 1):
+        tipo, entita, severity = rng.choice(EVENTI)
+        limite = {"Lotto": scale.lotti, "Fase": scale.fasi}.get(entita, scale.commesse)
+        rows.append({
+            "LogID": i,
+            "DataEvento": start + timedelta(days=days * i / scale.log_eventi),
+            "Tipo": tipo,
+            "Entita": entita,
+            "EntitaID": rng.randint(1, max(limite, 1)),
+            "Utente": f"operatore{rng.randint(1, max(scale.utenti, 1)):04d}",
+            "Dettagli": json.dumps({"origine": "datagen"}),
+            "Severity": severity,
+        })
+        if len(rows) >= BATCH_SIZE:
+            _insert(conn, LogEvento, rows)
+            rows.clear()
+    _insert(conn, LogEvento, rows)
+
+
+def generate(url: str, scale: Scale, seed: int = 42, drop: bool = False, days: int = 730) -> dict:
+    """
+    Crea le tabelle ASI_GEST su url e le popola.
+
+    Parametri:
+    - scale: volumi da generare
+    - seed: seed del generatore casuale (riproducibilità)
+    - drop: elimina e ricrea le tabelle esistenti
+    - days: ampiezza dello storico (commesse distribuite sugli ultimi N giorni)
+
+    Ritorna i conteggi generati e il tempo impiegato.
+    """
+    from sqlalchemy import create_engine, func, select
+
+    from app.core.database import Base
+    from app.models import Lotto
+
+    engine = create_engine(url)
+    if engine.dialect.name == "sqlite":
+        # WAL: letture e scritture concorrenti durante i benchmark
+        with engine.connect() as conn:
+            conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+
+    started = time.perf_counter()
+    try:
+        if drop:
+            Base.metadata.drop_all(engine)
+        Base.metadata.create_all(engine)
+
+        with engine.connect() as conn:
+            if conn.execute(select(func.count()).select_from(Lotto)).scalar():
+                raise RuntimeError("Il database contiene già dati: usare --drop per rigenerarli")
+
+        rng = random.Random(seed)
+        now = datetime.utcnow().replace(microsecond=0)
+        start = now - timedelta(days=days)
+
+        with engine.begin() as conn:
+            _anagrafiche(conn, scale, rng, now)
+            aperture = _commesse(conn, scale, rng, start, days)
+            _fasi_e_lotti(conn, scale, rng, aperture, now)
+            _log_eventi(conn, scale, rng, start, days)
+    finally:
+        engine.dispose()
+
+    return {
+        "fasi_tipo": len(FASI_TIPO),
+        "utenti": scale.utenti,
+        "macchine": scale.macchine,
+        "commesse": scale.commesse,
+        "fasi": scale.fasi,
+        "lotti": scale.lotti,
+        "log_eventi": scale.log_eventi,
+        "seed": seed,
+        "seconds": round(time.perf_counter() - started, 1),
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Genera dati sintetici ASI_GEST per i benchmark")
+    parser.add_argument("--url", default="sqlite:///./asi_gest_bench.db", help="URL SQLAlchemy del database")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small", help="Volumi predefiniti")
+    parser.add_argument("--commesse", type=int, help="Sostituisce il numero di commesse della scala")
+    parser.add_argument("--fasi", type=int)
+    parser.add_argument("--lotti", type=int)
+    parser.add_argument("--utenti", type=int)
+    parser.add_argument("--macchine", type=int)
+    parser.add_argument("--log-eventi", type=int)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--drop", action="store_true", help="Elimina e ricrea le tabelle")
+    args = parser.parse_args(argv)
+
+    overrides = {
+        key: getattr(args, key)
+        for key in ("commesse", "fasi", "lotti", "utenti", "macchine", "log_eventi")
+        if getattr(args, key) is not None
+    }
+    scale = replace(SCALES[args.scale], **overrides)
+    if scale.commesse < 1 or scale.fasi < scale.commesse or scale.utenti < 1:
+        parser.error("servono almeno 1 commessa, 1 utente e una fase per commessa")
+
+    print(f"Generazione dati su {args.url}: {scale}")
+    result = generate(args.url, scale, seed=args.seed, drop=args.drop)
+    print(f"✓ Dati generati in {result['seconds']} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,430 @@
+"""
+ASI-GEST Benchmark: runner degli endpoint
+© 2025 Enrico Callegaro - Tutti i diritti riservati.
+
+Misura ogni endpoint di lotti, fasi, config e anagrafiche sull'applicazione
+reale (app.main, in-process con httpx + ASGITransport) puntata su un
+database SQLite generato da benchmarks.datagen, e scrive throughput e
+latenze p50/p95/p99 (con i singoli campioni) in un file JSON.
+
+Un endpoint con richieste fallite non ha latenze valide (misurerebbero il
+percorso d'errore): viene segnalato, elencato in "failed_endpoints" e il
+runner termina con exit code 1.
+
+Prima le letture, poi le scritture. Le scritture distruttive (chiusura ed
+eliminazione lotti, eliminazione fasi, soft delete) lavorano su righe
+create apposta prima della misura; a fine esecuzione tutte le righe create
+vengono eliminate, così il dataset resta confrontabile fra un'esecuzione
+e l'altra.
+
+Uso:
+    python -m benchmarks.datagen --url sqlite:///./bench.db --scale small
+    python -m benchmarks.runner --db ./bench.db --output bench.json
+    python -m benchmarks.runner --db ./bench.db --only "lotti_*" --clients 50 --requests 20
+
+Con un ASITRON fittizio (benchmarks.asitron_data) vengono misurati anche
+gli endpoint del gestionale e le liste con include_erp, con latenza e
+guasti simulati (cache, circuit breaker, fallback su snapshot):
+    python -m benchmarks.runner --db ./bench.db --asitron-db ./asitron_bench.db \
+        --erp-latency-ms 20 --erp-jitter-ms 10 --erp-failure-rate 0.05
+"""
+
+import argparse
+import asyncio
+import fnmatch
+import json
+import os
+import platform
+import random
+import sys
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import count, cycle
+from typing import Callable, Optional
+
+from benchmarks.asitron_data import LOCALITA
+from benchmarks.common import Request, configure_env, git_commit, run_load
+from benchmarks.datagen import ERP_ID_BASE
+
+WARMUP = 5
+
+
+class Dataset:
+    """ID presenti nel database e righe di appoggio per le scritture"""
+
+    def __init__(self, engine, rng: random.Random):
+        from sqlalchemy import func, select
+
+        from app.models import ConfigCommessa, Fase, FaseTipo, Lotto, LogEvento, Macchina, Utente
+
+        self.engine = engine
+        self.rng = rng
+        with engine.connect() as conn:
+            def ids(column, *where):
+                return conn.execute(select(column).where(*where)).scalars().all()
+
+            self.lotti = ids(Lotto.LottoID)
+            self.fasi = ids(Fase.FaseID)
+            self.fasi_aperte = ids(Fase.FaseID, Fase.Stato == "APERTA") or self.fasi
+            self.config = ids(ConfigCommessa.ConfigCommessaID)
+            self.fasi_tipo = ids(FaseTipo.FaseTipoID)
+            self.utenti = ids(Utente.UtenteID)
+            self.macchine = ids(Macchina.MacchinaID)
+            self.counts = {
+                "lotti": len(self.lotti),
+                "fasi": len(self.fasi),
+                "config": len(self.config),
+                "utenti": len(self.utenti),
+                "macchine": len(self.macchine),
+                "log_eventi": conn.execute(select(func.count()).select_from(LogEvento)).scalar(),
+            }
+        if not (self.lotti and self.fasi and self.config and self.utenti and self.fasi_tipo):
+            raise RuntimeError("Database vuoto: generare i dati con python -m benchmarks.datagen")
+        # ID massimi di partenza: le righe create durante il benchmark vengono eliminate
+        self.max_ids = {
+            Lotto: max(self.lotti), Fase: max(self.fasi), ConfigCommessa: max(self.config),
+            Utente: max(self.utenti), Macchina: max(self.macchine, default=0),
+        }
+        self._unique = count(1)
+
+    def cleanup(self) -> None:
+        """Elimina le righe create da benchmark e righe di appoggio"""
+        from sqlalchemy import delete, inspect
+
+        with self.engine.begin() as conn:
+            for model, max_id in self.max_ids.items():
+                pk = inspect(model).primary_key[0]
+                conn.execute(delete(model).where(pk > max_id))
+
+    def pick(self, values: list[int]) -> int:
+        return self.rng.choice(values)
+
+    def unique(self) -> int:
+        return next(self._unique)
+
+    def _next_id(self, conn, column) -> int:
+        from sqlalchemy import func, select
+
+        return (conn.execute(select(func.max(column))).scalar() or 0) + 1
+
+    def create(self, kind: str, n: int) -> deque:
+        """Crea n righe di appoggio ("fasi", "lotti_aperti", "config", "utenti", "macchine")"""
+        from sqlalchemy import insert, select
+
+        from app.models import ConfigCommessa, Fase, Lotto, Macchina, Utente
+
+        now = datetime.utcnow()
+        fasi = self.create("fasi", max(n // 10, 1)) if kind == "lotti_aperti" else None
+        with self.engine.begin() as conn:
+            if kind == "fasi":
+                first = self._next_id(conn, Fase.FaseID)
+                config_id = self.config[0]
+                erp_id = conn.execute(
+                    select(ConfigCommessa.CommessaERPId).where(ConfigCommessa.ConfigCommessaID == config_id)
+                ).scalar()
+                conn.execute(insert(Fase), [
+                    {
+                        "FaseID": first + i, "CommessaERPId": erp_id, "ConfigCommessaID": config_id,
+                        "FaseTipoID": self.fasi_tipo[0], "NumeroCommessa": "BENCH",
+                        "Stato": "APERTA", "Quantita": 1000, "QtaPrevista": 1000,
+                    }
+                    for i in range(n)
+                ])
+            elif kind == "lotti_aperti":
+                first = self._next_id(conn, Lotto.LottoID)
+                conn.execute(insert(Lotto), [
+                    {
+                        "LottoID": first + i, "FaseID": fasi[i % len(fasi)], "Progressivo": i // len(fasi) + 1,
+                        "DataInizio": now, "QtaOutput": 0, "QtaScarti": 0, "UtenteID": self.utenti[0],
+                    }
+                    for i in range(n)
+                ])
+            elif kind == "config":
+                first = self._next_id(conn, ConfigCommessa.ConfigCommessaID)
+                conn.execute(insert(ConfigCommessa), [
+                    {
+                        "ConfigCommessaID": first + i, "CommessaERPId": -(first + i),
+                        "CodiceArticolo": "BENCH", "Descrizione": "Benchmark", "Attivo": True,
+                    }
+                    for i in range(n)
+                ])
+            elif kind == "utenti":
+                first = self._next_id(conn, Utente.UtenteID)
+                conn.execute(insert(Utente), [
+                    {"UtenteID": first + i, "Username": f"bench{first + i}", "NomeCompleto": "Benchmark"}
+                    for i in range(n)
+                ])
+            elif kind == "macchine":
+                first = self._next_id(conn, Macchina.MacchinaID)
+                conn.execute(insert(Macchina), [
+                    {"MacchinaID": first + i, "Codice": f"BENCH-{first + i}", "Reparto": "SMD"}
+                    for i in range(n)
+                ])
+            else:
+                raise ValueError(f"Tipo di righe di appoggio non valido: {kind}")
+        return deque(range(first, first + n))
+
+
+@dataclass
+class Endpoint:
+    """
+    Endpoint misurato.
+
+    prepare(dataset, n) ritorna la funzione che genera le richieste; n è il
+    numero di richieste previste (warm-up compreso), per creare le righe di
+    appoggio necessarie. max_requests limita le richieste degli endpoint
+    pesanti (riconciliazione). Gli endpoint erp interrogano ASITRON e sono
+    misurati solo con un database ASITRON fittizio (--asitron-db).
+    """
+    name: str
+    method: str
+    path: str
+    prepare: Callable[[Dataset, int], Callable[[], Request]]
+    max_requests: Optional[int] = None
+    erp: bool = False
+
+
+def _get(path: Callable[[Dataset], str]):
+    return lambda ds, n: lambda: path(ds)
+
+
+def _consume(kind: str, request: Callable[[int], Request]):
+    def prepare(ds: Dataset, n: int):
+        ids = ds.create(kind, n)
+        return lambda: request(ids.popleft())
+    return prepare
+
+
+def _create_lotto(ds: Dataset, n: int):
+    # Una fase dedicata per client: i progressivi non si contendono la stessa fase
+    fasi = cycle(ds.create("fasi", 50))
+    return lambda: ("POST", "/api/lotti/", {
+        "FaseID": next(fasi), "UtenteID": ds.pick(ds.utenti), "QtaInput": 100, "QtaOutput": 0,
+    })
+
+
+def _update_fase(ds: Dataset, n: int):
+    # Fasi diverse a rotazione: modifiche concorrenti alla stessa fase darebbero 409
+    fasi = cycle(ds.rng.sample(ds.fasi_aperte, len(ds.fasi_aperte)))
+    return lambda: ("PUT", f"/api/fasi/{next(fasi)}", {"Note": f"bench {ds.unique()}"})
+
+
+def _page(ds: Dataset, total: int, page_size: int = 50) -> int:
+    return ds.rng.randint(1, max(min(total // page_size, 20), 1))
+
+
+ENDPOINTS = [
+    # Letture
+    Endpoint("lotti_list", "GET", "/api/lotti/", _get(
+        lambda ds: f"/api/lotti/?page={_page(ds, len(ds.lotti))}")),
+    Endpoint("lotti_list_fase", "GET", "/api/lotti/?fase_id={id}", _get(
+        lambda ds: f"/api/lotti/?fase_id={ds.pick(ds.fasi)}")),
+    Endpoint("lotti_list_aperti", "GET", "/api/lotti/?aperto=true", _get(
+        lambda ds: "/api/lotti/?aperto=true")),
+    Endpoint("lotti_detail", "GET", "/api/lotti/{id}", _get(
+        lambda ds: f"/api/lotti/{ds.pick(ds.lotti)}")),
+    Endpoint("fasi_list", "GET", "/api/fasi/", _get(
+        lambda ds: f"/api/fasi/?page={_page(ds, len(ds.fasi))}")),
+    Endpoint("fasi_list_config", "GET", "/api/fasi/?config_commessa_id={id}", _get(
+        lambda ds: f"/api/fasi/?config_commessa_id={ds.pick(ds.config)}")),
+    Endpoint("fasi_detail", "GET", "/api/fasi/{id}", _get(
+        lambda ds: f"/api/fasi/{ds.pick(ds.fasi)}")),
+    Endpoint("fasi_riconciliazione", "GET", "/api/fasi/riconciliazione", _get(
+        lambda ds: "/api/fasi/riconciliazione"), max_requests=20),
+    Endpoint("fasi_riconciliazione_verifica", "POST", "/api/fasi/riconciliazione", _get(
+        lambda ds: ("POST", "/api/fasi/riconciliazione", None)), max_requests=20),
+    Endpoint("config_list", "GET", "/api/config/", _get(
+        lambda ds: f"/api/config/?page={_page(ds, len(ds.config))}")),
+    Endpoint("config_detail", "GET", "/api/config/{id}", _get(
+        lambda ds: f"/api/config/{ds.pick(ds.config)}")),
+    Endpoint("config_resolved", "GET", "/api/config/{id}/resolved", _get(
+        lambda ds: f"/api/config/{ds.pick(ds.config)}/resolved")),
+    Endpoint("utenti_list", "GET", "/api/utenti", _get(
+        lambda ds: f"/api/utenti?page={_page(ds, len(ds.utenti))}")),
+    Endpoint("utenti_detail", "GET", "/api/utenti/{id}", _get(
+        lambda ds: f"/api/utenti/{ds.pick(ds.utenti)}")),
+    Endpoint("macchine_list", "GET", "/api/macchine", _get(
+        lambda ds: f"/api/macchine?page={_page(ds, len(ds.macchine))}")),
+    Endpoint("macchine_detail", "GET", "/api/macchine/{id}", _get(
+        lambda ds: f"/api/macchine/{ds.pick(ds.macchine)}")),
+    # Letture con ASITRON
+    Endpoint("fasi_list_erp", "GET", "/api/fasi/?include_erp=true", _get(
+        lambda ds: f"/api/fasi/?include_erp=true&page={_page(ds, len(ds.fasi))}"), erp=True),
+    Endpoint("config_list_erp", "GET", "/api/config/?include_erp=true", _get(
+        lambda ds: f"/api/config/?include_erp=true&page={_page(ds, len(ds.config))}"), erp=True),
+    Endpoint("gestionale_commesse", "GET", "/api/gestionale/commesse", _get(
+        lambda ds: "/api/gestionale/commesse?limit=100"), erp=True),
+    Endpoint("gestionale_commessa", "GET", "/api/gestionale/commesse/{id}", _get(
+        lambda ds: f"/api/gestionale/commesse/{ERP_ID_BASE + ds.pick(ds.config)}"), erp=True),
+    Endpoint("gestionale_articoli", "GET", "/api/gestionale/articoli?search=...", _get(
+        lambda ds: f"/api/gestionale/articoli?search=45.{ds.rng.randint(0, 49):03d}&limit=100"), erp=True),
+    Endpoint("gestionale_clienti", "GET", "/api/gestionale/clienti?search=...", _get(
+        lambda ds: f"/api/gestionale/clienti?search={ds.rng.choice(LOCALITA)[0]}&limit=100"), erp=True),
+    # Scritture
+    Endpoint("lotti_create", "POST", "/api/lotti/", _create_lotto),
+    Endpoint("lotti_close", "PUT", "/api/lotti/{id}/close", _consume(
+        "lotti_aperti", lambda id: ("PUT", f"/api/lotti/{id}/close", {"QtaOutput": 100, "QtaScarti": 2}))),
+    Endpoint("lotti_delete", "DELETE", "/api/lotti/{id}", _consume(
+        "lotti_aperti", lambda id: ("DELETE", f"/api/lotti/{id}", None))),
+    Endpoint("fasi_create", "POST", "/api/fasi/", lambda ds, n: lambda: ("POST", "/api/fasi/", {
+        "ConfigCommessaID": ds.pick(ds.config), "FaseTipoID": ds.pick(ds.fasi_tipo),
+        "NumeroCommessa": "BENCH", "Quantita": 1000,
+    })),
+    Endpoint("fasi_update", "PUT", "/api/fasi/{id}", _update_fase),
+    Endpoint("fasi_delete", "DELETE", "/api/fasi/{id}", _consume(
+        "fasi", lambda id: ("DELETE", f"/api/fasi/{id}", None))),
+    # POST /api/config/ non è misurato: crea la configurazione con CommessaERPId=0
+    # (UNIQUE, da assegnare dopo), quindi dalla seconda richiesta fallisce
+    Endpoint("config_update", "PUT", "/api/config/{id}", lambda ds, n: lambda: (
+        "PUT", f"/api/config/{ds.pick(ds.config)}", {"Note": f"bench {ds.unique()}"})),
+    Endpoint("config_delete", "DELETE", "/api/config/{id}", _consume(
+        "config", lambda id: ("DELETE", f"/api/config/{id}", None))),
+    Endpoint("utenti_create", "POST", "/api/utenti", lambda ds, n: lambda: ("POST", "/api/utenti", {
+        "Username": f"bench.new{ds.unique()}", "NomeCompleto": "Benchmark", "Reparto": "SMD",
+    })),
+    Endpoint("utenti_update", "PUT", "/api/utenti/{id}", lambda ds, n: lambda: (
+        "PUT", f"/api/utenti/{ds.pick(ds.utenti)}", {"Email": f"bench{ds.unique()}@asitron.it"})),
+    Endpoint("utenti_delete", "DELETE", "/api/utenti/{id}", _consume(
+        "utenti", lambda id: ("DELETE", f"/api/utenti/{id}", None))),
+    Endpoint("macchine_create", "POST", "/api/macchine", lambda ds, n: lambda: ("POST", "/api/macchine", {
+        "Codice": f"BENCH-NEW-{ds.unique()}", "Reparto": "SMD", "Tipo": "PICK_PLACE",
+    })),
+    Endpoint("macchine_update", "PUT", "/api/macchine/{id}", lambda ds, n: lambda: (
+        "PUT", f"/api/macchine/{ds.pick(ds.macchine)}", {"Note": f"bench {ds.unique()}"})),
+    Endpoint("macchine_delete", "DELETE", "/api/macchine/{id}", _consume(
+        "macchine", lambda id: ("DELETE", f"/api/macchine/{id}", None))),
+]
+
+
+def select_endpoints(patterns: Optional[list[str]], erp: bool = False) -> list[Endpoint]:
+    """Endpoint il cui nome corrisponde ad almeno un pattern (tutti se None)"""
+    endpoints = [e for e in ENDPOINTS if erp or not e.erp]
+    if not patterns:
+        return endpoints
+    return [e for e in endpoints if any(fnmatch.fnmatch(e.name, p) for p in patterns)]
+
+
+async def benchmark(
+    endpoints: list[Endpoint],
+    clients: int,
+    requests_per_client: int,
+    seed: int = 42,
+    samples: bool = True,
+    erp: Optional[dict] = None,
+) -> dict:
+    from app.core.database import dispose_async_engines, get_engine_asi_gest
+    from app.main import app
+
+    engine = get_engine_asi_gest()
+    dataset = Dataset(engine, random.Random(seed))
+    results = {}
+    failed = []
+    try:
+        for endpoint in endpoints:
+            n_clients, per_client = clients, requests_per_client
+            if endpoint.max_requests:
+                n_clients = min(clients, endpoint.max_requests)
+                per_client = max(min(requests_per_client, endpoint.max_requests // n_clients), 1)
+            next_request = endpoint.prepare(dataset, n_clients * per_client + WARMUP)
+            summary = await run_load(
+                app, next_request, n_clients, per_client, warmup=WARMUP, samples=samples,
+            )
+            results[endpoint.name] = {"method": endpoint.method, "path": endpoint.path, **summary}
+            if summary["errors"]:
+                failed.append(endpoint.name)
+                print(
+                    f"{endpoint.name:<30} ⚠️  FALLITO: {summary['errors']}/{summary['requests']} "
+                    f"richieste in errore, latenze non valide"
+                )
+                continue
+            print(
+                f"{endpoint.name:<30} {summary['throughput_rps']:>8.1f} req/s  "
+                f"p50 {summary['p50_ms']:>8.1f} ms  p95 {summary['p95_ms']:>8.1f} ms  "
+                f"p99 {summary['p99_ms']:>8.1f} ms  errors {summary['errors']}"
+            )
+    finally:
+        await dispose_async_engines()
+        dataset.cleanup()
+        engine.dispose()
+
+    return {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "clients": clients,
+            "requests_per_client": requests_per_client,
+            "seed": seed,
+            "dataset": dataset.counts,
+            "erp": erp,
+        },
+        "endpoints": results,
+        "failed_endpoints": failed,
+    }
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Opzioni di esecuzione del benchmark (condivise con benchmarks.compare)"""
+    parser.add_argument("--db", required=True, help="File SQLite generato da benchmarks.datagen")
+    parser.add_argument("--clients", type=int, default=10, help="Client concorrenti")
+    parser.add_argument("--requests", type=int, default=20, help="Richieste per client e per endpoint")
+    parser.add_argument("--only", nargs="*", help="Pattern dei nomi endpoint (es. 'lotti_*')")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--asitron-db", help="ASITRON fittizio (benchmarks.asitron_data): misura anche gli endpoint ERP",
+    )
+    parser.add_argument("--erp-latency-ms", type=float, default=0.0, help="Latenza simulata per statement ASITRON")
+    parser.add_argument("--erp-jitter-ms", type=float, default=0.0, help="Jitter simulato (±) per statement ASITRON")
+    parser.add_argument("--erp-failure-rate", type=float, default=0.0, help="Quota di statement ASITRON che falliscono")
+
+
+def run(parser: argparse.ArgumentParser, args: argparse.Namespace, samples: bool = True) -> dict:
+    """Esegue il benchmark con le opzioni di add_arguments e ritorna i risultati"""
+    endpoints = select_endpoints(args.only, erp=bool(args.asitron_db))
+    if not endpoints:
+        parser.error("nessun endpoint corrisponde a --only")
+    for path in filter(None, (args.db, args.asitron_db)):
+        if not os.path.exists(path):
+            parser.error(f"database non trovato: {path}")
+
+    erp = None
+    if args.asitron_db:
+        erp = {
+            "latency_ms": args.erp_latency_ms,
+            "jitter_ms": args.erp_jitter_ms,
+            "failure_rate": args.erp_failure_rate,
+        }
+        os.environ.update({
+            "FAKE_ASITRON_LATENCY_MS": str(args.erp_latency_ms),
+            "FAKE_ASITRON_JITTER_MS": str(args.erp_jitter_ms),
+            "FAKE_ASITRON_FAILURE_RATE": str(args.erp_failure_rate),
+        })
+
+    # Senza --asitron-db ASITRON resta non configurato: le liste senza
+    # include_erp non aprono la sessione ASITRON
+    configure_env(os.path.abspath(args.db), os.path.abspath(args.asitron_db) if args.asitron_db else None)
+    return asyncio.run(benchmark(
+        endpoints, args.clients, args.requests, seed=args.seed, samples=samples, erp=erp,
+    ))
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark degli endpoint ASI-GEST su SQLite locale")
+    add_arguments(parser)
+    parser.add_argument("--no-samples", action="store_true", help="Non salvare le singole latenze")
+    parser.add_argument("--output", default="bench_results.json", help="File JSON con i risultati")
+    args = parser.parse_args(argv)
+
+    results = run(parser, args, samples=not args.no_samples)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"✓ Risultati salvati in {args.output}")
+    if results["failed_endpoints"]:
+        print(f"✗ Endpoint con errori: {', '.join(results['failed_endpoints'])}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
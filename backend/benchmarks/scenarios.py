@@ -0,0 +1,465 @@
+"""
+ASI-GEST Benchmark: carico a scenari (flussi di reparto)
+© 2025 Enrico Callegaro - Tutti i diritti riservati.
+
+Riproduce il carico reale del reparto invece del singolo endpoint:
+utenti virtuali concorrenti, ognuno assegnato a uno scenario in base ai
+pesi di --mix, che ripetono un flusso di lavoro con tempi di attesa fra
+un passo e l'altro.
+
+Scenari:
+- operatore: terminale di linea su una fase dedicata;
+  apre un lotto → lavora → chiude il lotto → consulta la fase
+- dashboard: pannello di reparto che ogni 30 s legge lotti aperti e
+  fasi aperte, con If-None-Match come un browser (304 se invariate)
+- supervisore: scorre la lista lotti, apre un lotto, la sua fase e la
+  configurazione della commessa
+
+I tempi di attesa sono quelli reali moltiplicati per --time-scale (0.02:
+il polling di 30 s diventa 0.6 s), così una prova di un minuto comprime
+molte ore di reparto mantenendo il rapporto fra gli scenari.
+
+Per ogni scenario e per ogni passo: latenze p50/p95/p99, quota di errori,
+statement SQL per richiesta (header X-SQL-Count) e byte ricevuti. In-process il
+tracking SQL viene abilitato automaticamente; contro un server reale i
+conteggi ci sono solo se il server ha SQL_TRACKING_ENABLED=True.
+
+Uso (in-process, database da benchmarks.datagen):
+    python -m benchmarks.scenarios --db ./bench.db --duration 60
+    python -m benchmarks.scenarios --db ./bench.db --users 60 --mix operatore=30 dashboard=10 supervisore=5
+
+Contro un server avviato (uvicorn) su un database di prova:
+    python -m benchmarks.scenarios --base-url http://localhost:8000 --duration 60
+
+In-process le fasi degli operatori e i lotti creati vengono eliminati a
+fine prova; contro un server restano nel database (lotti chiusi).
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import tempfile
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Awaitable, Callable, Optional
+
+from benchmarks.common import configure_env, git_commit, percentile
+
+PAGE_SIZE = 50
+
+
+class VirtualUser:
+    """
+    Utente virtuale: esegue le richieste di un flusso e ne registra l'esito.
+
+    Ogni richiesta è registrata con scenario, passo, latenza, status e
+    statement SQL; le attese (think time) non rientrano nelle latenze.
+    """
+
+    def __init__(self, client, stats: "ScenarioStats", rng: random.Random, time_scale: float, deadline: float):
+        self.client = client
+        self.stats = stats
+        self.rng = rng
+        self.time_scale = time_scale
+        self.deadline = deadline
+        self.fase_id: Optional[int] = None
+        self.etags: dict[str, str] = {}
+        self.utente_id: Optional[int] = None
+        self.workflow_ms = 0.0
+        self.workflow_sql = 0
+        self.workflow_failed = False
+
+    @property
+    def expired(self) -> bool:
+        return time.perf_counter() >= self.deadline
+
+    async def call(
+        self, step: str, method: str, path: str, body: Optional[dict] = None, conditional: bool = False,
+    ):
+        """
+        Esegue una richiesta del passo step; None se fallisce.
+
+        Con conditional=True rimanda l'ultimo ETag ricevuto per path
+        (If-None-Match), come la cache HTTP di un browser.
+        """
+        headers = {"If-None-Match": self.etags[path]} if conditional and path in self.etags else None
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, path, json=body, headers=headers)
+        except Exception:
+            # Connessione rifiutata o timeout (solo contro un server reale)
+            self.stats.record(step, time.perf_counter() - start, 0, None, 0)
+            self.workflow_failed = True
+            return None
+        latency = time.perf_counter() - start
+        sql = response.headers.get("x-sql-count")
+        sql = int(sql) if sql is not None else None
+        self.stats.record(step, latency, response.status_code, sql, response.num_bytes_downloaded)
+        if conditional and "etag" in response.headers:
+            self.etags[path] = response.headers["etag"]
+        self.workflow_ms += latency * 1000
+        self.workflow_sql += sql or 0
+        if response.status_code >= 400:
+            self.workflow_failed = True
+            return None
+        return response
+
+    async def think(self, seconds: float) -> None:
+        """Attesa reale scalata, con ±50% di variazione (utenti non in fase)"""
+        delay = seconds * self.time_scale * self.rng.uniform(0.5, 1.5)
+        await asyncio.sleep(max(min(delay, self.deadline - time.perf_counter()), 0))
+
+
+async def operatore(user: VirtualUser) -> None:
+    response = await user.call("apri_lotto", "POST", "/api/lotti/", {
+        "FaseID": user.fase_id, "UtenteID": user.utente_id, "QtaInput": 100, "QtaOutput": 0,
+    })
+    if response is None:
+        return
+    lotto_id = response.json()["LottoID"]
+    await user.think(20)  # lavorazione del lotto
+    await user.call("chiudi_lotto", "PUT", f"/api/lotti/{lotto_id}/close", {
+        "QtaOutput": user.rng.randint(90, 100), "QtaScarti": user.rng.randint(0, 3),
+    })
+    await user.call("vedi_fase", "GET", f"/api/fasi/{user.fase_id}")
+    await user.think(5)
+
+
+async def dashboard(user: VirtualUser) -> None:
+    await user.call("lotti_aperti", "GET", "/api/lotti/?aperto=true", conditional=True)
+    await user.call("fasi_aperte", "GET", "/api/fasi/?completata=false", conditional=True)
+    await user.think(30)  # polling
+
+
+async def supervisore(user: VirtualUser) -> None:
+    pages = max(min(user.stats.lotti_total // PAGE_SIZE, 20), 1)
+    response = await user.call("lista_lotti", "GET", f"/api/lotti/?page={user.rng.randint(1, pages)}")
+    if response is None or not response.json()["items"]:
+        return
+    lotto = user.rng.choice(response.json()["items"])
+    await user.think(3)
+    await user.call("dettaglio_lotto", "GET", f"/api/lotti/{lotto['LottoID']}")
+    await user.think(3)
+    response = await user.call("dettaglio_fase", "GET", f"/api/fasi/{lotto['FaseID']}")
+    if response is None:
+        return
+    await user.think(3)
+    await user.call("config_commessa", "GET", f"/api/config/{response.json()['ConfigCommessaID']}/resolved")
+    await user.think(5)
+
+
+@dataclass
+class Scenario:
+    """Flusso di lavoro ripetuto dagli utenti virtuali assegnati"""
+    name: str
+    workflow: Callable[[VirtualUser], Awaitable[None]]
+    description: str
+
+
+SCENARIOS = {
+    s.name: s for s in (
+        Scenario("operatore", operatore, "apre lotto → chiude lotto → consulta fase"),
+        Scenario("dashboard", dashboard, "lotti e fasi aperte ogni 30 s"),
+        Scenario("supervisore", supervisore, "lista lotti → lotto → fase → configurazione"),
+    )
+}
+
+DEFAULT_MIX = {"operatore": 30, "dashboard": 5, "supervisore": 5}
+
+
+class ScenarioStats:
+    """Latenze, status e statement SQL per passo di uno scenario"""
+
+    def __init__(self, lotti_total: int = 0):
+        self.lotti_total = lotti_total
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.status_codes: dict[str, Counter] = defaultdict(Counter)
+        self.sql: dict[str, list[int]] = defaultdict(list)
+        self.bytes: Counter = Counter()
+        self.workflows_ms: list[float] = []
+        self.workflows_sql: list[int] = []
+        self.workflows_failed = 0
+
+    def record(self, step: str, latency: float, status: int, sql: Optional[int], received: int) -> None:
+        self.latencies[step].append(latency)
+        self.status_codes[step][status] += 1
+        if sql is not None:
+            self.sql[step].append(sql)
+        self.bytes[step] += received
+
+    def summary(self, users: int) -> dict:
+        requests = sum(len(v) for v in self.latencies.values())
+        errors = sum(n for c in self.status_codes.values() for code, n in c.items() if not 0 < code < 400)
+        workflows = sorted(self.workflows_ms)
+        steps = {}
+        for step, latencies in self.latencies.items():
+            ordered = sorted(latencies)
+            codes = self.status_codes[step]
+            sql = self.sql.get(step)
+            steps[step] = {
+                "requests": len(ordered),
+                "errors": sum(n for code, n in codes.items() if not 0 < code < 400),
+                "status_codes": {str(code): n for code, n in sorted(codes.items())},
+                "p50_ms": round(percentile(ordered, 50) * 1000, 2),
+                "p95_ms": round(percentile(ordered, 95) * 1000, 2),
+                "p99_ms": round(percentile(ordered, 99) * 1000, 2),
+                "total_ms": round(sum(ordered) * 1000, 1),
+                "sql_avg": round(sum(sql) / len(sql), 2) if sql else None,
+                "sql_max": max(sql) if sql else None,
+                "bytes_avg": round(self.bytes[step] / len(ordered)),
+            }
+        return {
+            "users": users,
+            "workflows": len(workflows),
+            "workflows_failed": self.workflows_failed,
+            "requests": requests,
+            "errors": errors,
+            "error_rate": round(errors / requests, 4) if requests else 0.0,
+            "workflow_p50_ms": round(percentile(workflows, 50), 2),
+            "workflow_p95_ms": round(percentile(workflows, 95), 2),
+            "workflow_sql_avg": (
+                round(sum(self.workflows_sql) / len(self.workflows_sql), 2)
+                if self.workflows_sql and any(self.sql.values()) else None
+            ),
+            "steps": steps,
+        }
+
+
+def assign_users(mix: dict[str, float], users: int) -> list[str]:
+    """Distribuisce gli utenti fra gli scenari in proporzione ai pesi (almeno uno ciascuno)"""
+    total = sum(mix.values())
+    counts = {name: max(int(users * weight / total), 1) for name, weight in mix.items()}
+    # Il resto dell'arrotondamento va agli scenari più pesanti
+    for name in sorted(mix, key=mix.get, reverse=True):
+        if sum(counts.values()) >= users:
+            break
+        counts[name] += 1
+    return [name for name, n in counts.items() for _ in range(n)]
+
+
+async def _discover(client, path: str, key: str, n: int) -> list[int]:
+    """ID dalle liste dell'API (fino a n, a pagine da 100)"""
+    ids: list[int] = []
+    page = 1
+    while len(ids) < n:
+        response = await client.get(f"{path}page={page}&page_size=100")
+        response.raise_for_status()
+        items = response.json()["items"]
+        ids.extend(item[key] for item in items)
+        if len(items) < 100:
+            break
+        page += 1
+    return ids[:n]
+
+
+async def run_scenarios(
+    client,
+    assignment: list[str],
+    duration: float,
+    time_scale: float,
+    fasi: list[int],
+    seed: int = 42,
+) -> tuple[dict[str, dict], float]:
+    """
+    Esegue gli utenti virtuali per duration secondi.
+
+    Parametri:
+    - assignment: scenario di ciascun utente virtuale
+    - fasi: fasi aperte da assegnare agli operatori (una per operatore)
+
+    Ritorna le statistiche per scenario e il tempo trascorso.
+    """
+    utenti = await _discover(client, "/api/utenti?attivo=true&", "UtenteID", 100)
+    lotti_total = (await client.get("/api/lotti/?page_size=1")).json()["total"]
+    if not utenti:
+        raise RuntimeError("Nessun utente attivo nel database")
+
+    stats = {name: ScenarioStats(lotti_total) for name in set(assignment)}
+    started = time.perf_counter()
+    deadline = started + duration
+    operatori = 0
+
+    async def loop(user: VirtualUser, scenario: Scenario) -> None:
+        while not user.expired:
+            user.workflow_ms, user.workflow_sql, user.workflow_failed = 0.0, 0, False
+            await scenario.workflow(user)
+            user.stats.workflows_ms.append(user.workflow_ms)
+            user.stats.workflows_sql.append(user.workflow_sql)
+            if user.workflow_failed:
+                user.stats.workflows_failed += 1
+
+    tasks = []
+    for i, name in enumerate(assignment):
+        user = VirtualUser(client, stats[name], random.Random(seed + i), time_scale, deadline)
+        user.utente_id = utenti[i % len(utenti)]
+        if name == "operatore":
+            user.fase_id = fasi[operatori % len(fasi)]
+            operatori += 1
+        # Partenze sfalsate: i terminali non si accendono tutti nello stesso istante
+        await asyncio.sleep(user.rng.uniform(0, 0.01))
+        tasks.append(asyncio.create_task(loop(user, SCENARIOS[name])))
+    await asyncio.gather(*tasks)
+    return stats, time.perf_counter() - started
+
+
+async def run_in_process(db: str, assignment: list[str], duration: float, time_scale: float, seed: int):
+    """Carico sull'app ASGI in-process (httpx + ASGITransport), database SQLite locale"""
+    import httpx
+
+    from app.core.database import dispose_async_engines, get_engine_asi_gest
+    from app.main import app
+    from benchmarks.runner import Dataset
+
+    engine = get_engine_asi_gest()
+    dataset = Dataset(engine, random.Random(seed))
+    # Una fase dedicata per operatore: i progressivi lotto non si contendono la stessa fase
+    fasi = list(dataset.create("fasi", max(assignment.count("operatore"), 1)))
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            return await run_scenarios(client, assignment, duration, time_scale, fasi, seed), dataset.counts
+    finally:
+        await dispose_async_engines()
+        dataset.cleanup()
+        engine.dispose()
+
+
+async def run_remote(base_url: str, assignment: list[str], duration: float, time_scale: float, seed: int):
+    """Carico su un server avviato (socket reale); fasi aperte scoperte dall'API"""
+    import httpx
+
+    limits = httpx.Limits(max_connections=len(assignment), max_keepalive_connections=len(assignment))
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        fasi = await _discover(client, "/api/fasi/?completata=false&", "FaseID", assignment.count("operatore"))
+        if not fasi:
+            raise RuntimeError("Nessuna fase aperta sul server")
+        return await run_scenarios(client, assignment, duration, time_scale, fasi, seed), None
+
+
+def build_report(stats: dict[str, ScenarioStats], assignment: list[str], elapsed: float) -> dict:
+    """Riepilogo per scenario e mix di latenza (quota di richieste e di tempo per passo)"""
+    scenarios = {name: stats[name].summary(assignment.count(name)) for name in stats}
+    total_requests = sum(s["requests"] for s in scenarios.values())
+    total_errors = sum(s["errors"] for s in scenarios.values())
+    total_ms = sum(step["total_ms"] for s in scenarios.values() for step in s["steps"].values())
+    mix = {
+        f"{name}.{step}": {
+            "requests_pct": round(result["requests"] / total_requests * 100, 1) if total_requests else 0.0,
+            "time_pct": round(result["total_ms"] / total_ms * 100, 1) if total_ms else 0.0,
+        }
+        for name, s in scenarios.items()
+        for step, result in s["steps"].items()
+    }
+    return {
+        "elapsed_s": round(elapsed, 1),
+        "requests": total_requests,
+        "errors": total_errors,
+        "error_rate": round(total_errors / total_requests, 4) if total_requests else 0.0,
+        "throughput_rps": round(total_requests / elapsed, 1) if elapsed else 0.0,
+        "scenarios": scenarios,
+        "latency_mix": mix,
+    }
+
+
+def print_report(report: dict) -> None:
+    print(
+        f"\n{report['requests']} richieste in {report['elapsed_s']} s "
+        f"({report['throughput_rps']} req/s), errori {report['error_rate'] * 100:.2f}%"
+    )
+    for name, s in report["scenarios"].items():
+        sql = "-" if s["workflow_sql_avg"] is None else f"{s['workflow_sql_avg']:.1f}"
+        print(
+            f"\n{name}: {s['users']} utenti, {s['workflows']} flussi ({s['workflows_failed']} falliti), "
+            f"flusso p50 {s['workflow_p50_ms']:.1f} ms p95 {s['workflow_p95_ms']:.1f} ms, SQL/flusso {sql}"
+        )
+        print(f"  {'passo':<18} {'req':>6} {'err':>5} {'p50':>8} {'p95':>8} {'p99':>8} {'SQL':>5} {'byte':>7} {'%req':>6} {'%tempo':>7}")
+        for step, r in s["steps"].items():
+            mix = report["latency_mix"][f"{name}.{step}"]
+            sql = "-" if r["sql_avg"] is None else f"{r['sql_avg']:.1f}"
+            print(
+                f"  {step:<18} {r['requests']:>6} {r['errors']:>5} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} "
+                f"{r['p99_ms']:>8.1f} {sql:>5} {r['bytes_avg']:>7} {mix['requests_pct']:>6.1f} {mix['time_pct']:>7.1f}"
+            )
+
+
+def parse_mix(values: list[str]) -> dict[str, float]:
+    mix = {}
+    for value in values:
+        name, _, weight = value.partition("=")
+        if name not in SCENARIOS:
+            raise ValueError(f"Scenario sconosciuto: {name} (disponibili: {', '.join(SCENARIOS)})")
+        mix[name] = float(weight or 1)
+        if mix[name] <= 0:
+            raise ValueError(f"Peso non valido per {name}: {weight}")
+    return mix
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Carico a scenari sui flussi di reparto ASI-GEST")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--db", help="File SQLite generato da benchmarks.datagen (app in-process)")
+    target.add_argument("--base-url", help="URL di un server avviato (es. http://localhost:8000)")
+    parser.add_argument("--users", type=int, default=40, help="Utenti virtuali concorrenti")
+    parser.add_argument(
+        "--mix", nargs="*", default=[f"{k}={v}" for k, v in DEFAULT_MIX.items()],
+        help="Pesi degli scenari (scenario=peso)",
+    )
+    parser.add_argument("--duration", type=float, default=30.0, help="Durata della prova (s)")
+    parser.add_argument("--time-scale", type=float, default=0.02, help="Fattore sui tempi di attesa reali")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="bench_scenarios.json", help="File JSON con i risultati")
+    args = parser.parse_args(argv)
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.users < len(mix):
+        parser.error("servono almeno tanti utenti quanti scenari")
+    assignment = assign_users(mix, args.users)
+
+    print(f"Scenari: {', '.join(f'{n} × {assignment.count(n)}' for n in mix)} per {args.duration:.0f} s")
+    if args.db:
+        if not os.path.exists(args.db):
+            parser.error(f"database non trovato: {args.db}")
+        with tempfile.TemporaryDirectory() as tmp:
+            configure_env(os.path.abspath(args.db), os.path.join(tmp, "asitron.db"))
+            # Il conteggio degli statement per richiesta serve al report
+            os.environ["SQL_TRACKING_ENABLED"] = "True"
+            # Sotto carico SQLite serializza le scritture: i warning di query lenta coprirebbero il report
+            logging.getLogger("asigest.sql").setLevel(logging.ERROR)
+            (stats, elapsed), dataset = asyncio.run(
+                run_in_process(args.db, assignment, args.duration, args.time_scale, args.seed)
+            )
+    else:
+        (stats, elapsed), dataset = asyncio.run(
+            run_remote(args.base_url, assignment, args.duration, args.time_scale, args.seed)
+        )
+
+    report = build_report(stats, assignment, elapsed)
+    print_report(report)
+    report["meta"] = {
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "target": args.base_url or "in-process",
+        "users": args.users,
+        "mix": mix,
+        "duration_s": args.duration,
+        "time_scale": args.time_scale,
+        "seed": args.seed,
+        "dataset": dataset,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✓ Risultati salvati in {args.output}")
+
+
+if __name__ == "__main__":
+    main()
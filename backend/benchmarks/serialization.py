@@ -0,0 +1,161 @@
+"""
+ASI-GEST Benchmark: serializzazione delle liste
+© 2025 Enrico Callegaro - Tutti i diritti riservati.
+
+Confronta, su pagine da 100 righe lette da un database di benchmarks.datagen,
+il costo di trasformare il modello di lista (LottoList, FaseList, ...) nel
+corpo della risposta:
+
+- fastapi_json: percorso standard di FastAPI (validazione response_model,
+  dict "json", JSONResponse con json.dumps)
+- fastapi_orjson: come sopra, con ORJSONResponse (response class di default)
+- model_response: model_dump + orjson, senza rivalidazione (app/core/responses.py)
+
+La costruzione dei modelli dalle righe ORM (model_validate) è comune ai tre
+percorsi ed è esclusa dalla misura. Per l'effetto sulle latenze end-to-end
+usare benchmarks.runner / benchmarks.compare.
+
+Uso:
+    python -m benchmarks.serialization --db ./bench.db
+    python -m benchmarks.serialization --db ./bench.db --rounds 2000 --output bench_serialization.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import tempfile
+import time
+from datetime import datetime
+from typing import Optional
+
+from benchmarks.common import configure_env, git_commit, percentile
+
+PAGE_SIZE = 100
+
+
+def _lists(engine) -> dict:
+    """Una pagina da PAGE_SIZE righe per ogni lista, già validata"""
+    from sqlalchemy import select
+    from sqlalchemy.orm import Session
+
+    from app.models import ConfigCommessa, Fase, Lotto, Macchina, Utente
+    from app.schemas import (
+        ConfigCommessaList,
+        ConfigCommessaResponse,
+        FaseList,
+        FaseResponse,
+        LottoList,
+        LottoResponse,
+    )
+    from app.schemas.anagrafiche import MacchinaList, MacchinaResponse, UtenteList, UtenteResponse
+
+    sources = {
+        "lotti": (Lotto, LottoResponse, LottoList),
+        "fasi": (Fase, FaseResponse, FaseList),
+        "config": (ConfigCommessa, ConfigCommessaResponse, ConfigCommessaList),
+        "utenti": (Utente, UtenteResponse, UtenteList),
+        "macchine": (Macchina, MacchinaResponse, MacchinaList),
+    }
+    lists = {}
+    with Session(engine) as db:
+        for name, (model, item_schema, list_schema) in sources.items():
+            rows = db.execute(select(model).limit(PAGE_SIZE)).scalars().all()
+            items = [item_schema.model_validate(row) for row in rows]
+            lists[name] = (list_schema, list_schema(items=items, total=len(items), page=1, page_size=PAGE_SIZE))
+    return lists
+
+
+def _paths(list_schema):
+    """Funzioni (modello → bytes) dei tre percorsi di serializzazione"""
+    from fastapi.responses import JSONResponse, ORJSONResponse
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_response_field
+
+    from app.core.responses import model_response
+
+    field = create_response_field(name="response", type_=list_schema)
+
+    async def fastapi_json(model):
+        return JSONResponse(await serialize_response(field=field, response_content=model)).body
+
+    async def fastapi_orjson(model):
+        return ORJSONResponse(await serialize_response(field=field, response_content=model)).body
+
+    async def direct(model):
+        return model_response(model).body
+
+    return {"fastapi_json": fastapi_json, "fastapi_orjson": fastapi_orjson, "model_response": direct}
+
+
+async def measure(lists: dict, rounds: int) -> dict:
+    results = {}
+    for name, (list_schema, model) in lists.items():
+        paths = _paths(list_schema)
+        bodies = {path: await fn(model) for path, fn in paths.items()}
+        if len({json.dumps(json.loads(body), sort_keys=True) for body in bodies.values()}) != 1:
+            raise RuntimeError(f"{name}: i percorsi producono JSON diversi")
+
+        results[name] = {"rows": len(model.items), "bytes": len(bodies["model_response"])}
+        for path, fn in paths.items():
+            for _ in range(min(rounds // 10, 50)):
+                await fn(model)
+            timings = []
+            for _ in range(rounds):
+                start = time.perf_counter()
+                await fn(model)
+                timings.append(time.perf_counter() - start)
+            timings.sort()
+            results[name][path] = {
+                "p50_us": round(percentile(timings, 50) * 1e6, 1),
+                "p95_us": round(percentile(timings, 95) * 1e6, 1),
+            }
+        base = results[name]["fastapi_json"]["p50_us"]
+        for path in paths:
+            results[name][path]["speedup"] = round(base / results[name][path]["p50_us"], 2)
+        print(
+            f"{name:<10} {results[name]['rows']:>4} righe {results[name]['bytes']:>7} B   "
+            + "   ".join(f"{path} {results[name][path]['p50_us']:>8.1f} µs" for path in paths)
+            + f"   ×{results[name]['model_response']['speedup']}"
+        )
+    return results
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Costo di serializzazione delle liste ASI-GEST (100 righe)")
+    parser.add_argument("--db", required=True, help="File SQLite generato da benchmarks.datagen")
+    parser.add_argument("--rounds", type=int, default=500, help="Serializzazioni misurate per percorso")
+    parser.add_argument("--output", help="File JSON con i risultati")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        parser.error(f"database non trovato: {args.db}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        configure_env(os.path.abspath(args.db), os.path.join(tmp, "asitron.db"))
+        from app.core.database import get_engine_asi_gest
+
+        engine = get_engine_asi_gest()
+        try:
+            lists = _lists(engine)
+        finally:
+            engine.dispose()
+        results = asyncio.run(measure(lists, args.rounds))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "meta": {
+                    "timestamp": datetime.utcnow().isoformat() + "Z",
+                    "git_commit": git_commit(),
+                    "python": platform.python_version(),
+                    "rounds": args.rounds,
+                },
+                "lists": results,
+            }, f, indent=2)
+        print(f"✓ Risultati salvati in {args.output}")
+
+
+if __name__ == "__main__":
+    main()
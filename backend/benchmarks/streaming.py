@@ -0,0 +1,141 @@
+"""
+ASI-GEST Benchmark: memoria delle liste materializzate e in streaming
+© 2025 Enrico Callegaro - Tutti i diritti riservati.
+
+Per un numero crescente di lotti letti da un database di benchmarks.datagen
+confronta la memoria di picco (tracemalloc) e il tempo di due percorsi:
+
+- materialized: righe ORM → LottoList(items=[...]) → model_response, come
+  le liste paginate
+- streaming: yield_per + iter_json_list, come /api/lotti/export; i blocchi
+  vengono scartati appena prodotti (come se fossero inviati al socket)
+
+Con lo streaming la memoria di picco deve restare circa costante al
+crescere delle righe e dipendere solo da --batch-size.
+
+Uso:
+    python -m benchmarks.streaming --db ./bench.db
+    python -m benchmarks.streaming --db ./bench.db --rows 1000 10000 100000 --batch-size 500
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Optional
+
+from benchmarks.common import configure_env, git_commit
+
+
+def _materialized(engine, rows: int, batch_size: int) -> int:
+    from sqlalchemy import select
+    from sqlalchemy.orm import Session
+
+    from app.core.responses import model_response
+    from app.models import Lotto
+    from app.schemas import LottoList, LottoResponse
+
+    with Session(engine) as db:
+        lotti = db.execute(select(Lotto).order_by(Lotto.LottoID).limit(rows)).scalars().all()
+        model = LottoList(
+            items=[LottoResponse.model_validate(lotto) for lotto in lotti],
+            total=len(lotti),
+            page=1,
+            page_size=rows,
+        )
+        return len(model_response(model).body)
+
+
+def _streaming(engine, rows: int, batch_size: int) -> int:
+    from sqlalchemy import select
+    from sqlalchemy.orm import Session
+
+    from app.core.streaming import iter_json_list
+    from app.models import Lotto
+    from app.schemas import LottoResponse
+
+    stmt = select(Lotto).order_by(Lotto.LottoID).limit(rows).execution_options(yield_per=batch_size)
+    with Session(engine) as db:
+        partitions = db.execute(stmt).scalars().partitions()
+        return sum(len(chunk) for chunk in iter_json_list(partitions, LottoResponse))
+
+
+def _measure(fn: Callable[..., int], engine, rows: int, batch_size: int) -> dict:
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = fn(engine, rows, batch_size)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"bytes": size, "peak_mb": round(peak / 1e6, 2), "seconds": round(seconds, 3)}
+
+
+def measure(engine, rows_list: list[int], batch_size: int) -> dict:
+    from sqlalchemy import func, select
+
+    from app.models import Lotto
+
+    with engine.connect() as conn:
+        available = conn.execute(select(func.count()).select_from(Lotto)).scalar()
+
+    results = {}
+    for rows in rows_list:
+        if rows > available:
+            print(f"{rows:>8} righe: il database ne contiene solo {available}, salto")
+            continue
+        results[rows] = {
+            "materialized": _measure(_materialized, engine, rows, batch_size),
+            "streaming": _measure(_streaming, engine, rows, batch_size),
+        }
+        m, s = results[rows]["materialized"], results[rows]["streaming"]
+        print(
+            f"{rows:>8} righe {m['bytes'] / 1e6:>8.1f} MB JSON   "
+            f"materialized {m['peak_mb']:>8.1f} MB {m['seconds']:>7.2f} s   "
+            f"streaming {s['peak_mb']:>6.1f} MB {s['seconds']:>7.2f} s"
+        )
+    return results
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Memoria di picco delle liste ASI-GEST: materializzate vs streaming")
+    parser.add_argument("--db", required=True, help="File SQLite generato da benchmarks.datagen")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 50000], help="Lotti letti per misura")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Righe per blocco (EXPORT_BATCH_SIZE)")
+    parser.add_argument("--output", help="File JSON con i risultati")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        parser.error(f"database non trovato: {args.db}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        configure_env(os.path.abspath(args.db), os.path.join(tmp, "asitron.db"))
+        from app.core.database import get_engine_asi_gest
+
+        engine = get_engine_asi_gest()
+        try:
+            results = measure(engine, args.rows, args.batch_size)
+        finally:
+            engine.dispose()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "meta": {
+                    "timestamp": datetime.utcnow().isoformat() + "Z",
+                    "git_commit": git_commit(),
+                    "python": platform.python_version(),
+                    "batch_size": args.batch_size,
+                },
+                "rows": results,
+            }, f, indent=2)
+        print(f"✓ Risultati salvati in {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,8 @@
 -- ASI-GEST Database Setup Script
 -- © 2025 Enrico Callegaro - Tutti i diritti riservati.
 -- =============================================
+-- Crea un database nuovo. Per aggiornare un database esistente eseguire
+-- upgrade_database.sql.
 
 -- Step 1: Create Database
 IF NOT EXISTS (SELECT name FROM sys.databases WHERE name = 'ASI_GEST')
@@ -18,6 +20,10 @@ GO
 ALTER DATABASE ASI_GEST SET RECOVERY SIMPLE
 GO
 
+-- Snapshot isolation per le letture di reportistica (get_db_asi_gest_read)
+ALTER DATABASE ASI_GEST SET ALLOW_SNAPSHOT_ISOLATION ON
+GO
+
 -- Step 3: Create Tables
 -- =============================================
 
@@ -41,11 +47,13 @@ CREATE TABLE dbo.Utenti (
     Ruolo VARCHAR(50) NULL,
     Attivo BIT NOT NULL DEFAULT 1,
     DataCreazione DATETIME2 NOT NULL DEFAULT GETDATE(),
+    DataModifica DATETIME2 NOT NULL DEFAULT GETUTCDATE(),
     CONSTRAINT CHK_Utenti_Email CHECK (Email LIKE '%@%' OR Email IS NULL)
 );
 
 CREATE INDEX IX_Utenti_Username ON dbo.Utenti(Username) WHERE Attivo = 1;
 CREATE INDEX IX_Utenti_Reparto ON dbo.Utenti(Reparto) WHERE Attivo = 1;
+CREATE INDEX IX_Utenti_DataModifica ON dbo.Utenti(DataModifica);
 
 -- 3.3 Macchine - Equipment
 CREATE TABLE dbo.Macchine (
@@ -56,10 +64,12 @@ CREATE TABLE dbo.Macchine (
     Tipo VARCHAR(50) NULL,
     Attiva BIT NOT NULL DEFAULT 1,
     Note NVARCHAR(MAX) NULL,
+    DataModifica DATETIME2 NOT NULL DEFAULT GETUTCDATE(),
     CONSTRAINT CHK_Macchine_Reparto CHECK (Reparto IN ('SMD', 'PTH', 'CONTROLLI', 'MAG'))
 );
 
 CREATE INDEX IX_Macchine_Reparto ON dbo.Macchine(Reparto) WHERE Attiva = 1;
+CREATE INDEX IX_Macchine_DataModifica ON dbo.Macchine(DataModifica);
 
 -- 3.4 ConfigCommessa - Configurazione Tecnica
 CREATE TABLE dbo.ConfigCommessa (
@@ -80,6 +90,7 @@ CREATE TABLE dbo.ConfigCommessa (
     ConfigJSON NVARCHAR(MAX) NULL,
 
     DataCreazione DATETIME2 NOT NULL DEFAULT GETDATE(),
+    DataModifica DATETIME2 NOT NULL DEFAULT GETUTCDATE(),
     ModificatoDa VARCHAR(100) NULL,
     DataUltimaModifica DATETIME2 NULL
 );
@@ -87,6 +98,7 @@ CREATE TABLE dbo.ConfigCommessa (
 CREATE INDEX IX_ConfigCommessa_Bloccata
     ON dbo.ConfigCommessa(BloccataDocumentazione)
     WHERE BloccataDocumentazione = 1;
+CREATE INDEX IX_ConfigCommessa_DataModifica ON dbo.ConfigCommessa(DataModifica);
 
 -- 3.5 Fasi - Istanze Fasi per Commessa
 CREATE TABLE dbo.Fasi (
@@ -98,6 +110,7 @@ CREATE TABLE dbo.Fasi (
 
     DataApertura DATETIME2 NOT NULL DEFAULT GETDATE(),
     DataChiusura DATETIME2 NULL,
+    DataModifica DATETIME2 NOT NULL DEFAULT GETUTCDATE(),
 
     QtaPrevista INT NULL,
     QtaProdotta INT NULL,
@@ -105,6 +118,8 @@ CREATE TABLE dbo.Fasi (
 
     Note NVARCHAR(MAX) NULL,
 
+    Versione INT NOT NULL DEFAULT 1,
+
     CONSTRAINT FK_Fasi_FaseTipo FOREIGN KEY (FaseTipoID)
         REFERENCES dbo.FaseTipo(FaseTipoID),
     CONSTRAINT CHK_Fasi_Stato CHECK (Stato IN ('APERTA', 'IN_CORSO', 'CHIUSA', 'BLOCCATA'))
@@ -112,6 +127,7 @@ CREATE TABLE dbo.Fasi (
 
 CREATE INDEX IX_Fasi_Commessa ON dbo.Fasi(CommessaERPId, FaseTipoID);
 CREATE INDEX IX_Fasi_Stato ON dbo.Fasi(Stato) WHERE Stato IN ('APERTA', 'IN_CORSO');
+CREATE INDEX IX_Fasi_DataModifica ON dbo.Fasi(DataModifica);
 
 -- 3.6 Lotti - Produzione Dettagliata
 CREATE TABLE dbo.Lotti (
@@ -122,6 +138,7 @@ CREATE TABLE dbo.Lotti (
 
     DataInizio DATETIME2 NOT NULL,
     DataFine DATETIME2 NULL,
+    DataModifica DATETIME2 NOT NULL DEFAULT GETUTCDATE(),
 
     QtaInput INT NULL,
     QtaOutput INT NOT NULL,
@@ -138,6 +155,8 @@ CREATE TABLE dbo.Lotti (
 
     Note NVARCHAR(MAX) NULL,
 
+    Versione INT NOT NULL DEFAULT 1,
+
     CONSTRAINT FK_Lotti_Fase FOREIGN KEY (FaseID)
         REFERENCES dbo.Fasi(FaseID),
     CONSTRAINT FK_Lotti_Operatore FOREIGN KEY (OperatoreID)
@@ -152,6 +171,7 @@ CREATE TABLE dbo.Lotti (
 CREATE INDEX IX_Lotti_Fase ON dbo.Lotti(FaseID, Progressivo);
 CREATE INDEX IX_Lotti_DataInizio ON dbo.Lotti(DataInizio DESC);
 CREATE INDEX IX_Lotti_Operatore ON dbo.Lotti(OperatoreID) WHERE OperatoreID IS NOT NULL;
+CREATE INDEX IX_Lotti_DataModifica ON dbo.Lotti(DataModifica);
 
 -- 3.7 DocumentiTecnici - Gestione Documentazione
 CREATE TABLE dbo.DocumentiTecnici (
@@ -210,6 +230,18 @@ CREATE INDEX IX_LogEventi_Data ON dbo.LogEventi(DataEvento DESC);
 CREATE INDEX IX_LogEventi_Tipo ON dbo.LogEventi(Tipo, DataEvento DESC);
 CREATE INDEX IX_LogEventi_Entita ON dbo.LogEventi(Entita, EntitaID);
 
+-- 3.9 Tombstones - Righe eliminate (sincronizzazione delta, ?modified_since=)
+CREATE TABLE dbo.Tombstones (
+    TombstoneID INT IDENTITY(1,1) PRIMARY KEY,
+
+    Entita VARCHAR(50) NOT NULL,
+    EntitaID INT NOT NULL,
+
+    DataCancellazione DATETIME2 NOT NULL DEFAULT GETUTCDATE()
+);
+
+CREATE INDEX IX_Tombstones_Entita_Data ON dbo.Tombstones(Entita, DataCancellazione);
+
 PRINT '✓ All tables created'
 GO
 
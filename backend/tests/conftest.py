@@ -0,0 +1,80 @@
+"""
+ASI-GEST Test fixtures
+© 2025 Enrico Callegaro - Tutti i diritti riservati.
+
+I test girano in-process (httpx ASGITransport) su un database SQLite
+generato con benchmarks.datagen, senza SQL Server né ASITRON.
+
+Uso (dalla cartella backend):
+    python -m pytest
+"""
+
+import asyncio
+import os
+import sqlite3
+
+import pytest
+
+from benchmarks.common import configure_env
+from benchmarks.datagen import Scale, generate
+
+# Volumi minimi: bastano poche righe per contare gli statement
+TEST_SCALE = Scale(commesse=5, fasi=40, lotti=300, utenti=5, macchine=3, log_eventi=20)
+
+
+class Client:
+    """Client HTTP sincrono sull'applicazione, su un unico event loop"""
+
+    def __init__(self, app):
+        import httpx
+
+        self.loop = asyncio.new_event_loop()
+        self.http = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+    def request(self, method: str, url: str, **kwargs):
+        return self.loop.run_until_complete(self.http.request(method, url, **kwargs))
+
+    def close(self) -> None:
+        from app.core.database import dispose_async_engines
+
+        self.loop.run_until_complete(self.http.aclose())
+        # Le connessioni aiosqlite vanno chiuse sul loop che le ha aperte
+        self.loop.run_until_complete(dispose_async_engines())
+        self.loop.close()
+
+
+@pytest.fixture(scope="session")
+def db_path(tmp_path_factory) -> str:
+    path = str(tmp_path_factory.mktemp("db") / "asi_gest.db")
+    configure_env(path)
+    os.environ["SQL_TRACKING_ENABLED"] = "True"
+    generate(f"sqlite:///{path}", TEST_SCALE, seed=1)
+    return path
+
+
+@pytest.fixture(scope="session")
+def client(db_path):
+    # app.* va importato dopo configure_env (impostazioni lette all'import)
+    from app.core.database import get_engine_asi_gest
+    from app.main import app
+
+    client = Client(app)
+    yield client
+    client.close()
+    get_engine_asi_gest().dispose()
+
+
+@pytest.fixture(scope="session")
+def ids(db_path) -> dict:
+    """Righe esistenti da usare negli URL"""
+    with sqlite3.connect(db_path) as conn:
+        def first(sql: str) -> int:
+            return conn.execute(sql).fetchone()[0]
+
+        return {
+            "lotto": first("SELECT MIN(LottoID) FROM Lotti"),
+            "fase": first("SELECT MIN(FaseID) FROM Fasi"),
+            "fase_aperta": first("SELECT MIN(FaseID) FROM Fasi WHERE Stato = 'APERTA'"),
+            "config": first("SELECT MIN(ConfigCommessaID) FROM ConfigCommessa"),
+            "utente": first("SELECT MIN(UtenteID) FROM Utenti WHERE Attivo = 1"),
+        }
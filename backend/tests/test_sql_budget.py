@@ -0,0 +1,58 @@
+"""
+ASI-GEST Test: budget SQL delle route
+© 2025 Enrico Callegaro - Tutti i diritti riservati.
+
+Ogni route con sql_budget(N) dichiara quanti statement SQL può eseguire.
+Il middleware li conta e li restituisce in X-SQL-Count / X-SQL-Budget:
+qui si verifica che il budget sia dichiarato e rispettato, così un N+1 o
+una query in più introdotti da una modifica fanno fallire i test.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+
+def assert_within_budget(response, budget: int) -> None:
+    assert response.status_code < 400, response.text
+    assert response.headers["X-SQL-Budget"] == str(budget)
+    count = int(response.headers["X-SQL-Count"])
+    assert count <= budget, f"{count} statement SQL, budget {budget}"
+
+
+@pytest.mark.parametrize("url, budget", [
+    ("/api/lotti/", 2),
+    ("/api/lotti/?aperto=true&page=2", 2),
+    ("/api/lotti/?fase_id={fase}", 2),
+    ("/api/lotti/?fields=LottoID,Progressivo", 2),
+    ("/api/lotti/?modified_since={since}", 2),
+    ("/api/lotti/{lotto}", 1),
+    ("/api/fasi/", 3),
+    ("/api/fasi/?config_commessa_id={config}", 3),
+    ("/api/fasi/?completata=false&fields=FaseID,Completata", 3),
+    ("/api/fasi/?modified_since={since}", 3),
+    ("/api/fasi/{fase}", 2),
+])
+def test_read_budget(client, ids, url, budget):
+    since = (datetime.utcnow() - timedelta(days=1)).isoformat()
+    response = client.request("GET", url.format(since=since, **ids))
+    assert_within_budget(response, budget)
+
+
+def test_create_and_close_lotto_budget(client, ids):
+    from app.core.concurrency import etag_for
+
+    created = client.request("POST", "/api/lotti/", json={
+        "FaseID": ids["fase_aperta"],
+        "UtenteID": ids["utente"],
+        "QtaInput": 10,
+    })
+    assert_within_budget(created, 5)
+
+    closed = client.request(
+        "PUT",
+        f"/api/lotti/{created.json()['LottoID']}/close",
+        json={"QtaOutput": 9, "QtaScarti": 1},
+        headers={"If-Match": etag_for(created.json()["Versione"])},
+    )
+    assert_within_budget(closed, 3)
@@ -0,0 +1,125 @@
+-- =============================================
+-- ASI-GEST Database Upgrade Script
+-- © 2025 Enrico Callegaro - Tutti i diritti riservati.
+-- =============================================
+-- Allinea un database ASI_GEST creato con una versione precedente di
+-- setup_database.sql. Ogni modifica è condizionata (colonna, indice o
+-- tabella mancante): lo script si può rieseguire senza effetti.
+
+USE ASI_GEST
+GO
+
+-- Upgrade 1: Versione (optimistic locking su Fasi e Lotti)
+-- =============================================
+IF COL_LENGTH('dbo.Fasi', 'Versione') IS NULL
+BEGIN
+    ALTER TABLE dbo.Fasi ADD Versione INT NOT NULL CONSTRAINT DF_Fasi_Versione DEFAULT 1
+    PRINT '✓ Fasi.Versione added'
+END
+GO
+
+IF COL_LENGTH('dbo.Lotti', 'Versione') IS NULL
+BEGIN
+    ALTER TABLE dbo.Lotti ADD Versione INT NOT NULL CONSTRAINT DF_Lotti_Versione DEFAULT 1
+    PRINT '✓ Lotti.Versione added'
+END
+GO
+
+-- Upgrade 2: DataModifica, Tombstones (sincronizzazione delta, ?modified_since=)
+-- =============================================
+-- Le righe esistenti ricevono l'ora dell'upgrade: alla prima lettura delta
+-- i client che hanno un watermark precedente le ricevono tutte una volta.
+IF COL_LENGTH('dbo.Utenti', 'DataModifica') IS NULL
+BEGIN
+    ALTER TABLE dbo.Utenti ADD DataModifica DATETIME2 NOT NULL CONSTRAINT DF_Utenti_DataModifica DEFAULT GETUTCDATE()
+    PRINT '✓ Utenti.DataModifica added'
+END
+GO
+
+IF COL_LENGTH('dbo.Macchine', 'DataModifica') IS NULL
+BEGIN
+    ALTER TABLE dbo.Macchine ADD DataModifica DATETIME2 NOT NULL CONSTRAINT DF_Macchine_DataModifica DEFAULT GETUTCDATE()
+    PRINT '✓ Macchine.DataModifica added'
+END
+GO
+
+IF COL_LENGTH('dbo.ConfigCommessa', 'DataModifica') IS NULL
+BEGIN
+    ALTER TABLE dbo.ConfigCommessa ADD DataModifica DATETIME2 NOT NULL CONSTRAINT DF_ConfigCommessa_DataModifica DEFAULT GETUTCDATE()
+    PRINT '✓ ConfigCommessa.DataModifica added'
+END
+GO
+
+IF COL_LENGTH('dbo.Fasi', 'DataModifica') IS NULL
+BEGIN
+    ALTER TABLE dbo.Fasi ADD DataModifica DATETIME2 NOT NULL CONSTRAINT DF_Fasi_DataModifica DEFAULT GETUTCDATE()
+    PRINT '✓ Fasi.DataModifica added'
+END
+GO
+
+IF COL_LENGTH('dbo.Lotti', 'DataModifica') IS NULL
+BEGIN
+    ALTER TABLE dbo.Lotti ADD DataModifica DATETIME2 NOT NULL CONSTRAINT DF_Lotti_DataModifica DEFAULT GETUTCDATE()
+    PRINT '✓ Lotti.DataModifica added'
+END
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Utenti_DataModifica' AND object_id = OBJECT_ID('dbo.Utenti'))
+BEGIN
+    CREATE INDEX IX_Utenti_DataModifica ON dbo.Utenti(DataModifica)
+    PRINT '✓ IX_Utenti_DataModifica created'
+END
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Macchine_DataModifica' AND object_id = OBJECT_ID('dbo.Macchine'))
+BEGIN
+    CREATE INDEX IX_Macchine_DataModifica ON dbo.Macchine(DataModifica)
+    PRINT '✓ IX_Macchine_DataModifica created'
+END
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_ConfigCommessa_DataModifica' AND object_id = OBJECT_ID('dbo.ConfigCommessa'))
+BEGIN
+    CREATE INDEX IX_ConfigCommessa_DataModifica ON dbo.ConfigCommessa(DataModifica)
+    PRINT '✓ IX_ConfigCommessa_DataModifica created'
+END
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Fasi_DataModifica' AND object_id = OBJECT_ID('dbo.Fasi'))
+BEGIN
+    CREATE INDEX IX_Fasi_DataModifica ON dbo.Fasi(DataModifica)
+    PRINT '✓ IX_Fasi_DataModifica created'
+END
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Lotti_DataModifica' AND object_id = OBJECT_ID('dbo.Lotti'))
+BEGIN
+    CREATE INDEX IX_Lotti_DataModifica ON dbo.Lotti(DataModifica)
+    PRINT '✓ IX_Lotti_DataModifica created'
+END
+GO
+
+IF OBJECT_ID('dbo.Tombstones', 'U') IS NULL
+BEGIN
+    CREATE TABLE dbo.Tombstones (
+        TombstoneID INT IDENTITY(1,1) PRIMARY KEY,
+
+        Entita VARCHAR(50) NOT NULL,
+        EntitaID INT NOT NULL,
+
+        DataCancellazione DATETIME2 NOT NULL DEFAULT GETUTCDATE()
+    )
+    PRINT '✓ Tombstones created'
+END
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Tombstones_Entita_Data' AND object_id = OBJECT_ID('dbo.Tombstones'))
+BEGIN
+    CREATE INDEX IX_Tombstones_Entita_Data ON dbo.Tombstones(Entita, DataCancellazione)
+    PRINT '✓ IX_Tombstones_Entita_Data created'
+END
+GO
+
+PRINT '================================================'
+PRINT '✅ ASI-GEST Database Upgrade Completed Successfully!'
+PRINT '================================================'